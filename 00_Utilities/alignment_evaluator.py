@@ -0,0 +1,295 @@
+import math
+import numpy as np
+
+# Liczba węzłów kwadratury Gaussa-Legendre'a przy całkowaniu położenia wzdłuż segmentu poziomego
+INTEGRATION_NODES = 10
+
+# Typy IfcAlignmentVerticalSegment liczone jako łuk kołowy (pozostałe krzywe - jak parabola)
+CIRCULAR_VERTICAL_TYPES = ("CIRCULARARC",)
+
+
+def _nested_objects(parent, ifc_class=None):
+    # Zwraca obiekty zagnieżdżone (IfcRelNests) w kolejności zapisu, opcjonalnie tylko danego typu.
+    nested = []
+    for rel in getattr(parent, "IsNestedBy", None) or []:
+        nested.extend(obj for obj in rel.RelatedObjects if ifc_class is None or obj.is_a(ifc_class))
+    return nested
+
+
+def _empty_horizontal_rows():
+    return {"starts": [], "directions": [], "start_curvatures": [], "end_curvatures": [], "lengths": []}
+
+
+def _add_horizontal_row(rows, start, direction, start_curvature, end_curvature, length):
+    rows["starts"].append((float(start[0]), float(start[1])))
+    rows["directions"].append(float(direction))
+    rows["start_curvatures"].append(float(start_curvature))
+    rows["end_curvatures"].append(float(end_curvature))
+    rows["lengths"].append(float(length))
+
+
+def _signed_curvature(radius):
+    # W IfcAlignmentHorizontalSegment promień 0 oznacza nieskończoność, znak + to łuk w lewo.
+    return 1.0 / radius if radius else 0.0
+
+
+def _trim_parameter(trims, circle_center, placement_angle):
+    # Parametr (kąt) przycięcia okręgu - z IfcParameterValue albo z punktu przycięcia.
+    for trim in trims:
+        if trim.is_a("IfcParameterValue"):
+            return float(trim.wrappedValue)
+    for trim in trims:
+        if trim.is_a("IfcCartesianPoint"):
+            x, y = trim.Coordinates[:2]
+            return math.atan2(y - circle_center[1], x - circle_center[0]) - placement_angle
+    raise TypeError("Nieobsługiwany sposób przycięcia IfcTrimmedCurve.")
+
+
+def _add_polyline_rows(rows, polyline, same_sense=True):
+    points = [p.Coordinates[:2] for p in polyline.Points]
+    if not same_sense:
+        points = points[::-1]
+    for (x1, y1), (x2, y2) in zip(points[:-1], points[1:]):
+        _add_horizontal_row(rows, (x1, y1), math.atan2(y2 - y1, x2 - x1), 0.0, 0.0, math.hypot(x2 - x1, y2 - y1))
+
+
+def _add_trimmed_circle_row(rows, curve, same_sense=True):
+    circle = curve.BasisCurve
+    center = circle.Position.Location.Coordinates[:2]
+    ref_direction = circle.Position.RefDirection
+    placement_angle = math.atan2(ref_direction.DirectionRatios[1], ref_direction.DirectionRatios[0]) if ref_direction else 0.0
+    radius = float(circle.Radius)
+
+    start_param = _trim_parameter(curve.Trim1, center, placement_angle)
+    end_param = _trim_parameter(curve.Trim2, center, placement_angle)
+    counter_clockwise = bool(curve.SenseAgreement)
+    if not same_sense:
+        start_param, end_param = end_param, start_param
+        counter_clockwise = not counter_clockwise
+
+    sweep = (end_param - start_param) % (2 * math.pi) if counter_clockwise else (start_param - end_param) % (2 * math.pi)
+    angle = placement_angle + start_param
+    start = (center[0] + radius * math.cos(angle), center[1] + radius * math.sin(angle))
+    curvature = 1.0 / radius if counter_clockwise else -1.0 / radius
+    direction = angle + (math.pi / 2 if counter_clockwise else -math.pi / 2)
+    _add_horizontal_row(rows, start, direction, curvature, curvature, radius * sweep)
+
+
+def _finish_horizontal_table(rows):
+    # Segmenty o zerowej długości (np. segment zamykający oś) nie niosą geometrii i zaburzałyby kierunek na końcu osi
+    lengths = np.array(rows["lengths"], dtype=float)
+    keep = lengths > 0 if (lengths > 0).any() else np.ones(len(lengths), dtype=bool)
+    return {
+        "stations": np.concatenate(([0.0], np.cumsum(lengths[keep]))),
+        "starts": np.array(rows["starts"], dtype=float).reshape(-1, 2)[keep],
+        "directions": np.array(rows["directions"], dtype=float)[keep],
+        "start_curvatures": np.array(rows["start_curvatures"], dtype=float)[keep],
+        "end_curvatures": np.array(rows["end_curvatures"], dtype=float)[keep],
+        "lengths": lengths[keep],
+    }
+
+
+def get_horizontal_table(alignment):
+    """
+    Buduje tablicę segmentów poziomych osi do obliczeń wektorowych.
+
+    Każdy segment opisany jest punktem początkowym, kierunkiem początkowym i liniowo
+    zmienną krzywizną, co obejmuje proste, łuki i klotoidy. Źródłem są segmenty
+    IfcAlignmentHorizontalSegment (IfcAlignmentHorizontal zagnieżdżony w osi);
+    jeśli ich brak, używana jest reprezentacja osi (IfcCompositeCurve z IfcPolyline
+    i IfcTrimmedCurve na IfcCircle), jak w create_road_axis_with_arc.py.
+    Inne typy krzywych przejściowych liczone są jak klotoida (krzywizna liniowa).
+
+    Args:
+        alignment: Encja IfcAlignment.
+
+    Returns:
+        dict z tablicami numpy: "stations" (pikietaż początków segmentów + długość osi),
+        "starts", "directions", "start_curvatures", "end_curvatures", "lengths".
+    """
+    rows = _empty_horizontal_rows()
+
+    for horizontal in _nested_objects(alignment, "IfcAlignmentHorizontal"):
+        for segment in _nested_objects(horizontal, "IfcAlignmentSegment"):
+            params = segment.DesignParameters
+            if params is None or not params.is_a("IfcAlignmentHorizontalSegment"):
+                continue
+            _add_horizontal_row(rows, params.StartPoint.Coordinates, params.StartDirection,
+                                _signed_curvature(params.StartRadiusOfCurvature), _signed_curvature(params.EndRadiusOfCurvature),
+                                params.SegmentLength)
+    if rows["lengths"]:
+        return _finish_horizontal_table(rows)
+
+    if not alignment.Representation:
+        raise ValueError("BŁĄD: Oś nie ma ani segmentów poziomych, ani reprezentacji geometrycznej.")
+    curve = alignment.Representation.Representations[0].Items[0]
+    if not curve.is_a("IfcCompositeCurve"):
+        raise TypeError("Oczekiwano, że geometria osi będzie typu IfcCompositeCurve.")
+    for segment in curve.Segments:
+        parent_curve = segment.ParentCurve
+        if parent_curve.is_a("IfcPolyline"):
+            _add_polyline_rows(rows, parent_curve, segment.SameSense)
+        elif parent_curve.is_a("IfcTrimmedCurve") and parent_curve.BasisCurve.is_a("IfcCircle"):
+            _add_trimmed_circle_row(rows, parent_curve, segment.SameSense)
+        else:
+            print(f"OSTRZEŻENIE: Pomijam nieobsługiwany typ krzywej: {parent_curve.is_a()}")
+    return _finish_horizontal_table(rows)
+
+
+def get_vertical_table(alignment):
+    """
+    Buduje tablicę segmentów pionowych (IfcAlignmentVerticalSegment) osi.
+
+    Args:
+        alignment: Encja IfcAlignment.
+
+    Returns:
+        dict z tablicami numpy: "stations" (StartDistAlong), "lengths", "heights",
+        "start_gradients", "end_gradients", "curvatures" (ze znakiem dla łuków
+        kołowych, 0 dla pozostałych) lub None, jeśli oś nie ma niwelety.
+    """
+    segments = []
+    for vertical in _nested_objects(alignment, "IfcAlignmentVertical"):
+        for segment in _nested_objects(vertical, "IfcAlignmentSegment"):
+            params = segment.DesignParameters
+            if params is not None and params.is_a("IfcAlignmentVerticalSegment"):
+                segments.append(params)
+    if not segments:
+        return None
+    segments.sort(key=lambda params: params.StartDistAlong)
+
+    curvatures = []
+    for params in segments:
+        if params.PredefinedType in CIRCULAR_VERTICAL_TYPES and params.RadiusOfCurvature:
+            # Łuk wklęsły (rosnące pochylenie) ma krzywiznę dodatnią
+            curvatures.append(math.copysign(1.0 / abs(params.RadiusOfCurvature), params.EndGradient - params.StartGradient))
+        else:
+            curvatures.append(0.0)
+    return {
+        "stations": np.array([params.StartDistAlong for params in segments], dtype=float),
+        "lengths": np.array([params.HorizontalLength for params in segments], dtype=float),
+        "heights": np.array([params.StartHeight for params in segments], dtype=float),
+        "start_gradients": np.array([params.StartGradient for params in segments], dtype=float),
+        "end_gradients": np.array([params.EndGradient for params in segments], dtype=float),
+        "curvatures": np.array(curvatures, dtype=float),
+    }
+
+
+def build_alignment_evaluator(alignment):
+    """
+    Przygotowuje oś do wielokrotnego obliczania punktów po pikietażu.
+
+    Tablice segmentów poziomych i pionowych są budowane raz; kolejne zapytania
+    (evaluate_stations) nie przechodzą już przez graf encji IFC.
+
+    Args:
+        alignment: Encja IfcAlignment.
+
+    Returns:
+        dict z kluczami "horizontal", "vertical" (lub None) i "length" (długość osi).
+    """
+    horizontal = get_horizontal_table(alignment)
+    return {
+        "horizontal": horizontal,
+        "vertical": get_vertical_table(alignment),
+        "length": float(horizontal["stations"][-1]),
+    }
+
+
+def evaluate_horizontal(horizontal_table, stations):
+    """
+    Oblicza położenie i kierunek osi w planie dla wielu pikiet naraz.
+
+    Segment każdej pikiety znajdowany jest wyszukiwaniem binarnym w tablicy pikietażu,
+    a położenie - całkowaniem kierunku stycznej kwadraturą Gaussa-Legendre'a.
+
+    Args:
+        horizontal_table (dict): Tablica z get_horizontal_table().
+        stations: Pikiety (m od początku osi); wartości spoza osi są przycinane.
+
+    Returns:
+        (segment_indices, points, directions): numery segmentów, punkty XY (n, 2)
+        i kierunki stycznej (radiany, przeciwnie do ruchu wskazówek zegara od osi X).
+    """
+    stations = np.clip(np.asarray(stations, dtype=float), 0.0, horizontal_table["stations"][-1])
+    indices = np.clip(np.searchsorted(horizontal_table["stations"], stations, side="right") - 1, 0, len(horizontal_table["lengths"]) - 1)
+    s = stations - horizontal_table["stations"][indices]
+    theta0 = horizontal_table["directions"][indices]
+    k0 = horizontal_table["start_curvatures"][indices]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ramp = np.nan_to_num((horizontal_table["end_curvatures"][indices] - k0) / horizontal_table["lengths"][indices])
+
+    def heading(u):
+        return theta0[:, None] + k0[:, None] * u + ramp[:, None] * u * u / 2
+
+    nodes, weights = np.polynomial.legendre.leggauss(INTEGRATION_NODES)
+    angles = heading((nodes[None, :] + 1) * s[:, None] / 2)
+    dx = (np.cos(angles) * weights).sum(axis=1) * s / 2
+    dy = (np.sin(angles) * weights).sum(axis=1) * s / 2
+    points = horizontal_table["starts"][indices] + np.column_stack((dx, dy))
+    return indices, points, heading(s[:, None])[:, 0]
+
+
+def evaluate_vertical(vertical_table, stations):
+    """
+    Oblicza wysokość i pochylenie niwelety dla wielu pikiet naraz.
+
+    Args:
+        vertical_table (dict): Tablica z get_vertical_table().
+        stations: Pikiety (m od początku osi).
+
+    Returns:
+        (heights, gradients): tablice numpy długości len(stations).
+    """
+    stations = np.asarray(stations, dtype=float)
+    indices = np.clip(np.searchsorted(vertical_table["stations"], stations, side="right") - 1, 0, len(vertical_table["lengths"]) - 1)
+    u = stations - vertical_table["stations"][indices]
+    h0 = vertical_table["heights"][indices]
+    g0 = vertical_table["start_gradients"][indices]
+    g1 = vertical_table["end_gradients"][indices]
+    lengths = vertical_table["lengths"][indices]
+    k = vertical_table["curvatures"][indices]
+
+    # Prosta i parabola: z = h0 + g0*u + (g1 - g0)/(2L)*u^2 (poza segmentem - przedłużenie stycznej)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.nan_to_num((g1 - g0) / lengths)
+    inside = np.clip(u, 0.0, lengths)
+    heights = h0 + g0 * inside + change * inside * inside / 2
+    gradients = g0 + change * inside
+
+    # Łuk kołowy: kąt pochylenia a spełnia sin(a) = sin(a0) + k*u
+    circular = k != 0
+    if circular.any():
+        a0 = np.arctan(g0[circular])
+        a = np.arcsin(np.clip(np.sin(a0) + k[circular] * inside[circular], -1.0, 1.0))
+        heights[circular] = h0[circular] + (np.cos(a0) - np.cos(a)) / k[circular]
+        gradients[circular] = np.tan(a)
+
+    beyond = u - inside
+    return heights + gradients * beyond, gradients
+
+
+def evaluate_stations(evaluator, stations):
+    """
+    Zwraca punkty osi dla wielu pikiet naraz.
+
+    Args:
+        evaluator (dict): Wynik build_alignment_evaluator().
+        stations: Pikiety (m od początku osi); wartości spoza osi są przycinane.
+
+    Returns:
+        (points, directions): punkty (n, 3) - Z z niwelety lub 0.0, jeśli oś jej nie ma -
+        oraz kierunki stycznej w planie (radiany).
+    """
+    stations = np.clip(np.atleast_1d(np.asarray(stations, dtype=float)), 0.0, evaluator["length"])
+    _, points_xy, directions = evaluate_horizontal(evaluator["horizontal"], stations)
+    if evaluator["vertical"] is not None:
+        heights, _ = evaluate_vertical(evaluator["vertical"], stations)
+    else:
+        heights = np.zeros(len(stations))
+    return np.column_stack((points_xy, heights)), directions
+
+
+def get_segment_stations(evaluator):
+    """Zwraca pikietaż początków i końców segmentów poziomych (bez powtórzeń, rosnąco)."""
+    return np.unique(evaluator["horizontal"]["stations"])
@@ -0,0 +1,110 @@
+import numpy as np
+
+from alignment_evaluator import evaluate_horizontal
+from bbox_tree import build_bbox_tree, find_nearest_boxes
+
+# Największa zmiana kierunku (rad) na jednej cięciwie przybliżającej łuk lub klotoidę w indeksie
+MAX_CHORD_ANGLE = 0.05
+
+# Największa długość cięciwy (m) - krótkie cięciwy dają ciasne prostokąty także na długich prostych
+MAX_CHORD_LENGTH = 25.0
+
+# Liczba iteracji Newtona doprecyzowujących pikietę na rzeczywistej krzywej
+NEWTON_ITERATIONS = 2
+
+
+def build_projection_index(horizontal_table):
+    """
+    Buduje indeks przestrzenny do rzutowania punktów na oś.
+
+    Segmenty osi przybliżane są cięciwami (nie dłuższymi niż MAX_CHORD_LENGTH, na łukach
+    i klotoidach co MAX_CHORD_ANGLE zmiany kierunku), a prostokąty otaczające cięciw
+    trafiają do drzewa z bbox_tree (punktem na elemencie jest początek cięciwy).
+
+    Args:
+        horizontal_table (dict): Tablica segmentów poziomych z get_horizontal_table()
+            (alignment_evaluator) lub get_segment_table() (horizontal_geometry) - obie mają te same klucze.
+
+    Returns:
+        dict z kluczami "table", "chord_stations" (pikiety końców cięciw), "chord_starts",
+        "chord_ends" oraz "tree" (drzewo cięciw z build_bbox_tree()).
+    """
+    lengths = horizontal_table["lengths"]
+    turning = (np.abs(horizontal_table["start_curvatures"]) + np.abs(horizontal_table["end_curvatures"])) / 2 * lengths
+    counts = np.maximum(np.maximum(np.ceil(turning / MAX_CHORD_ANGLE), np.ceil(lengths / MAX_CHORD_LENGTH)).astype(int), 1)
+
+    # Pikiety wierzchołków cięciw: każdy segment dzielony na counts równych części
+    segment_ids = np.repeat(np.arange(len(lengths)), counts)
+    offsets = np.cumsum(counts) - counts
+    fractions = (np.arange(counts.sum()) - offsets[segment_ids]) / counts[segment_ids]
+    vertex_stations = np.append(horizontal_table["stations"][segment_ids] + fractions * lengths[segment_ids], horizontal_table["stations"][-1])
+    _, vertices, _ = evaluate_horizontal(horizontal_table, vertex_stations)
+
+    chord_starts, chord_ends = vertices[:-1], vertices[1:]
+    return {
+        "table": horizontal_table,
+        "chord_stations": vertex_stations,
+        "chord_starts": chord_starts,
+        "chord_ends": chord_ends,
+        "tree": build_bbox_tree(np.minimum(chord_starts, chord_ends), np.maximum(chord_starts, chord_ends), chord_starts),
+    }
+
+
+def _project_on_chords(starts, vectors, points):
+    # Parametr t (0..1) najbliższego punktu cięciwy i wektor od tego punktu do punktu zapytania (współrzędne w ostatniej osi).
+    offsets = points - starts
+    squared_lengths = (vectors ** 2).sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.nan_to_num(np.clip((offsets * vectors).sum(axis=-1) / squared_lengths, 0.0, 1.0))
+    return t, offsets - t[..., None] * vectors
+
+
+def project_points(projection_index, points):
+    """
+    Rzutuje punkty na oś: zwraca pikietę i odsunięcie boczne każdego punktu.
+
+    Najbliższa cięciwa wyszukiwana jest w drzewie prostokątów (bbox_tree.find_nearest_boxes()
+    z dokładną odległością punkt-cięciwa), a pikieta doprecyzowywana metodą Newtona
+    na rzeczywistej krzywej (warunek: wektor punkt-oś prostopadły do stycznej).
+
+    Args:
+        projection_index (dict): Indeks z build_projection_index().
+        points: Punkty (n, 2) lub (n, 3); Z jest pomijane.
+
+    Returns:
+        (stations, offsets): pikiety (m, przycięte do zakresu osi) i odsunięcia
+        (m, dodatnie po lewej stronie osi w kierunku pikietażu).
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=float))[:, :2]
+    table = projection_index["table"]
+    chord_starts = projection_index["chord_starts"]
+    chord_vectors = projection_index["chord_ends"] - chord_starts
+
+    def chord_distances(chord_ids, block_points, _):
+        _, residuals = _project_on_chords(chord_starts[chord_ids][:, None, :], chord_vectors[chord_ids][:, None, :], block_points)
+        return (residuals ** 2).sum(axis=-1)
+
+    chords, _ = find_nearest_boxes(projection_index["tree"], points, points, chord_distances)
+    t, _ = _project_on_chords(chord_starts[chords], chord_vectors[chords], points)
+    chord_stations = projection_index["chord_stations"]
+    s = chord_stations[chords] + t * (chord_stations[chords + 1] - chord_stations[chords])
+
+    for _ in range(NEWTON_ITERATIONS):
+        indices, curve_points, directions = evaluate_horizontal(table, s)
+        tangents = np.column_stack((np.cos(directions), np.sin(directions)))
+        normals = np.column_stack((-tangents[:, 1], tangents[:, 0]))
+        difference = points - curve_points
+        along = np.einsum("ij,ij->i", difference, tangents)
+        across = np.einsum("ij,ij->i", difference, normals)
+        lengths = table["lengths"][indices]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ramp = np.nan_to_num((table["end_curvatures"][indices] - table["start_curvatures"][indices]) / lengths)
+        curvature = table["start_curvatures"][indices] + ramp * (s - table["stations"][indices])
+        # f(s) = along, f'(s) = -(1 - k * across); blisko środka krzywizny krok jest pomijany
+        scale = 1 - curvature * across
+        step = np.where(scale > 1e-6, along / np.where(scale > 1e-6, scale, 1.0), 0.0)
+        s = np.clip(s + step, 0.0, table["stations"][-1])
+
+    _, curve_points, directions = evaluate_horizontal(table, s)
+    normals = np.column_stack((-np.sin(directions), np.cos(directions)))
+    return s, np.einsum("ij,ij->i", points - curve_points, normals)
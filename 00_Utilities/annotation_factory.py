@@ -0,0 +1,104 @@
+import ifcopenshell
+import ifcopenshell.guid
+
+
+def create_annotation_factory(ifc_file, context, owner_history):
+    """
+    Tworzy fabrykę adnotacji tekstowych dla danego pliku.
+
+    Styl tekstu (IfcTextStyleFontModel + IfcTextStyle), ramka tekstu (IfcPlanarExtent)
+    i położenie tekstu względem adnotacji (IfcAxis2Placement2D w punkcie 0,0) są
+    tworzone tylko raz dla danego zestawu parametrów i współdzielone przez wszystkie
+    etykiety. Dla każdej etykiety powstaje już tylko tekst, jego umiejscowienie
+    i sama adnotacja.
+
+    Args:
+        ifc_file: Otwarty plik IFC, do którego dodawane są adnotacje.
+        context: Kontekst reprezentacji (np. 'Model').
+        owner_history: IfcOwnerHistory przypisywana adnotacjom.
+
+    Returns:
+        dict z kluczami "file", "context", "owner_history" oraz tablicami
+        utworzonych już encji: "styles", "extents", "origin".
+    """
+    return {
+        "file": ifc_file,
+        "context": context,
+        "owner_history": owner_history,
+        "styles": {},
+        "extents": {},
+        "origin": None,
+    }
+
+
+def get_text_style(factory, font_size, font_family=("Arial",), name=None):
+    """
+    Zwraca IfcTextStyle o danych parametrach, tworząc go przy pierwszym użyciu.
+
+    Args:
+        factory (dict): Fabryka z create_annotation_factory().
+        font_size (float): Wysokość tekstu.
+        font_family (tuple): Nazwy czcionek.
+        name (str): Nazwa stylu (opcjonalna).
+    """
+    key = (float(font_size), tuple(font_family), name)
+    style = factory["styles"].get(key)
+    if style is None:
+        f = factory["file"]
+        font_model = f.create_entity("IfcTextStyleFontModel", FontFamily=list(font_family), FontSize=f.create_entity("IfcPositiveLengthMeasure", float(font_size)))
+        style = f.create_entity("IfcTextStyle", Name=name, TextCharacterAppearance=font_model)
+        factory["styles"][key] = style
+    return style
+
+
+def get_planar_extent(factory, size_x, size_y):
+    """Zwraca IfcPlanarExtent o danych wymiarach, tworząc go przy pierwszym użyciu."""
+    key = (float(size_x), float(size_y))
+    extent = factory["extents"].get(key)
+    if extent is None:
+        extent = factory["file"].create_entity("IfcPlanarExtent", SizeInX=key[0], SizeInY=key[1])
+        factory["extents"][key] = extent
+    return extent
+
+
+def get_text_origin(factory):
+    """Zwraca wspólne położenie tekstu w początku układu adnotacji (IfcAxis2Placement2D w 0,0)."""
+    if factory["origin"] is None:
+        f = factory["file"]
+        factory["origin"] = f.create_entity("IfcAxis2Placement2D", Location=f.create_entity("IfcCartesianPoint", (0.0, 0.0)))
+    return factory["origin"]
+
+
+def create_text_annotation(factory, point_coords, text, style, extent, name=None, object_type=None, box_alignment="MIDDLE", path=None):
+    """
+    Tworzy adnotację tekstową (IfcAnnotation) w zadanym punkcie 3D.
+
+    Args:
+        factory (dict): Fabryka z create_annotation_factory().
+        point_coords: Współrzędne (x, y, z) adnotacji.
+        text (str): Treść etykiety.
+        style: IfcTextStyle z get_text_style().
+        extent: IfcPlanarExtent z get_planar_extent().
+        name (str): Nazwa adnotacji.
+        object_type (str): ObjectType adnotacji (opcjonalny).
+        box_alignment (str): Wyrównanie tekstu w ramce (IfcBoxAlignment).
+        path (str): Kierunek pisania tekstu (IfcTextPath, opcjonalny).
+
+    Returns:
+        Nowa encja IfcAnnotation.
+    """
+    f = factory["file"]
+    text_literal = f.create_entity("IfcTextLiteralWithExtent", Literal=text, Placement=get_text_origin(factory), Path=path, Extent=extent, BoxAlignment=box_alignment)
+    f.create_entity("IfcStyledItem", Item=text_literal, Styles=[style])
+
+    representation = f.create_entity("IfcShapeRepresentation", ContextOfItems=factory["context"], RepresentationIdentifier="Annotation", RepresentationType="Annotation2D", Items=[text_literal])
+    placement = f.create_entity("IfcLocalPlacement", RelativePlacement=f.create_entity("IfcAxis2Placement3D", Location=f.create_entity("IfcCartesianPoint", tuple(float(c) for c in point_coords))))
+
+    return f.create_entity("IfcAnnotation",
+        GlobalId=ifcopenshell.guid.new(),
+        OwnerHistory=factory["owner_history"],
+        Name=name,
+        ObjectType=object_type,
+        ObjectPlacement=placement,
+        Representation=f.create_entity("IfcProductDefinitionShape", Representations=[representation])
+    )
@@ -0,0 +1,164 @@
+import numpy as np
+
+# Liczba dzieci węzła drzewa
+NODE_SIZE = 8
+
+# Liczba sąsiednich zapytań przeszukujących drzewo razem (jako jeden prostokąt)
+BLOCK_SIZE = 16
+
+# Liczba zapytań przetwarzanych w jednej porcji (ogranicza pamięć na pary blok-element)
+CHUNK_SIZE = 100000
+
+
+def _spread_bits(values):
+    # Rozsuwa 16 bitów liczby na pozycje parzyste (do przeplotu współrzędnych w kodzie Mortona).
+    values = values.astype(np.uint32) & 0xFFFF
+    values = (values | (values << 8)) & 0x00FF00FF
+    values = (values | (values << 4)) & 0x0F0F0F0F
+    values = (values | (values << 2)) & 0x33333333
+    return (values | (values << 1)) & 0x55555555
+
+
+def get_morton_codes(points):
+    """
+    Zwraca kody Mortona (krzywa Z) punktów w rzucie (pierwsze dwie współrzędne).
+
+    Sortowanie po tych kodach ustawia obok siebie punkty bliskie w przestrzeni,
+    co pozwala budować drzewo prostokątów jednym sortowaniem.
+    """
+    points = np.asarray(points, dtype=float)[:, :2]
+    origin = points.min(axis=0)
+    span = np.maximum(np.ptp(points, axis=0), 1e-9)
+    cells = np.clip((points - origin) / span * 65535, 0, 65535).astype(np.uint32)
+    return _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1)
+
+
+def group_minimum(values, group_ids, n_groups):
+    """
+    Zwraca minimum wartości (także wierszy tablicy 2D) w każdej grupie.
+
+    Args:
+        values: Tablica wartości; wiersze muszą być uporządkowane według grupy.
+        group_ids: Numer grupy każdego wiersza (niemalejący).
+        n_groups (int): Liczba grup; puste grupy dostają np.inf.
+    """
+    counts = np.bincount(group_ids, minlength=n_groups)
+    present = counts > 0
+    result = np.full((n_groups,) + values.shape[1:], np.inf)
+    result[present] = np.minimum.reduceat(values, (np.cumsum(counts) - counts)[present], axis=0)
+    return result
+
+
+def build_bbox_tree(mins, maxs, anchors=None):
+    """
+    Buduje pakowane drzewo prostokątów otaczających (R-drzewo) dla zbioru elementów.
+
+    Elementy porządkowane są wzdłuż krzywej Z środków i grupowane po NODE_SIZE na węzeł.
+    Każdy węzeł pamięta też prostokąt swojego pierwszego elementu - odległość do niego
+    ogranicza z góry odległość do najbliższego elementu węzła.
+
+    Args:
+        mins: Narożniki minimalne prostokątów (n, wymiar).
+        maxs: Narożniki maksymalne prostokątów (n, wymiar).
+        anchors (optional): Punkty leżące na elementach (n, wymiar) - dla elementów, które nie wypełniają
+                            swojego prostokąta (np. cięciwy osi); górne ograniczenie liczone jest wtedy do punktu.
+
+    Returns:
+        dict z kluczami "items" (numery elementów kolejnych liści), "mins", "maxs"
+        oraz "levels" - listą poziomów (min, max, min pierwszego elementu, max pierwszego elementu)
+        od korzenia do liści.
+    """
+    mins = np.asarray(mins, dtype=float)
+    maxs = np.asarray(maxs, dtype=float)
+    items = np.argsort(get_morton_codes((mins + maxs) / 2), kind="stable")
+    first_mins, first_maxs = (mins, maxs) if anchors is None else (np.asarray(anchors, dtype=float),) * 2
+
+    levels = [(mins[items], maxs[items], first_mins[items], first_maxs[items])]
+    while len(levels[0][0]) > NODE_SIZE:
+        node_mins, node_maxs, first_mins, first_maxs = levels[0]
+        padding = -len(node_mins) % NODE_SIZE
+        node_mins = np.concatenate((node_mins, np.repeat(node_mins[-1:], padding, axis=0))).reshape(-1, NODE_SIZE, mins.shape[1]).min(axis=1)
+        node_maxs = np.concatenate((node_maxs, np.repeat(node_maxs[-1:], padding, axis=0))).reshape(-1, NODE_SIZE, mins.shape[1]).max(axis=1)
+        levels.insert(0, (node_mins, node_maxs, first_mins[::NODE_SIZE], first_maxs[::NODE_SIZE]))
+
+    return {"items": items, "mins": mins, "maxs": maxs, "levels": levels}
+
+
+def _squared_gaps(a_mins, a_maxs, b_mins, b_maxs):
+    # Kwadrat odstępu między prostokątami (0, jeśli się przecinają), po ostatniej osi tablic.
+    gaps = np.maximum(np.maximum(b_mins - a_maxs, a_mins - b_maxs), 0.0)
+    return (gaps * gaps).sum(axis=-1)
+
+
+def _find_nearest_chunk(tree, query_mins, query_maxs, distance_function):
+    n_queries, dimension = query_mins.shape
+    order = np.argsort(get_morton_codes((query_mins + query_maxs) / 2), kind="stable")
+    padding = -n_queries % BLOCK_SIZE
+    block_query_mins = np.concatenate((query_mins[order], np.repeat(query_mins[order[-1:]], padding, axis=0))).reshape(-1, BLOCK_SIZE, dimension)
+    block_query_maxs = np.concatenate((query_maxs[order], np.repeat(query_maxs[order[-1:]], padding, axis=0))).reshape(-1, BLOCK_SIZE, dimension)
+    block_mins, block_maxs = block_query_mins.min(axis=1), block_query_maxs.max(axis=1)
+    n_blocks = len(block_mins)
+
+    levels = tree["levels"]
+    block_ids = np.repeat(np.arange(n_blocks), len(levels[0][0]))
+    node_ids = np.tile(np.arange(len(levels[0][0])), n_blocks)
+    for depth, (node_mins, node_maxs, first_mins, first_maxs) in enumerate(levels):
+        if depth:
+            # Rozwinięcie par do dzieci węzła (porządek według bloku zostaje zachowany)
+            children = node_ids[:, None] * NODE_SIZE + np.arange(NODE_SIZE)
+            valid = children < len(node_mins)
+            block_ids = np.repeat(block_ids, valid.sum(axis=1))
+            node_ids = children[valid]
+
+        # Dolne ograniczenie: odstęp bloku od węzła. Górne: największy możliwy odstęp zapytania z bloku
+        # od pierwszego elementu węzła.
+        lower = _squared_gaps(block_mins[block_ids], block_maxs[block_ids], node_mins[node_ids], node_maxs[node_ids])
+        reach = np.maximum(np.maximum(first_mins[node_ids] - block_mins[block_ids], block_maxs[block_ids] - first_maxs[node_ids]), 0.0)
+        upper = (reach * reach).sum(axis=1)
+        keep = lower <= group_minimum(upper, block_ids, n_blocks)[block_ids]
+        block_ids, node_ids = block_ids[keep], node_ids[keep]
+
+    # Dokładne odstępy wszystkich zapytań bloku od elementów, które przetrwały przycinanie: (pary, BLOCK_SIZE)
+    item_ids = tree["items"][node_ids]
+    if distance_function is None:
+        distances = _squared_gaps(block_query_mins[block_ids], block_query_maxs[block_ids], tree["mins"][item_ids][:, None, :], tree["maxs"][item_ids][:, None, :])
+    else:
+        distances = distance_function(item_ids, block_query_mins[block_ids], block_query_maxs[block_ids])
+    nearest_distances = group_minimum(distances, block_ids, n_blocks)
+    rows = np.where(distances == nearest_distances[block_ids], np.arange(len(block_ids))[:, None], len(block_ids))
+    nearest_rows = group_minimum(rows.astype(float), block_ids, n_blocks).astype(int).reshape(-1)[:n_queries]
+
+    nearest_items = np.empty(n_queries, dtype=int)
+    nearest_items[order] = item_ids[nearest_rows]
+    squared = np.empty(n_queries)
+    squared[order] = nearest_distances.reshape(-1)[:n_queries]
+    return nearest_items, np.sqrt(squared)
+
+
+def find_nearest_boxes(tree, query_mins, query_maxs, distance_function=None):
+    """
+    Znajduje dla każdego prostokąta zapytania najbliższy prostokąt drzewa.
+
+    Zapytania porządkowane są wzdłuż krzywej Z i przeszukują drzewo blokami po BLOCK_SIZE,
+    więc koszt przejścia po drzewie dzieli się na wszystkie zapytania bloku.
+
+    Args:
+        tree (dict): Drzewo z build_bbox_tree().
+        query_mins: Narożniki minimalne zapytań (m, wymiar).
+        query_maxs: Narożniki maksymalne zapytań (m, wymiar).
+        distance_function (optional): Dokładna odległość dla elementów, które nie wypełniają prostokąta
+            (drzewo z anchors): funkcja(numery elementów (pary,), min i max zapytań bloku (pary, BLOCK_SIZE, wymiar))
+            zwracająca kwadraty odległości (pary, BLOCK_SIZE). Domyślnie odstęp prostokątów.
+
+    Returns:
+        (items, distances): numery najbliższych elementów (indeksy wierszy mins/maxs
+        przekazanych do build_bbox_tree) i odstępy od nich (0 dla prostokątów przecinających się).
+    """
+    query_mins = np.atleast_2d(np.asarray(query_mins, dtype=float))
+    query_maxs = np.atleast_2d(np.asarray(query_maxs, dtype=float))
+    items = np.zeros(len(query_mins), dtype=int)
+    distances = np.zeros(len(query_mins))
+    for first in range(0, len(query_mins), CHUNK_SIZE):
+        chunk = slice(first, first + CHUNK_SIZE)
+        items[chunk], distances[chunk] = _find_nearest_chunk(tree, query_mins[chunk], query_maxs[chunk], distance_function)
+    return items, distances
@@ -1,7 +1,44 @@
 import ifcopenshell
 import ifcopenshell.util.element
+from pset_index import build_pset_index, get_indexed_psets
+from step_filter import filter_step_file
+from model_cache import get_cached_pset_index, get_entity_class, get_ids_by_type, get_root_attributes, open_model_cache
 
-def inspect_elements(ifc_path, search_keyword):
+def _print_element(found_elements, element_id, ifc_class, global_id, name, psets):
+    # Wypisuje dane i wszystkie Psety znalezionego elementu.
+    print(f"\n--- Element #{found_elements} ---")
+    print(f"ID: {element_id}")
+    print(f"Typ: {ifc_class}")
+    print(f"GlobalId: {global_id}")
+    print(f"Nazwa: {name}")
+    if psets:
+        print("  Zestawy właściwości (Psets):")
+        for pset_name, properties in psets.items():
+            print(f"    - {pset_name}:")
+            for prop_name, prop_value in properties.items():
+                print(f"        - {prop_name}: {prop_value}")
+    else:
+        print("  Brak zestawów właściwości (Psetów).")
+
+def find_elements(ifc_file, search_keyword, pset_index):
+    """
+    Zwraca elementy IfcProduct, których nazwa zawiera słowo kluczowe (bez rozróżniania wielkości liter).
+
+    Args:
+        ifc_file: Otwarty plik IFC.
+        search_keyword (str): Słowo kluczowe do wyszukania w nazwie elementu.
+        pset_index (dict): Indeks Psetów pliku z build_pset_index().
+
+    Returns:
+        Lista słowników z kluczami "id", "type", "global_id", "name" i "psets".
+    """
+    return [
+        {"id": product.id(), "type": product.is_a(), "global_id": product.GlobalId, "name": product.Name, "psets": get_indexed_psets(pset_index, product)}
+        for product in ifc_file.by_type("IfcProduct")
+        if product.Name and search_keyword.lower() in product.Name.lower()
+    ]
+
+def inspect_elements(ifc_path, search_keyword, property_filters=None, use_cache=False):
     """
     Przeszukuje plik IFC w poszukiwaniu elementów zawierających w nazwie
     dane słowo kluczowe i wypisuje ich wszystkie właściwości.
@@ -9,39 +46,58 @@ def inspect_elements(ifc_path, search_keyword):
     Args:
         ifc_path (str): Ścieżka do pliku IFC.
         search_keyword (str): Słowo kluczowe do wyszukania w nazwie elementu (ignoruje wielkość liter).
+        property_filters (dict, optional): {nazwa właściwości ProVI: akceptowane wartości}.
+                                           Jeśli podane, wczytywane są strumieniowo tylko pasujące
+                                           elementy, zamiast całego pliku.
+        use_cache (bool): Odczyt z pamięci podręcznej modelu (model_cache) zamiast parsowania pliku -
+                          przy kolejnych uruchomieniach dla tego samego pliku trwa milisekundy.
+                          Domyślnie wyłączone: pierwsze użycie zapisuje katalog .ifc_cache/<skrót zawartości>/
+                          obok pliku IFC (katalog jest w .gitignore). Nie dotyczy filtrowania strumieniowego.
     """
+    cache = ifc_file = None
     try:
-        ifc_file = ifcopenshell.open(ifc_path)
-        print(f"Pomyślnie otwarto plik: {ifc_path}")
+        if use_cache and not property_filters:
+            cache = open_model_cache(ifc_path)
+            print(f"Otwarto pamięć podręczną pliku: {ifc_path}")
+        elif property_filters:
+            ifc_file = filter_step_file(ifc_path, "ProVI", property_filters)
+        else:
+            ifc_file = ifcopenshell.open(ifc_path)
+        if ifc_file is not None:
+            print(f"Pomyślnie otwarto plik: {ifc_path}")
     except Exception as e:
         print(f"Błąd podczas otwierania pliku {ifc_path}: {e}")
         return
 
+    if cache is not None:
+        product_ids = get_ids_by_type(cache, "IfcProduct")
+        print(f"\nZnaleziono {len(product_ids)} elementów IfcProduct. Przeszukiwanie w poszukiwaniu słowa kluczowego: '{search_keyword}'...")
+        root_attributes = get_root_attributes(cache)
+        pset_index = get_cached_pset_index(cache)
+        found_elements = 0
+        for product_id in product_ids.tolist():
+            global_id, name = root_attributes[product_id]
+            if name and search_keyword.lower() in name.lower():
+                found_elements += 1
+                _print_element(found_elements, product_id, get_entity_class(cache, product_id), global_id, name, pset_index["psets"].get(product_id, {}))
+        if found_elements == 0:
+            print(f"\nNie znaleziono żadnych elementów z nazwą zawierającą '{search_keyword}'.")
+        else:
+            print(f"\nPrzeszukiwanie zakończone. Znaleziono {found_elements} pasujących elementów.")
+        return
+
     products = ifc_file.by_type("IfcProduct")
     print(f"\nZnaleziono {len(products)} elementów IfcProduct. Przeszukiwanie w poszukiwaniu słowa kluczowego: '{search_keyword}'...")
 
+    # Psety całego pliku odczytujemy jednorazowo, zamiast get_psets() dla każdego elementu
+    pset_index = build_pset_index(ifc_file)
+
     found_elements = 0
-    for product in products:
-        # Sprawdzamy nazwę elementu, jeśli istnieje
-        if product.Name and search_keyword.lower() in product.Name.lower():
-            found_elements += 1
-            print(f"\n--- Element #{found_elements} ---")
-            print(f"ID: {product.id()}")
-            print(f"Typ: {product.is_a()}")
-            print(f"GlobalId: {product.GlobalId}")
-            print(f"Nazwa: {product.Name}")
-            
-            # Pobieranie i wypisywanie wszystkich Psetów
-            psets = ifcopenshell.util.element.get_psets(product)
-            if psets:
-                print("  Zestawy właściwości (Psets):")
-                for pset_name, properties in psets.items():
-                    print(f"    - {pset_name}:")
-                    for prop_name, prop_value in properties.items():
-                        print(f"        - {prop_name}: {prop_value}")
-            else:
-                print("  Brak zestawów właściwości (Psetów).")
-    
+    for element in find_elements(ifc_file, search_keyword, pset_index):
+        found_elements += 1
+        # Wypisywanie danych i wszystkich Psetów elementu
+        _print_element(found_elements, element["id"], element["type"], element["global_id"], element["name"], element["psets"])
+
     if found_elements == 0:
         print(f"\nNie znaleziono żadnych elementów z nazwą zawierającą '{search_keyword}'.")
     else:
@@ -1,4 +1,23 @@
+import concurrent.futures
+import csv
+import multiprocessing
+import time
+import numpy as np
 import ifcopenshell
+import ifcopenshell.geom
+
+# Trójkąty o mniejszym polu [m²] liczone są jako zdegenerowane
+MIN_TRIANGLE_AREA = 1e-10
+
+# Identyfikatory reprezentacji triangulowanych przez iterator geometrii (None - brak identyfikatora)
+BODY_IDENTIFIERS = (None, "Body", "Facetation")
+
+# Kolejność kolumn tabeli wyników scan_geometry()
+SCAN_COLUMNS = [
+    "id", "global_id", "ifc_class", "name", "status", "time",
+    "vertex_count", "triangle_count", "degenerate_triangles",
+    "min_x", "min_y", "min_z", "max_x", "max_y", "max_z", "error",
+]
 
 def verify_element_type(ifc_path, element_name):
     """
@@ -15,21 +34,180 @@ def verify_element_type(ifc_path, element_name):
         print(f"Błąd podczas otwierania pliku {ifc_path}: {e}")
         return
 
-    elements = ifc_file.by_type("IfcProduct")
-    found = False
-    for element in elements:
-        if element.Name == element_name:
-            found = True
-            print(f"\nZnaleziono element o nazwie: '{element_name}'")
-            print(f"  - Jego FAKTYCZNY typ w pliku to: {element.is_a()}")
-            break
-    
-    if not found:
+    element_type = find_element_type(ifc_file, element_name)
+    if element_type is not None:
+        print(f"\nZnaleziono element o nazwie: '{element_name}'")
+        print(f"  - Jego FAKTYCZNY typ w pliku to: {element_type}")
+    else:
         print(f"\nNie znaleziono elementu o nazwie '{element_name}' w pliku.")
 
+
+def find_element_type(ifc_file, element_name):
+    """Zwraca klasę IFC pierwszego elementu IfcProduct o podanej nazwie lub None, jeśli go nie ma."""
+    for element in ifc_file.by_type("IfcProduct"):
+        if element.Name == element_name:
+            return element.is_a()
+    return None
+
+
+def _describe_shape(vertices, faces):
+    # Status, liczba zdegenerowanych trójkątów i prostokąt otaczający triangulacji.
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+    triangles = np.asarray(faces, dtype=int).reshape(-1, 3)
+    if not len(vertices):
+        return "empty", 0, None
+    corners = vertices[triangles]
+    areas = np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1) / 2
+    degenerate_triangles = int((areas < MIN_TRIANGLE_AREA).sum())
+    # Bez trójkątów o niezerowym polu (same krawędzie, punkty albo zdegenerowana siatka)
+    status = "degenerate" if degenerate_triangles == len(triangles) else "ok"
+    return status, degenerate_triangles, (vertices.min(axis=0), vertices.max(axis=0))
+
+
+def scan_shard(ifc_path, product_ids):
+    """
+    Trianguluje część elementów i mierzy czas każdego z nich. Uruchamiane w osobnym procesie.
+
+    Iterator geometrii w trybie jednowątkowym liczy kolejny kształt dopiero w next(),
+    więc odstęp między kolejnymi wynikami to czas triangulacji jednego elementu.
+    Elementów, które iterator pominął, nie udało się przetworzyć - dla nich
+    create_shape() podaje komunikat błędu (albo pustą geometrię spoza kontekstu Body).
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC.
+        product_ids (list): Id elementów (z reprezentacją) do sprawdzenia.
+
+    Returns:
+        dict {id elementu: (status, czas [s], liczba wierzchołków, liczba trójkątów,
+        liczba zdegenerowanych trójkątów, prostokąt otaczający lub None, komunikat błędu)}.
+    """
+    ifc_file = ifcopenshell.open(ifc_path)
+    settings = ifcopenshell.geom.settings()
+    settings.set("use-world-coords", True)
+    results = {}
+
+    iterator = ifcopenshell.geom.iterator(settings, ifc_file, 1, include=[ifc_file.by_id(product_id) for product_id in product_ids])
+    started = time.perf_counter()
+    if iterator.initialize():
+        while True:
+            shape = iterator.get()
+            finished = time.perf_counter()
+            vertices, faces = shape.geometry.verts, shape.geometry.faces
+            status, degenerate_triangles, bbox = _describe_shape(vertices, faces)
+            results[shape.id] = (status, finished - started, len(vertices) // 3, len(faces) // 3, degenerate_triangles, bbox, "")
+            started = time.perf_counter()
+            if not iterator.next():
+                break
+
+    for product_id in product_ids:
+        if product_id in results:
+            continue
+        started = time.perf_counter()
+        try:
+            shape = ifcopenshell.geom.create_shape(settings, ifc_file.by_id(product_id))
+        except Exception as e:
+            results[product_id] = ("failed", time.perf_counter() - started, 0, 0, 0, None, str(e))
+            continue
+        finished = time.perf_counter()
+        vertices, faces = shape.geometry.verts, shape.geometry.faces
+        status, degenerate_triangles, bbox = _describe_shape(vertices, faces)
+        results[product_id] = (status, finished - started, len(vertices) // 3, len(faces) // 3, degenerate_triangles, bbox, "")
+    return results
+
+
+def scan_geometry(ifc_path, worker_count=None):
+    """
+    Sprawdza geometrię wszystkich elementów z reprezentacją: czas triangulacji,
+    prostokąt otaczający, puste i zdegenerowane reprezentacje oraz błędy.
+
+    Elementy dzielone są na worker_count części przetwarzanych równolegle przez scan_shard().
+    Elementy mające wyłącznie reprezentacje inne niż bryłowe (oś, adnotacje 2D) nie są
+    triangulowane - dostają status "no_body".
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC.
+        worker_count (int, optional): Liczba procesów; domyślnie liczba rdzeni.
+
+    Returns:
+        Tabela kolumnowa: dict {nazwa kolumny (SCAN_COLUMNS): lista wartości},
+        wiersze posortowane malejąco według czasu triangulacji.
+    """
+    ifc_file = ifcopenshell.open(ifc_path)
+    products = [product for product in ifc_file.by_type("IfcProduct") if product.Representation]
+    product_ids = [
+        product.id() for product in products
+        if any(representation.RepresentationIdentifier in BODY_IDENTIFIERS for representation in product.Representation.Representations)
+    ]
+
+    worker_count = max(1, min(worker_count or multiprocessing.cpu_count(), len(product_ids)))
+    results = {}
+    if worker_count == 1:
+        results = scan_shard(ifc_path, product_ids)
+    elif product_ids:
+        # Przeplatane części - elementy tego samego typu (o podobnym koszcie) trafiają do wszystkich procesów
+        shards = [product_ids[i::worker_count] for i in range(worker_count)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count) as executor:
+            for shard_results in executor.map(scan_shard, [ifc_path] * worker_count, shards):
+                results.update(shard_results)
+    for product in products:
+        results.setdefault(product.id(), ("no_body", 0.0, 0, 0, 0, None, ""))
+
+    table = {column: [] for column in SCAN_COLUMNS}
+    for product in sorted(products, key=lambda product: -results[product.id()][1]):
+        status, duration, vertex_count, triangle_count, degenerate_triangles, bbox, error = results[product.id()]
+        table["id"].append(product.id())
+        table["global_id"].append(product.GlobalId)
+        table["ifc_class"].append(product.is_a())
+        table["name"].append(product.Name)
+        table["status"].append(status)
+        table["time"].append(duration)
+        table["vertex_count"].append(vertex_count)
+        table["triangle_count"].append(triangle_count)
+        table["degenerate_triangles"].append(degenerate_triangles)
+        for axis, coordinate in enumerate("xyz"):
+            table[f"min_{coordinate}"].append(bbox[0][axis] if bbox else None)
+            table[f"max_{coordinate}"].append(bbox[1][axis] if bbox else None)
+        table["error"].append(error)
+    return table
+
+
+def write_scan_table(table, csv_path):
+    """Zapisuje tabelę z scan_geometry() do pliku CSV (jeden wiersz na element)."""
+    with open(csv_path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(SCAN_COLUMNS)
+        writer.writerows(zip(*(table[column] for column in SCAN_COLUMNS)))
+
+
+def print_scan_summary(table, top_count=10):
+    """Wypisuje podsumowanie skanu: liczby elementów według statusu i najwolniejsze elementy."""
+    statuses = {}
+    for status in table["status"]:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"\nSprawdzono {len(table['id'])} elementów, łączny czas triangulacji: {sum(table['time']):.2f} s")
+    for status, count in sorted(statuses.items()):
+        print(f"  - {status}: {count}")
+
+    print(f"\nNajwolniejsze elementy (top {top_count}):")
+    for i in range(min(top_count, len(table["id"]))):
+        print(f"  {table['time'][i]:8.3f} s  #{table['id'][i]} {table['ifc_class'][i]} '{table['name'][i]}' ({table['triangle_count'][i]} trójkątów)")
+
+    problems = [i for i, status in enumerate(table["status"]) if status not in ("ok", "no_body")]
+    if problems:
+        print("\nElementy z problemami geometrii:")
+        for i in problems:
+            print(f"  - #{table['id'][i]} {table['ifc_class'][i]} '{table['name'][i]}': {table['status'][i]} {table['error'][i]}")
+
 if __name__ == "__main__":
     output_ifc_path = "/Users/wojtek/Blender/BM_Strasse_4x3_upgraded.ifc"
     terrain_element_name = "B_Terrain_ausgeschnitten.GEL"
-    
+    scan_csv_path = "/Users/wojtek/Blender/BM_Strasse_4x3_upgraded_geometry.csv"
+
     print(f"--- Weryfikacja pliku: {output_ifc_path} ---")
-    verify_element_type(output_ifc_path, terrain_element_name)
\ No newline at end of file
+    verify_element_type(output_ifc_path, terrain_element_name)
+
+    print(f"\n--- Skan geometrii: {output_ifc_path} ---")
+    scan_table = scan_geometry(output_ifc_path)
+    print_scan_summary(scan_table)
+    write_scan_table(scan_table, scan_csv_path)
+    print(f"\nZapisano tabelę wyników: {scan_csv_path}")
@@ -0,0 +1,134 @@
+import concurrent.futures
+import gzip
+import multiprocessing
+import os
+import zipfile
+import ifcopenshell
+
+# Poniżej tej liczby encji plik zapisywany jest w jednym procesie (koszt uruchomienia procesów przeważa)
+MIN_PARALLEL_ENTITIES = 50000
+
+# Liczba fragmentów na proces - mniejsze fragmenty wyrównują obciążenie procesów
+CHUNKS_PER_WORKER = 4
+
+# Model zapisywany przez procesy robocze - dziedziczony przy fork(), bez kopiowania i serializacji
+_WRITER_FILE = None
+
+
+def get_header_text(ifc_file):
+    """
+    Zwraca nagłówek pliku STEP (od ISO-10303-21; do DATA; włącznie) taki, jak zapisuje ifc_file.write().
+
+    Nagłówek serializowany jest z pustego pliku o tym samym schemacie i nagłówku,
+    więc nie wymaga serializacji całego modelu.
+    """
+    header_file = ifcopenshell.file(schema=ifc_file.schema_identifier)
+    header_file.assign_header_from(ifc_file)
+    # Zachowanie zapisu identyfikatora schematu z pliku źródłowego (np. 'IFC4x3_ADD2')
+    header_file.header.file_schema.schema_identifiers = ifc_file.header.file_schema.schema_identifiers
+    header_text = header_file.to_string()
+    return header_text[:header_text.index("DATA;") + len("DATA;")] + "\n"
+
+
+def serialize_id_range(first_id, last_id, compress=False):
+    """
+    Serializuje encje o id z zakresu [first_id, last_id] do linii sekcji DATA.
+
+    Uruchamiane w procesie roboczym (model z _WRITER_FILE) lub w procesie głównym.
+    Brakujące id (usunięte encje) są pomijane.
+
+    Args:
+        first_id (int): Pierwsze id zakresu.
+        last_id (int): Ostatnie id zakresu (włącznie).
+        compress (bool): Zwraca fragment skompresowany jako osobny człon gzip.
+
+    Returns:
+        Tekst fragmentu (str) lub skompresowane bajty (bytes), jeśli compress.
+    """
+    lines = []
+    for entity_id in range(first_id, last_id + 1):
+        try:
+            entity = _WRITER_FILE.by_id(entity_id)
+        except RuntimeError:
+            continue
+        lines.append(entity.to_string())
+        lines.append(";\n")
+    chunk = "".join(lines)
+    if compress:
+        return gzip.compress(chunk.encode("utf-8"), compresslevel=6)
+    return chunk
+
+
+def _get_worker_count(ifc_file, worker_count):
+    # Liczba procesów zapisu: 1 dla małych modeli i bez fork() (Windows) - procesy robocze dziedziczą model tylko przy fork().
+    if ifc_file.get_max_id() < MIN_PARALLEL_ENTITIES or "fork" not in multiprocessing.get_all_start_methods():
+        return 1
+    return max(1, worker_count or multiprocessing.cpu_count())
+
+
+def _iterate_chunks(ifc_file, worker_count, compress):
+    # Zwraca kolejne fragmenty sekcji DATA (w kolejności id), serializowane w worker_count procesach.
+    global _WRITER_FILE
+    max_id = ifc_file.get_max_id()
+    chunk_count = worker_count * CHUNKS_PER_WORKER if worker_count > 1 else 1
+    chunk_size = -(-max_id // chunk_count) if max_id else 1
+    ranges = [(first_id, min(first_id + chunk_size - 1, max_id)) for first_id in range(1, max_id + 1, chunk_size)]
+
+    _WRITER_FILE = ifc_file
+    try:
+        if worker_count == 1:
+            for first_id, last_id in ranges:
+                yield serialize_id_range(first_id, last_id, compress)
+            return
+        with concurrent.futures.ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context("fork")) as executor:
+            yield from executor.map(serialize_id_range, [first_id for first_id, _ in ranges], [last_id for _, last_id in ranges], [compress] * len(ranges))
+    finally:
+        _WRITER_FILE = None
+
+
+def write_ifc(ifc_file, output_path, worker_count=None):
+    """
+    Zapisuje model IFC, serializując zakresy id encji równolegle w procesach roboczych.
+
+    Wynik jest taki sam jak z ifc_file.write(). Format wybierany jest według rozszerzenia:
+    - .ifc: tekst STEP,
+    - .gz (np. model.ifc.gz): gzip - każdy fragment kompresowany jest w swoim procesie
+      jako osobny człon gzip (plik wieloczłonowy, odczytywany przez gzip/gunzip jak jeden),
+    - .ifczip: archiwum ZIP z jednym plikiem .ifc, zapisywane strumieniowo (bez pliku pośredniego).
+    Procesy dziedziczą model przez fork(); małe modele i systemy bez fork() zapisywane są w jednym procesie
+    (plik .ifc wtedy przez ifc_file.write()).
+
+    Args:
+        ifc_file: Otwarty plik IFC.
+        output_path (str): Ścieżka pliku wynikowego.
+        worker_count (int, optional): Liczba procesów; domyślnie liczba rdzeni.
+    """
+    worker_count = _get_worker_count(ifc_file, worker_count)
+    extension = os.path.splitext(output_path)[1].lower()
+    if worker_count == 1 and extension not in (".gz", ".ifczip"):
+        ifc_file.write(output_path)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    header_text = get_header_text(ifc_file)
+    footer_text = "ENDSEC;\nEND-ISO-10303-21;\n"
+
+    if extension == ".gz":
+        with open(output_path, "wb") as output_file:
+            output_file.write(gzip.compress(header_text.encode("utf-8")))
+            for chunk in _iterate_chunks(ifc_file, worker_count, compress=True):
+                output_file.write(chunk)
+            output_file.write(gzip.compress(footer_text.encode("utf-8")))
+    elif extension == ".ifczip":
+        entry_name = os.path.splitext(os.path.basename(output_path))[0] + ".ifc"
+        with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+            with zip_file.open(entry_name, "w", force_zip64=True) as output_file:
+                output_file.write(header_text.encode("utf-8"))
+                for chunk in _iterate_chunks(ifc_file, worker_count, compress=False):
+                    output_file.write(chunk.encode("utf-8"))
+                output_file.write(footer_text.encode("utf-8"))
+    else:
+        with open(output_path, "w", encoding="utf-8", newline="\n") as output_file:
+            output_file.write(header_text)
+            for chunk in _iterate_chunks(ifc_file, worker_count, compress=False):
+                output_file.write(chunk)
+            output_file.write(footer_text)
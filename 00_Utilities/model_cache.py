@@ -0,0 +1,273 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import ifcopenshell
+import ifcopenshell.ifcopenshell_wrapper
+
+from pset_index import build_pset_index
+from step_filter import STEP_ENTITY_PATTERN, STEP_REFERENCE_PATTERN
+
+# Wersja formatu - pamięć podręczna w innej wersji jest budowana od nowa
+CACHE_FORMAT_VERSION = 1
+
+# Katalog pamięci podręcznej, tworzony obok pliku IFC
+CACHE_DIR_NAME = ".ifc_cache"
+
+# Kolumny zapisywane jako pliki .npy (odczytywane przez mmap)
+CACHE_COLUMNS = [
+    "entity_ids", "entity_classes",
+    "reference_offsets", "reference_ids", "inverse_offsets", "inverse_ids",
+    "root_ids", "root_global_ids", "root_names",
+    "pset_element_ids", "pset_names", "pset_property_names", "pset_values",
+]
+
+
+def get_file_hash(ifc_path):
+    """Zwraca skrót SHA-1 zawartości pliku (klucz pamięci podręcznej)."""
+    digest = hashlib.sha1()
+    with open(ifc_path, "rb") as ifc_file:
+        for block in iter(lambda: ifc_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_cache_path(ifc_path, file_hash):
+    """Zwraca katalog pamięci podręcznej pliku IFC o podanym skrócie."""
+    return os.path.join(os.path.dirname(os.path.abspath(ifc_path)), CACHE_DIR_NAME, file_hash)
+
+
+def _encode(value, table, codes):
+    # Zwraca kod wartości w tabeli unikalnych wartości (kolumny przechowują kody zamiast tekstów).
+    key = json.dumps(value, sort_keys=True, default=str)
+    code = codes.get(key)
+    if code is None:
+        code = codes[key] = len(table)
+        table.append(value)
+    return code
+
+
+def _csr(pairs, entity_ids):
+    # Zamienia pary (id encji, id powiązanej encji) na listy sąsiedztwa w układzie CSR:
+    # powiązane encje encji entity_ids[i] to ids[offsets[i]:offsets[i + 1]].
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+    positions = np.searchsorted(entity_ids, pairs[:, 0])
+    offsets = np.zeros(len(entity_ids) + 1, dtype=np.int64)
+    np.add.at(offsets, positions + 1, 1)
+    return np.cumsum(offsets), pairs[:, 1].copy()
+
+
+def build_model_cache(ifc_path, cache_path):
+    """
+    Parsuje plik IFC i zapisuje jego tabele kolumnowe w katalogu cache_path.
+
+    Zapisywane są:
+    - tabela encji: id i klasa każdej encji,
+    - indeks referencji i indeks odwrotny (kto wskazuje na encję) w układzie CSR,
+    - kolumny atrybutów IfcRoot: GlobalId i Name,
+    - tabela Psetów z build_pset_index(): wiersze (id elementu, Pset, właściwość, wartość).
+    Teksty i wartości właściwości kodowane są przez tabele unikalnych wartości w metadata.json.
+    Katalog tworzony jest obok i podmieniany w całości, więc równoległe budowanie jest bezpieczne.
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC.
+        cache_path (str): Katalog docelowy (z get_cache_path()).
+    """
+    with open(ifc_path, "rb") as step_file:
+        step_text = step_file.read()
+    ifc_file = ifcopenshell.open(ifc_path)
+    schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(ifc_file.schema_identifier)
+
+    # Tabela encji i referencje - bezpośrednio z tekstu STEP, bez tworzenia obiektów encji
+    statements = list(STEP_ENTITY_PATTERN.finditer(step_text))
+    class_names = []
+    class_codes = {}
+    entity_ids = []
+    entity_classes = []
+    references = []
+    for i, statement in enumerate(statements):
+        entity_id = int(statement.group(1))
+        step_class = statement.group(2).decode("ascii")
+        if step_class not in class_codes:
+            class_codes[step_class] = len(class_names)
+            class_names.append(schema.declaration_by_name(step_class).name())
+        entity_ids.append(entity_id)
+        entity_classes.append(class_codes[step_class])
+        end = statements[i + 1].start() if i + 1 < len(statements) else len(step_text)
+        for match in STEP_REFERENCE_PATTERN.finditer(step_text, statement.end(), end):
+            if match.group(1) is not None:
+                references.append((entity_id, int(match.group(1))))
+
+    order = np.argsort(entity_ids)
+    entity_ids = np.asarray(entity_ids, dtype=np.int64)[order]
+    columns = {"entity_ids": entity_ids, "entity_classes": np.asarray(entity_classes, dtype=np.int32)[order]}
+    columns["reference_offsets"], columns["reference_ids"] = _csr(references, entity_ids)
+    columns["inverse_offsets"], columns["inverse_ids"] = _csr([(target, source) for source, target in references], entity_ids)
+
+    strings = []
+    string_codes = {}
+    roots = ifc_file.by_type("IfcRoot")
+    columns["root_ids"] = np.asarray([root.id() for root in roots], dtype=np.int64)
+    columns["root_global_ids"] = np.asarray([root.GlobalId for root in roots], dtype="S22")
+    columns["root_names"] = np.asarray([_encode(root.Name, strings, string_codes) for root in roots], dtype=np.int32)
+
+    values = []
+    value_codes = {}
+    rows = []
+    for element_id, element_psets in build_pset_index(ifc_file)["psets"].items():
+        for pset_name, properties in element_psets.items():
+            for property_name, value in properties.items():
+                rows.append((element_id, _encode(pset_name, strings, string_codes), _encode(property_name, strings, string_codes), _encode(value, values, value_codes)))
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+    columns["pset_element_ids"] = rows[:, 0].copy()
+    columns["pset_names"] = rows[:, 1].astype(np.int32)
+    columns["pset_property_names"] = rows[:, 2].astype(np.int32)
+    columns["pset_values"] = rows[:, 3].astype(np.int32)
+
+    metadata = {
+        "version": CACHE_FORMAT_VERSION,
+        "source": os.path.abspath(ifc_path),
+        "schema": ifc_file.schema_identifier,
+        "class_names": class_names,
+        "strings": strings,
+        "values": values,
+    }
+    parent_dir = os.path.dirname(cache_path)
+    os.makedirs(parent_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=parent_dir)
+    for name in CACHE_COLUMNS:
+        np.save(os.path.join(temp_dir, f"{name}.npy"), columns[name])
+    with open(os.path.join(temp_dir, "metadata.json"), "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file, ensure_ascii=False, default=str)
+    try:
+        os.rename(temp_dir, cache_path)
+    except OSError:
+        # Inny proces zdążył zapisać tę samą pamięć podręczną
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def open_model_cache(ifc_path):
+    """
+    Otwiera pamięć podręczną modelu (budując ją przy pierwszym użyciu pliku o danej zawartości).
+
+    Kluczem jest skrót zawartości pliku, więc zmieniony plik dostaje nową pamięć podręczną.
+    Kolumny mapowane są z dysku (np.load z mmap_mode="r") - otwarcie nie parsuje pliku IFC
+    i trwa milisekundy niezależnie od rozmiaru modelu.
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC.
+
+    Returns:
+        dict z kolumnami (CACHE_COLUMNS, tablice numpy tylko do odczytu) oraz kluczami
+        "schema", "class_names", "strings" i "values" z metadata.json.
+    """
+    cache_path = get_cache_path(ifc_path, get_file_hash(ifc_path))
+    metadata_path = os.path.join(cache_path, "metadata.json")
+    metadata = None
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+    if metadata is None or metadata["version"] != CACHE_FORMAT_VERSION:
+        shutil.rmtree(cache_path, ignore_errors=True)
+        build_model_cache(ifc_path, cache_path)
+        with open(metadata_path, "r", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+
+    cache = {name: np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode="r") for name in CACHE_COLUMNS}
+    cache.update({key: metadata[key] for key in ("schema", "class_names", "strings", "values")})
+    return cache
+
+
+def _entity_index(cache, entity_id):
+    # Pozycja encji w tabeli encji (id są posortowane).
+    index = int(np.searchsorted(cache["entity_ids"], entity_id))
+    if index == len(cache["entity_ids"]) or cache["entity_ids"][index] != entity_id:
+        raise KeyError(f"Brak encji #{entity_id} w pamięci podręcznej.")
+    return index
+
+
+def get_entity_class(cache, entity_id):
+    """Zwraca klasę IFC encji o podanym id."""
+    return cache["class_names"][cache["entity_classes"][_entity_index(cache, entity_id)]]
+
+
+def get_ids_by_type(cache, ifc_class, include_subtypes=True):
+    """
+    Zwraca id encji danej klasy (odpowiednik by_type()).
+
+    Args:
+        cache (dict): Pamięć podręczna z open_model_cache().
+        ifc_class (str): Nazwa klasy, np. "IfcProduct".
+        include_subtypes (bool): Uwzględnia klasy pochodne.
+
+    Returns:
+        Tablica id encji (rosnąco).
+    """
+    schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(cache["schema"])
+    wanted = schema.declaration_by_name(ifc_class).name()
+    codes = []
+    for code, class_name in enumerate(cache["class_names"]):
+        declaration = schema.declaration_by_name(class_name)
+        while declaration is not None and include_subtypes and declaration.name() != wanted:
+            declaration = declaration.supertype()
+        if declaration is not None and declaration.name() == wanted:
+            codes.append(code)
+    return np.asarray(cache["entity_ids"][np.isin(cache["entity_classes"], codes)])
+
+
+def get_references(cache, entity_id):
+    """Zwraca id encji, na które wskazuje encja (jej atrybuty)."""
+    index = _entity_index(cache, entity_id)
+    return np.asarray(cache["reference_ids"][cache["reference_offsets"][index]:cache["reference_offsets"][index + 1]])
+
+
+def get_inverse_references(cache, entity_id):
+    """Zwraca id encji, które wskazują na encję (odpowiednik get_inverse())."""
+    index = _entity_index(cache, entity_id)
+    return np.asarray(cache["inverse_ids"][cache["inverse_offsets"][index]:cache["inverse_offsets"][index + 1]])
+
+
+def get_root_attributes(cache):
+    """
+    Zwraca GlobalId i Name wszystkich encji IfcRoot.
+
+    Returns:
+        dict {id encji: (GlobalId, Name)}.
+    """
+    strings = cache["strings"]
+    return {
+        int(entity_id): (global_id.decode("ascii"), strings[name])
+        for entity_id, global_id, name in zip(cache["root_ids"], cache["root_global_ids"], cache["root_names"])
+    }
+
+
+def get_cached_pset_index(cache):
+    """
+    Odtwarza indeks Psetów z pamięci podręcznej - w tym samym układzie co build_pset_index().
+
+    Returns:
+        dict z kluczami "psets" i "values" (jak z build_pset_index()).
+    """
+    strings = cache["strings"]
+    values = cache["values"]
+    psets = {}
+    for element_id, pset_name, property_name, value in zip(
+        cache["pset_element_ids"].tolist(), cache["pset_names"].tolist(), cache["pset_property_names"].tolist(), cache["pset_values"].tolist()
+    ):
+        psets.setdefault(element_id, {}).setdefault(strings[pset_name], {})[strings[property_name]] = values[value]
+
+    value_index = {}
+    for element_id, element_psets in psets.items():
+        for pset_name, properties in element_psets.items():
+            for property_name, value in properties.items():
+                if property_name == "id":
+                    continue
+                try:
+                    value_index.setdefault((pset_name, property_name), {}).setdefault(value, set()).add(element_id)
+                except TypeError:
+                    # Wartości nie-haszowalne (np. listy) są dostępne tylko przez "psets"
+                    pass
+    return {"psets": psets, "values": value_index}
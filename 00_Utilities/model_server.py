@@ -0,0 +1,232 @@
+import http.server
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import ifcopenshell
+import ifcopenshell.ifcopenshell_wrapper
+
+# Skrypty analityczne z katalogów tematycznych (analyze_axis, debug_schema_full)
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_DIR, "Stakeout_Points", "03_Scripts"))
+sys.path.insert(0, os.path.join(REPO_DIR, "Annotation", "03_Scripts"))
+from pset_index import build_pset_index
+from check_ifc_elements import find_elements
+from check_ifc_geometry import find_element_type, scan_geometry
+from analyze_axis import get_axis_analysis
+from debug_schema_full import get_all_attributes
+
+# Serwer nasłuchuje wyłącznie lokalnie
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+
+
+def create_server_state():
+    """
+    Tworzy pusty stan serwera: modele, schematy i wyniki skanów geometrii trzymane w pamięci.
+
+    Returns:
+        dict z kluczami "models" ({ścieżka: wpis z get_model()}), "schemas" ({nazwa: schemat})
+        i "scans" ({ścieżka: (sygnatura pliku, tabela z scan_geometry())}).
+    """
+    return {"models": {}, "schemas": {}, "scans": {}}
+
+
+def _file_signature(ifc_path):
+    # Czas modyfikacji i rozmiar pliku - zmiana oznacza, że model trzeba wczytać ponownie.
+    stat = os.stat(ifc_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_model(state, ifc_path):
+    """
+    Zwraca model z pamięci serwera, wczytując go przy pierwszym użyciu lub po zmianie pliku.
+
+    Args:
+        state (dict): Stan serwera z create_server_state().
+        ifc_path (str): Ścieżka do pliku IFC.
+
+    Returns:
+        dict z kluczami "file" (otwarty plik IFC), "signature", "load_time" [s]
+        i "pset_index" (budowany przy pierwszym zapytaniu o Psety, inaczej None).
+    """
+    ifc_path = os.path.abspath(ifc_path)
+    signature = _file_signature(ifc_path)
+    model = state["models"].get(ifc_path)
+    if model is None or model["signature"] != signature:
+        started = time.perf_counter()
+        ifc_file = ifcopenshell.open(ifc_path)
+        model = {"file": ifc_file, "signature": signature, "load_time": time.perf_counter() - started, "pset_index": None}
+        state["models"][ifc_path] = model
+        print(f"Wczytano model: {ifc_path} ({model['load_time']:.2f} s)")
+    return model
+
+
+def get_model_pset_index(state, ifc_path):
+    """Zwraca indeks Psetów modelu (build_pset_index()), budowany raz dla każdej wersji pliku."""
+    model = get_model(state, ifc_path)
+    if model["pset_index"] is None:
+        model["pset_index"] = build_pset_index(model["file"])
+    return model["pset_index"]
+
+
+def get_schema(state, schema_name):
+    """Zwraca (i zapamiętuje) schemat IFC o podanej nazwie, np. "IFC4X3_ADD2"."""
+    if schema_name not in state["schemas"]:
+        state["schemas"][schema_name] = ifcopenshell.ifcopenshell_wrapper.schema_by_name(schema_name)
+    return state["schemas"][schema_name]
+
+
+def _inspect(state, path, keyword):
+    # Elementy z nazwą zawierającą słowo kluczowe, wraz z Psetami (check_ifc_elements).
+    return find_elements(get_model(state, path)["file"], keyword, get_model_pset_index(state, path))
+
+
+def _verify(state, path, name):
+    # Klasa elementu o podanej nazwie (check_ifc_geometry.verify_element_type).
+    return {"name": name, "type": find_element_type(get_model(state, path)["file"], name)}
+
+
+def _scan(state, path, top="10"):
+    # Skan geometrii (check_ifc_geometry.scan_geometry), liczony raz dla każdej wersji pliku.
+    path = os.path.abspath(path)
+    signature = _file_signature(path)
+    if path not in state["scans"] or state["scans"][path][0] != signature:
+        state["scans"][path] = (signature, scan_geometry(path))
+    table = state["scans"][path][1]
+    rows = [dict(zip(table, values)) for values in zip(*table.values())]
+    statuses = {}
+    for row in rows:
+        statuses[row["status"]] = statuses.get(row["status"], 0) + 1
+    return {
+        "element_count": len(rows),
+        "total_time": sum(table["time"]),
+        "statuses": statuses,
+        "slowest": rows[:int(top)],
+        "problems": [row for row in rows if row["status"] not in ("ok", "no_body")],
+    }
+
+
+def _analyze_axis(state, path):
+    # Geometria i właściwości ProVI osi z polilinii (analyze_axis).
+    return get_axis_analysis(get_model(state, path)["file"])
+
+
+def _schema_attributes(state, entity, schema="IFC4X3_ADD2"):
+    # Atrybuty encji schematu wraz z dziedziczonymi (debug_schema_full).
+    declaration = get_schema(state, schema).declaration_by_name(entity)
+    return [{"declared_in": declared_in, "name": name} for declared_in, name in get_all_attributes(declaration)]
+
+
+def _models(state):
+    # Modele trzymane w pamięci serwera.
+    return [
+        {"path": path, "load_time": model["load_time"], "pset_index": model["pset_index"] is not None}
+        for path, model in state["models"].items()
+    ]
+
+
+def _unload(state, path=None):
+    # Usuwa z pamięci jeden model (path) albo wszystkie.
+    paths = [os.path.abspath(path)] if path else list(state["models"])
+    for model_path in paths:
+        state["models"].pop(model_path, None)
+        state["scans"].pop(model_path, None)
+    return {"unloaded": paths}
+
+
+# Operacje serwera: nazwa (ścieżka URL) -> funkcja(stan, **parametry zapytania)
+OPERATIONS = {
+    "inspect": _inspect,
+    "verify": _verify,
+    "scan": _scan,
+    "analyze_axis": _analyze_axis,
+    "schema": _schema_attributes,
+    "models": _models,
+    "unload": _unload,
+}
+
+
+def create_model_server(host=SERVER_HOST, port=SERVER_PORT):
+    """
+    Tworzy serwer HTTP z modelami trzymanymi w pamięci między zapytaniami.
+
+    Zapytanie GET /<operacja>?parametr=wartość (operacje w OPERATIONS) zwraca JSON
+    {"result": ..., "time": czas obsługi [ms]} albo {"error": ...} z kodem 400/404/500.
+    Pierwsze zapytanie o dany plik wczytuje model, kolejne korzystają z modelu w pamięci.
+    Serwer obsługuje zapytania po kolei (ifcopenshell.file nie jest bezpieczny wielowątkowo).
+
+    Args:
+        host (str): Adres nasłuchu (domyślnie tylko lokalny).
+        port (int): Port.
+
+    Returns:
+        http.server.HTTPServer - uruchamiany przez serve_forever().
+    """
+    state = create_server_state()
+
+    class ModelRequestHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            started = time.perf_counter()
+            url = urllib.parse.urlparse(self.path)
+            operation = OPERATIONS.get(url.path.strip("/"))
+            params = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+            if operation is None:
+                status, body = 404, {"error": f"Nieznana operacja '{url.path}'. Dostępne: {', '.join(OPERATIONS)}"}
+            else:
+                try:
+                    status, body = 200, {"result": operation(state, **params)}
+                except (TypeError, KeyError, FileNotFoundError) as e:
+                    status, body = 400, {"error": f"Nieprawidłowe zapytanie: {e}"}
+                except Exception as e:
+                    status, body = 500, {"error": str(e)}
+            body["time"] = (time.perf_counter() - started) * 1000
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return http.server.HTTPServer((host, port), ModelRequestHandler)
+
+
+def query_model_server(operation, port=SERVER_PORT, timeout=600, **params):
+    """
+    Wysyła zapytanie do lokalnego serwera modeli i zwraca wynik operacji.
+
+    Przykład: query_model_server("inspect", path="/.../BM_Strasse.IFC", keyword="Gelände")
+
+    Args:
+        operation (str): Nazwa operacji (klucz OPERATIONS).
+        port (int): Port serwera.
+        timeout (float): Limit czasu odpowiedzi [s] (pierwsze zapytanie wczytuje model).
+        **params: Parametry operacji.
+
+    Returns:
+        Wynik operacji (zdekodowany JSON).
+
+    Raises:
+        RuntimeError: Serwer zwrócił błąd.
+    """
+    url = f"http://{SERVER_HOST}:{port}/{operation}?{urllib.parse.urlencode(params)}"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return json.load(response)["result"]
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.load(e)["error"]) from None
+
+
+if __name__ == "__main__":
+    server = create_model_server()
+    print(f"Serwer modeli nasłuchuje na http://{SERVER_HOST}:{SERVER_PORT} (Ctrl+C kończy).")
+    print(f"Operacje: {', '.join(OPERATIONS)}, np. /inspect?path=/ścieżka/model.ifc&keyword=Gelände")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
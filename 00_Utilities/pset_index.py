@@ -0,0 +1,130 @@
+import ifcopenshell
+import ifcopenshell.util.element
+
+
+def build_pset_index(ifc_file):
+    """
+    Buduje indeks zestawów właściwości (PSet) całego pliku w jednym przebiegu.
+
+    Zamiast wywoływać ifcopenshell.util.element.get_psets() osobno dla każdego
+    elementu (co za każdym razem przechodzi przez IsDefinedBy i buduje słownik
+    od nowa), skanujemy raz relacje IfcRelDefinesByType i IfcRelDefinesByProperties.
+    Każda definicja właściwości jest odczytywana tylko raz, nawet jeśli jest
+    współdzielona przez tysiące elementów.
+
+    Zawartość "psets" odpowiada wynikowi get_psets() (łącznie z dziedziczeniem
+    Psetów z typu i kluczem "id"). Słowniki są współdzielone między elementami,
+    dlatego należy je traktować jako tylko do odczytu.
+
+    Args:
+        ifc_file: Otwarty plik IFC.
+
+    Returns:
+        dict z kluczami:
+            "psets": {id elementu: {nazwa psetu: {nazwa właściwości: wartość}}}
+            "values": {(nazwa psetu, nazwa właściwości): {wartość: set(id elementów)}}
+    """
+    definition_cache = {}
+
+    def read_definition(definition):
+        # Odczytujemy właściwości danej definicji tylko raz
+        props = definition_cache.get(definition.id())
+        if props is None:
+            props = ifcopenshell.util.element.get_property_definition(definition)
+            definition_cache[definition.id()] = props
+        return props
+
+    def add_definition(element_psets, definition):
+        props = read_definition(definition)
+        existing = element_psets.get(definition.Name)
+        if existing is None:
+            element_psets[definition.Name] = props
+        else:
+            # Łączymy z kopią, aby nie modyfikować współdzielonego słownika
+            element_psets[definition.Name] = {**existing, **props}
+
+    psets = {}
+
+    # 1. Psety dziedziczone z typu (nadpisywane później przez Psety wystąpienia, tak jak w get_psets)
+    for rel in ifc_file.by_type("IfcRelDefinesByType"):
+        definitions = rel.RelatingType.HasPropertySets or []
+        if not definitions:
+            continue
+        for element in rel.RelatedObjects:
+            element_psets = psets.setdefault(element.id(), {})
+            for definition in definitions:
+                add_definition(element_psets, definition)
+
+    # 2. Psety przypisane bezpośrednio do elementów
+    for rel in ifc_file.by_type("IfcRelDefinesByProperties"):
+        definition = rel.RelatingPropertyDefinition
+        # IfcPropertySetDefinitionSet opakowuje listę definicji
+        if definition.is_a("IfcPropertySetDefinitionSet"):
+            definitions = definition.wrappedValue
+        else:
+            definitions = (definition,)
+        for element in rel.RelatedObjects:
+            element_psets = psets.setdefault(element.id(), {})
+            for definition in definitions:
+                add_definition(element_psets, definition)
+
+    # 3. Indeks odwrotny: (pset, właściwość) -> wartość -> id elementów
+    values = {}
+    for element_id, element_psets in psets.items():
+        for pset_name, props in element_psets.items():
+            for prop_name, prop_value in props.items():
+                if prop_name == "id":
+                    continue
+                try:
+                    values.setdefault((pset_name, prop_name), {}).setdefault(prop_value, set()).add(element_id)
+                except TypeError:
+                    # Wartości nie-haszowalne (np. listy) są dostępne tylko przez "psets"
+                    pass
+
+    return {"psets": psets, "values": values}
+
+
+def get_indexed_psets(pset_index, element):
+    """
+    Zwraca Psety elementu z indeksu (odpowiednik get_psets()).
+
+    Args:
+        pset_index (dict): Indeks zbudowany przez build_pset_index().
+        element: Element IFC.
+
+    Returns:
+        Słownik {nazwa psetu: {nazwa właściwości: wartość}} (pusty, jeśli brak Psetów).
+    """
+    return pset_index["psets"].get(element.id(), {})
+
+
+def get_indexed_value(pset_index, element, pset_name, prop_name):
+    """
+    Pobiera wartość właściwości elementu z indeksu, bez przechodzenia przez IsDefinedBy.
+
+    Args:
+        pset_index (dict): Indeks zbudowany przez build_pset_index().
+        element: Element IFC.
+        pset_name (str): Nazwa zestawu właściwości (np. "ProVI").
+        prop_name (str): Nazwa właściwości (np. "PVI_STATIONSBEZUG").
+
+    Returns:
+        Wartość właściwości lub None, jeśli nie zostanie znaleziona.
+    """
+    return get_indexed_psets(pset_index, element).get(pset_name, {}).get(prop_name)
+
+
+def find_element_ids(pset_index, pset_name, prop_name, value):
+    """
+    Zwraca id wszystkich elementów, dla których dana właściwość ma podaną wartość.
+
+    Args:
+        pset_index (dict): Indeks zbudowany przez build_pset_index().
+        pset_name (str): Nazwa zestawu właściwości.
+        prop_name (str): Nazwa właściwości.
+        value: Szukana wartość.
+
+    Returns:
+        Zbiór id elementów (pusty, jeśli brak dopasowań).
+    """
+    return pset_index["values"].get((pset_name, prop_name), {}).get(value, set())
@@ -0,0 +1,253 @@
+import re
+import ifcopenshell
+
+# Nagłówek encji na początku linii STEP: #123=IFCNAZWA( (także model_cache)
+STEP_ENTITY_PATTERN = re.compile(rb"^#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\(", re.MULTILINE)
+# Referencja do encji (#123) - tekst w apostrofach jest dopasowywany osobno i pomijany
+# (wzorzec bajtowy, używany też przez model_cache, ifc_merger i synthetic_models)
+STEP_REFERENCE_PATTERN = re.compile(rb"'(?:[^']|'')*'|#(\d+)")
+# Kodowanie znaków w tekstach STEP: \X2\00E4\X0\ oraz \X\E4
+STEP_X2_PATTERN = re.compile(r"\\X2\\((?:[0-9A-Fa-f]{4})+)\\X0\\")
+STEP_X_PATTERN = re.compile(r"\\X\\([0-9A-Fa-f]{2})")
+
+# Typy, których argumenty są potrzebne do oceny reguł (reszta przechowuje tylko referencje)
+PROPERTY_TYPES = {b"IFCPROPERTYSINGLEVALUE", b"IFCPROPERTYSET", b"IFCRELDEFINESBYPROPERTIES"}
+# Relacje dołączane do wycinka, jeśli dotyczą wybranych elementów.
+# We wszystkich trzech lista elementów (RelatedObjects / RelatedElements) jest 5. argumentem.
+RELATED_OBJECTS_TYPES = {b"IFCRELDEFINESBYPROPERTIES", b"IFCRELDEFINESBYTYPE", b"IFCRELCONTAINEDINSPATIALSTRUCTURE"}
+RELATED_OBJECTS_INDEX = 4
+# Style elementów geometrii - odwołują się do elementu (Item, 1. argument), więc nie należą do jego domknięcia
+STYLED_ITEM_TYPE = b"IFCSTYLEDITEM"
+
+
+def _iter_statements(step_file):
+    # Zwraca kolejne instrukcje STEP (zakończone ';' poza tekstem) wraz z ich pozycją w pliku.
+    parts = []
+    start = offset = 0
+    quotes = 0
+    for line in step_file:
+        if not parts:
+            start = offset
+        offset += len(line)
+        parts.append(line)
+        quotes += line.count(b"'")
+        if quotes % 2 == 0 and line.rstrip().endswith(b";"):
+            yield start, b"".join(parts).strip()
+            parts = []
+            quotes = 0
+
+
+def _split_arguments(arguments):
+    # Dzieli tekst argumentów encji (bez zewnętrznych nawiasów) na argumenty najwyższego poziomu.
+    result = []
+    depth = 0
+    in_string = False
+    current = 0
+    for i, char in enumerate(arguments):
+        if char == "'":
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            result.append(arguments[current:i].strip())
+            current = i + 1
+    result.append(arguments[current:].strip())
+    return result
+
+
+def _decode_string(value):
+    # Zamienia tekst STEP ('...') na str, dekodując '' oraz sekwencje \X2\ i \X\.
+    text = value[1:-1].replace("''", "'")
+    text = STEP_X2_PATTERN.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 4], 16)) for i in range(0, len(m.group(1)), 4)), text)
+    return STEP_X_PATTERN.sub(lambda m: chr(int(m.group(1), 16)), text)
+
+
+def _decode_value(value):
+    # Dekoduje prostą wartość STEP: tekst, liczbę, wartość logiczną lub typ (np. IFCLABEL('...')).
+    if value in ("$", "*"):
+        return None
+    typed = re.match(r"^[A-Za-z0-9_]+\((.*)\)$", value, re.S)
+    if typed:
+        return _decode_value(typed.group(1).strip())
+    if value.startswith("'"):
+        return _decode_string(value)
+    if value in (".T.", ".F."):
+        return value == ".T."
+    if value.startswith("."):
+        return value.strip(".")
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def _parse_references(value):
+    return [int(ref) for ref in STEP_REFERENCE_PATTERN.findall(value.encode()) if ref]
+
+
+def scan_step_file(ifc_path):
+    """
+    Skanuje plik STEP strumieniowo i buduje lekki graf referencji, bez ładowania modelu.
+
+    Dla każdej encji przechowywany jest tylko typ, pozycja w pliku i lista referencji.
+    Pełne argumenty zachowywane są wyłącznie dla encji potrzebnych do oceny reguł
+    (IfcPropertySingleValue, IfcPropertySet, IfcRelDefinesByProperties).
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC (STEP).
+
+    Returns:
+        dict z kluczami:
+            "header": tekst sekcji HEADER (do "DATA;" włącznie),
+            "entities": {id: (typ, pozycja, długość, referencje)},
+            "arguments": {id: lista argumentów} dla typów z PROPERTY_TYPES i RELATED_OBJECTS_TYPES.
+    """
+    header = []
+    entities = {}
+    arguments = {}
+    in_data = False
+    with open(ifc_path, "rb") as step_file:
+        for offset, statement in _iter_statements(step_file):
+            if not in_data:
+                header.append(statement)
+                in_data = statement == b"DATA;"
+                continue
+            match = STEP_ENTITY_PATTERN.match(statement)
+            if not match:
+                continue
+            entity_id = int(match.group(1))
+            ifc_type = match.group(2).upper()
+            body = statement[match.end():statement.rindex(b")")]
+            refs = tuple(int(ref) for ref in STEP_REFERENCE_PATTERN.findall(body) if ref)
+            entities[entity_id] = (ifc_type, offset, len(statement), refs)
+            if ifc_type in PROPERTY_TYPES or ifc_type in RELATED_OBJECTS_TYPES or ifc_type == STYLED_ITEM_TYPE:
+                arguments[entity_id] = _split_arguments(body.decode("utf-8", errors="replace"))
+    return {"header": b"\n".join(header).decode("utf-8", errors="replace"), "entities": entities, "arguments": arguments}
+
+
+def find_products_by_properties(step_graph, pset_name, property_filters):
+    """
+    Zwraca id elementów, dla których dowolna z podanych właściwości ma jedną z podanych wartości.
+
+    Args:
+        step_graph (dict): Graf z scan_step_file().
+        pset_name (str): Nazwa zestawu właściwości (np. "ProVI").
+        property_filters (dict): {nazwa właściwości: kolekcja akceptowanych wartości}.
+
+    Returns:
+        Zbiór id pasujących elementów.
+    """
+    entities = step_graph["entities"]
+    arguments = step_graph["arguments"]
+    accepted = {name: set(values) for name, values in property_filters.items()}
+    matched = set()
+    for rel_id, rel_args in arguments.items():
+        if entities[rel_id][0] != b"IFCRELDEFINESBYPROPERTIES":
+            continue
+        pset_refs = _parse_references(rel_args[5])
+        if not pset_refs or pset_refs[0] not in arguments:
+            continue
+        pset_args = arguments[pset_refs[0]]
+        if entities[pset_refs[0]][0] != b"IFCPROPERTYSET" or _decode_value(pset_args[2]) != pset_name:
+            continue
+        for prop_id in _parse_references(pset_args[4]):
+            prop_args = arguments.get(prop_id)
+            if prop_args is None or entities[prop_id][0] != b"IFCPROPERTYSINGLEVALUE":
+                continue
+            prop_name = _decode_value(prop_args[0])
+            if prop_name in accepted and _decode_value(prop_args[2]) in accepted[prop_name]:
+                matched.update(_parse_references(rel_args[RELATED_OBJECTS_INDEX]))
+                break
+    return matched
+
+
+def extract_closure(ifc_path, step_graph, product_ids):
+    """
+    Wycina z pliku wybrane elementy wraz ze wszystkim, do czego się odwołują, i otwiera wynik.
+
+    Do wycinka dołączane są też relacje właściwości, typów i struktury przestrzennej
+    dotyczące wybranych elementów - z listą elementów zawężoną do wybranych - oraz
+    style (IfcStyledItem) ich elementów geometrii.
+    Id encji pozostają takie same jak w pliku źródłowym.
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC (ten sam, który został przeskanowany).
+        step_graph (dict): Graf z scan_step_file().
+        product_ids (set): Id wybranych elementów.
+
+    Returns:
+        Plik IFC (ifcopenshell.file) zawierający tylko wycinek modelu.
+    """
+    entities = step_graph["entities"]
+    arguments = step_graph["arguments"]
+    product_ids = set(product_ids)
+
+    # Relacje dotyczące wybranych elementów, z listą elementów zawężoną do wybranych
+    rewritten = {}
+    for rel_id, rel_args in arguments.items():
+        if entities[rel_id][0] not in RELATED_OBJECTS_TYPES:
+            continue
+        related = [ref for ref in _parse_references(rel_args[RELATED_OBJECTS_INDEX]) if ref in product_ids]
+        if related:
+            rewritten[rel_id] = related
+
+    # Domknięcie referencji (iteracyjnie), zaczynając od elementów i relacji
+    closure = set()
+    stack = list(product_ids) + list(rewritten)
+    while stack:
+        entity_id = stack.pop()
+        if entity_id in closure or entity_id not in entities:
+            continue
+        closure.add(entity_id)
+        refs = entities[entity_id][3]
+        if entity_id in rewritten:
+            refs = set(refs) - set(_parse_references(arguments[entity_id][RELATED_OBJECTS_INDEX]))
+        stack.extend(ref for ref in refs if ref not in closure)
+        if not stack:
+            # Style elementów geometrii z wycinka (IfcStyledItem) wraz z ich referencjami
+            stack = [
+                styled_id for styled_id, styled_args in arguments.items()
+                if styled_id not in closure and entities[styled_id][0] == STYLED_ITEM_TYPE and set(_parse_references(styled_args[0])) & closure
+            ]
+
+    lines = []
+    with open(ifc_path, "rb") as step_file:
+        for entity_id in sorted(closure, key=lambda i: entities[i][1]):
+            ifc_type, offset, length, _ = entities[entity_id]
+            if entity_id in rewritten:
+                rel_args = list(arguments[entity_id])
+                rel_args[RELATED_OBJECTS_INDEX] = "(" + ",".join(f"#{ref}" for ref in rewritten[entity_id]) + ")"
+                lines.append(f"#{entity_id}={ifc_type.decode()}({','.join(rel_args)});")
+                continue
+            step_file.seek(offset)
+            lines.append(step_file.read(length).decode("utf-8", errors="replace"))
+
+    return ifcopenshell.file.from_string(step_graph["header"] + "\n" + "\n".join(lines) + "\nENDSEC;\nEND-ISO-10303-21;\n")
+
+
+def filter_step_file(ifc_path, pset_name, property_filters):
+    """
+    Otwiera tylko tę część pliku IFC, która dotyczy elementów pasujących do reguł właściwości.
+
+    Zastępuje ifcopenshell.open() tam, gdzie i tak przetwarzane są wyłącznie elementy
+    spełniające reguły (np. wartości ProVI z tabeli mapowania scalania).
+    Szczytowe zużycie pamięci i czas ładowania zależą od wielkości wycinka, a nie całego pliku.
+
+    Args:
+        ifc_path (str): Ścieżka do pliku IFC.
+        pset_name (str): Nazwa zestawu właściwości (np. "ProVI").
+        property_filters (dict): {nazwa właściwości: kolekcja akceptowanych wartości}.
+
+    Returns:
+        Plik IFC (ifcopenshell.file) z pasującymi elementami i ich zależnościami.
+    """
+    step_graph = scan_step_file(ifc_path)
+    product_ids = find_products_by_properties(step_graph, pset_name, property_filters)
+    return extract_closure(ifc_path, step_graph, product_ids)
@@ -11,9 +11,13 @@
 import ifcopenshell
 import ifcopenshell.api
 import os
-import math
+import sys
 import ifcopenshell.guid
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from alignment_evaluator import build_alignment_evaluator, evaluate_stations, get_segment_stations
+from annotation_factory import create_annotation_factory, create_text_annotation, get_planar_extent, get_text_style
+
 # --- Konfiguracja ---
 # Używamy ścieżek względnych, zakładając, że skrypt jest uruchamiany z głównego katalogu projektu.
 INPUT_IFC_PATH = os.path.join("Road_Axis", "02_Generated_IFCs", "road_axis_with_arc.ifc")
@@ -44,82 +48,20 @@ def get_model_context(project):
             return context
     raise ValueError("BŁĄD: Nie znaleziono wymaganego 'IfcGeometricRepresentationContext' ('Model').")
 
-def get_segment_length(parent_curve):
-    # Oblicza długość geometryczną dla różnych typów krzywych.
-    if parent_curve.is_a("IfcPolyline"):
-        length = 0.0
-        points = parent_curve.Points
-        for i in range(len(points) - 1):
-            p1 = points[i].Coordinates
-            p2 = points[i+1].Coordinates
-            length += math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-        return length
-    elif parent_curve.is_a("IfcTrimmedCurve"):
-        basis_curve = parent_curve.BasisCurve
-        if basis_curve.is_a("IfcCircle"):
-            # Długość łuku = promień * kąt w radianach
-            radius = basis_curve.Radius
-            angle1 = parent_curve.Trim1[0][0]
-            angle2 = parent_curve.Trim2[0][0]
-            return radius * abs(angle2 - angle1)
-    # Dodaj obsługę innych typów krzywych (np. IfcLine, IfcClothoid) w przyszłości
-    print(f"OSTRZEŻENIE: Pomijam obliczanie długości dla nieobsługiwanego typu krzywej: {parent_curve.is_a()}")
-    return 0.0
-
-def get_point_on_curve(curve, position="start"):
-    # Ta funkcja pobiera współrzędne punktu 2D na początku lub na końcu krzywej.
-    if curve.is_a("IfcPolyline"):
-        point_2d = curve.Points[0] if position == "start" else curve.Points[-1]
-        return point_2d.Coordinates
-        
-    elif curve.is_a("IfcTrimmedCurve"):
-        basis_curve = curve.BasisCurve
-        if basis_curve.is_a("IfcCircle"):
-            center = basis_curve.Position.Location.Coordinates
-            radius = basis_curve.Radius
-            trim_param = curve.Trim1[0][0] if position == "start" else curve.Trim2[0][0]
-            
-            # Oblicz współrzędne punktu na okręgu
-            x = center[0] + radius * math.cos(trim_param)
-            y = center[1] + radius * math.sin(trim_param)
-            return (x, y)
-            
-    raise TypeError(f"Nieobsługiwany typ krzywej '{curve.is_a()}' do znalezienia punktu.")
-
-
-def create_station_annotation(f, context, owner_history, point_coords_3d, text):
-    # Tworzy kompletną adnotację (IfcAnnotation) w zadanym punkcie 3D.
-    point_3d = f.create_entity("IfcCartesianPoint", point_coords_3d)
-    
-    text_style_font_model = f.create_entity("IfcTextStyleFontModel", FontFamily=["Arial"], FontSize=f.create_entity("IfcPositiveLengthMeasure", 0.25))
-    text_style = f.create_entity("IfcTextStyle", Name="Station Label Style", TextCharacterAppearance=text_style_font_model)
-    
-    text_placement = f.create_entity("IfcAxis2Placement2D", Location=f.create_entity("IfcCartesianPoint", (0.0, 0.0)))
-    planar_extent = f.create_entity("IfcPlanarExtent", SizeInX=5.0, SizeInY=0.5)
-    text_literal = f.create_entity("IfcTextLiteralWithExtent", Literal=text, Placement=text_placement, Extent=planar_extent, BoxAlignment="MIDDLE")
-    
-    styled_item = f.create_entity("IfcStyledItem", Item=text_literal, Styles=[text_style])
-    
-    annotation_representation = f.create_entity("IfcShapeRepresentation", ContextOfItems=context, RepresentationIdentifier="Annotation", RepresentationType="Annotation2D", Items=[text_literal])
-    
-    annotation_placement = f.create_entity("IfcLocalPlacement", RelativePlacement=f.create_entity("IfcAxis2Placement3D", Location=point_3d))
-    
-    annotation = f.create_entity("IfcAnnotation",
-        GlobalId=ifcopenshell.guid.new(),
-        OwnerHistory=owner_history,
-        Name="Station Label",
-        ObjectPlacement=annotation_placement,
-        Representation=f.create_entity("IfcProductDefinitionShape", Representations=[annotation_representation])
-    )
-    return annotation
+def create_station_annotation(factory, point_coords_3d, text):
+    # Tworzy adnotację (IfcAnnotation) w zadanym punkcie 3D.
+    # Styl, ramka i położenie tekstu są współdzielone przez wszystkie etykiety pikietażu.
+    style = get_text_style(factory, 0.25, name="Station Label Style")
+    extent = get_planar_extent(factory, 5.0, 0.5)
+    return create_text_annotation(factory, point_coords_3d, text, style, extent, name="Station Label")
 
 # --- Główny Skrypt ---
-def main():
-    print(f"Wczytywanie pliku IFC: {INPUT_IFC_PATH}")
-    if not os.path.exists(INPUT_IFC_PATH):
-        print(f"BŁĄD KRYTYCZNY: Plik wejściowy nie istnieje: {INPUT_IFC_PATH}")
+def main(input_ifc_path=INPUT_IFC_PATH, output_ifc_path=OUTPUT_IFC_PATH):
+    print(f"Wczytywanie pliku IFC: {input_ifc_path}")
+    if not os.path.exists(input_ifc_path):
+        print(f"BŁĄD KRYTYCZNY: Plik wejściowy nie istnieje: {input_ifc_path}")
         return
-    f = ifcopenshell.open(INPUT_IFC_PATH)
+    f = ifcopenshell.open(input_ifc_path)
 
     print("Krok 1: Weryfikacja i pobieranie kluczowych elementów z modelu...")
     try:
@@ -132,38 +74,24 @@ def main():
         print(f"BŁĄD KRYTYCZNY: {e}")
         return
 
-    horizontal_alignment_curve = alignment.Representation.Representations[0].Items[0]
-    if not horizontal_alignment_curve.is_a("IfcCompositeCurve"):
-        raise TypeError("Oczekiwano, że geometria osi będzie typu IfcCompositeCurve.")
     print(f"Znaleziono oś do przetworzenia: {alignment.Name or 'Bez nazwy'}")
 
     print("\nKrok 2: Analiza segmentów osi i obliczanie pikietażu...")
-    key_points = []
-    current_station = 0.0
-
-    # Pierwszy punkt osi (pikieta 0.0)
-    first_segment_curve = horizontal_alignment_curve.Segments[0].ParentCurve
-    start_point_coords = get_point_on_curve(first_segment_curve, "start")
-    key_points.append({"coords": start_point_coords, "station": current_station})
-
-    # Przetwarzanie kolejnych segmentów
-    for segment in horizontal_alignment_curve.Segments:
-        parent_curve = segment.ParentCurve
-        
-        segment_length = get_segment_length(parent_curve)
-        current_station += segment_length
-        
-        end_point_coords = get_point_on_curve(parent_curve, "end")
-        key_points.append({"coords": end_point_coords, "station": current_station})
+    # Tablice segmentów budowane są raz; punkty kluczowe (początek osi i końce segmentów) liczone jednym zapytaniem
+    evaluator = build_alignment_evaluator(alignment)
+    stations = get_segment_stations(evaluator)
+    points, _ = evaluate_stations(evaluator, stations)
+    key_points = [{"coords": tuple(point), "station": float(station)} for station, point in zip(stations, points)]
 
     print("Zidentyfikowano punkty kluczowe i obliczono pikietaż:")
     for kp in key_points:
-        print(f" - Pikieta: {kp['station']:.3f} m, Współrzędne: ({kp['coords'][0]:.2f}, {kp['coords'][1]:.2f})")
+        print(f" - Pikieta: {kp['station']:.3f} m, Współrzędne: ({kp['coords'][0]:.2f}, {kp['coords'][1]:.2f}), Wysokość: {kp['coords'][2]:.3f}")
 
     print("\nKrok 3: Tworzenie adnotacji dla każdego punktu kluczowego...")
     all_new_annotations = []
     # Zmieniono pętlę, aby unikać duplikowania adnotacji na tych samych współrzędnych
     processed_coords = set()
+    annotation_factory = create_annotation_factory(f, context, owner_history)
     for kp in key_points:
         coord_tuple = (round(kp['coords'][0], 4), round(kp['coords'][1], 4))
         if coord_tuple in processed_coords:
@@ -173,7 +101,7 @@ def main():
         station_text = f"km {int(kp['station'] // 1000)}+{kp['station'] % 1000:07.3f}"
         point_3d_coords = (kp['coords'][0], kp['coords'][1], 1.5)
         
-        annotation = create_station_annotation(f, context, owner_history, point_3d_coords, station_text)
+        annotation = create_station_annotation(annotation_factory, point_3d_coords, station_text)
         all_new_annotations.append(annotation)
     print(f"Utworzono {len(all_new_annotations)} unikalnych adnotacji.")
 
@@ -207,8 +135,8 @@ def main():
 
     print("\nKrok 5: Zapisywanie wyniku do nowego pliku IFC...")
     try:
-        f.write(OUTPUT_IFC_PATH)
-        print(f"\nSUKCES! Wygenerowano nowy, kompletny plik z adnotacjami:\n{os.path.abspath(OUTPUT_IFC_PATH)}")
+        f.write(output_ifc_path)
+        print(f"\nSUKCES! Wygenerowano nowy, kompletny plik z adnotacjami:\n{os.path.abspath(output_ifc_path)}")
     except Exception as e:
         print(f"BŁĄD KRYTYCZNY podczas zapisywania pliku: {e}")
 
@@ -12,26 +12,34 @@ def print_all_attributes(entity, indent=""):
 
     # Drukuj atrybuty z bieżącej klasy
     print(f"{indent}Atrybuty z {entity.name()}:")
-    for i in range(entity.attribute_count()):
-        attr = entity.attribute_by_index(i)
-        # Sprawdzamy czy atrybut jest zadeklarowany w tej klasie, czy odziedziczony
-        # To pomaga uniknąć duplikatów
-        if attr.declaring_entity().name() == entity.name():
-            print(f"{indent} - {attr.name()}")
+    # attributes() zwraca tylko atrybuty zadeklarowane w tej klasie (bez dziedziczonych),
+    # co pozwala uniknąć duplikatów
+    for attr in entity.attributes():
+        print(f"{indent} - {attr.name()}")
 
 
-try:
-    schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name("IFC4X3_ADD2")
-    if not schema:
-        raise ValueError("Nie udało się załadować schematu IFC4X3_ADD2")
+def get_all_attributes(entity):
+    """Zwraca pary (klasa deklarująca, nazwa atrybutu) wszystkich atrybutów encji, od klas nadrzędnych."""
+    hierarchy = []
+    while entity is not None:
+        hierarchy.insert(0, entity)
+        entity = entity.supertype()
+    return [(declaring_entity.name(), attr.name()) for declaring_entity in hierarchy for attr in declaring_entity.attributes()]
 
-    entity_name = "IfcRelAssociates"
-    entity = schema.declaration_by_name(entity_name)
-    if not entity:
-        raise ValueError(f"Nie znaleziono encji '{entity_name}' w schemacie")
 
-    print(f"Pełna lista atrybutów (wraz z dziedziczonymi) dla '{entity_name}':")
-    print_all_attributes(entity)
+if __name__ == "__main__":
+    try:
+        schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name("IFC4X3_ADD2")
+        if not schema:
+            raise ValueError("Nie udało się załadować schematu IFC4X3_ADD2")
+
+        entity_name = "IfcRelAssociates"
+        entity = schema.declaration_by_name(entity_name)
+        if not entity:
+            raise ValueError(f"Nie znaleziono encji '{entity_name}' w schemacie")
+
+        print(f"Pełna lista atrybutów (wraz z dziedziczonymi) dla '{entity_name}':")
+        print_all_attributes(entity)
 
-except Exception as e:
-    print(f"Wystąpił błąd: {e}")
+    except Exception as e:
+        print(f"Wystąpił błąd: {e}")
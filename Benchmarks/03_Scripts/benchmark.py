@@ -0,0 +1,241 @@
+# Benchmark potoków projektu: scalanie (ifc_merger), rekonstrukcja osi (reconstruct_alignment),
+# punkty tyczenia (create_arc_stakeout_points) i adnotacje pikietażu (annotate_existing_axis).
+#
+# Każdy przypadek uruchamiany jest w osobnym procesie - mierzony jest czas całkowity (łącznie
+# z wczytaniem i zapisem plików) oraz szczytowe zużycie pamięci (RSS) procesu. Wyniki dopisywane są
+# do historii JSON i porównywane z poprzednim pomiarem tego samego przypadku.
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import ifcopenshell
+
+from synthetic_models import add_provi_tags, create_replicated_model, create_synthetic_axis
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+# Potok: (katalog skryptu względem repozytorium, moduł z funkcją main())
+PIPELINES = {
+    "merge": (os.path.join("IFC_Upgrade_and_Merge", "03_Scripts"), "ifc_merger"),
+    "reconstruct": (os.path.join("Stakeout_Points", "03_Scripts"), "reconstruct_alignment"),
+    "stakeout": (os.path.join("Stakeout_Points", "03_Scripts"), "create_arc_stakeout_points"),
+    "annotate": (os.path.join("Annotation", "03_Scripts"), "annotate_existing_axis"),
+}
+
+# Wartości PVI_STATIONSBEZUG nadawane modelom branżowym (klucze reguł mapowania ifc_merger)
+SYNTHETIC_STATIONSBEZUG = ["Achse 001B (B_Achse_Hauptachse)", "Achse 006B (B_Achse_Parkstrasse)"]
+
+# Względny wzrost czasu lub pamięci względem poprzedniego pomiaru zgłaszany jako regresja
+REGRESSION_TOLERANCE = 0.2
+
+
+def count_entities(ifc_path):
+    """Zwraca liczbę encji pliku IFC (linii sekcji DATA zaczynających się od '#'), bez parsowania modelu."""
+    with open(ifc_path, "rb") as ifc_file:
+        return sum(1 for line in ifc_file if line.startswith(b"#"))
+
+
+def prepare_tagged_model(source_path, output_path, copies=1):
+    """Przygotowuje (raz) model z syntetycznymi tagami ProVI, opcjonalnie powielony copies razy."""
+    if not os.path.exists(output_path):
+        ifc_file = create_replicated_model(source_path, output_path, copies)
+        add_provi_tags(ifc_file, SYNTHETIC_STATIONSBEZUG)
+        ifc_file.write(output_path)
+    return output_path
+
+
+def build_cases(work_dir, include_synthetic=True):
+    """
+    Przygotowuje pliki wejściowe i zwraca listę przypadków benchmarku.
+
+    Przypadki na plikach projektu: scalanie każdego modelu OD-MATTEN_* (z syntetycznymi tagami
+    ProVI) i wszystkich naraz, rekonstrukcja osi i tyczenie na osi Achse, adnotacje osi
+    road_axis_with_arc. Przypadki syntetyczne: OD-MATTEN_ELE powielony 10 razy oraz oś 100 km.
+    Pliki syntetyczne tworzone są tylko raz (czas ich tworzenia nie jest mierzony).
+
+    Returns:
+        Lista słowników z kluczami "name", "pipeline", "args" (argumenty main()),
+        "inputs" (pliki wejściowe) i "output".
+    """
+    source_dir = os.path.join(REPO_DIR, "01_Source_IFCs")
+    skeleton_path = os.path.join(source_dir, "OD_Matten_4x3.ifc")
+    cases = []
+
+    def add_case(name, pipeline, inputs, output_name, args):
+        output_path = os.path.join(work_dir, output_name)
+        cases.append({"name": name, "pipeline": pipeline, "args": args + [output_path], "inputs": inputs, "output": output_path})
+
+    discipline_names = sorted(name for name in os.listdir(source_dir) if name.startswith("OD-MATTEN_") and name.lower().endswith(".ifc"))
+    tagged_paths = []
+    for name in discipline_names:
+        tagged_path = prepare_tagged_model(os.path.join(source_dir, name), os.path.join(work_dir, f"tagged_{name}"))
+        tagged_paths.append(tagged_path)
+        add_case(f"merge_{os.path.splitext(name)[0]}", "merge", [tagged_path, skeleton_path], f"merged_{name}", [[tagged_path], skeleton_path])
+    add_case("merge_OD-MATTEN_all", "merge", tagged_paths + [skeleton_path], "merged_OD-MATTEN_all.ifc", [tagged_paths, skeleton_path])
+
+    axis_path = os.path.join(REPO_DIR, "Stakeout_Points", "02_Generated_IFCs", "Achse_with_Stakeout_Points.ifc")
+    add_case("reconstruct_Achse", "reconstruct", [axis_path], "Achse_alignment.ifc", [axis_path])
+    add_case("stakeout_Achse", "stakeout", [axis_path], "Achse_stakeout.ifc", [axis_path])
+    alignment_path = os.path.join(REPO_DIR, "Road_Axis", "02_Generated_IFCs", "road_axis_with_arc.ifc")
+    add_case("annotate_road_axis_with_arc", "annotate", [alignment_path], "road_axis_annotated.ifc", [alignment_path])
+
+    if include_synthetic:
+        replicated_path = prepare_tagged_model(os.path.join(source_dir, "OD-MATTEN_ELE.ifc"), os.path.join(work_dir, "tagged_OD-MATTEN_ELE_x10.ifc"), copies=10)
+        add_case("merge_OD-MATTEN_ELE_x10", "merge", [replicated_path, skeleton_path], "merged_OD-MATTEN_ELE_x10.ifc", [[replicated_path], skeleton_path])
+
+        synthetic_axis_path = os.path.join(work_dir, "synthetic_axis_100km.ifc")
+        if not os.path.exists(synthetic_axis_path):
+            create_synthetic_axis(synthetic_axis_path, length=100000.0)
+        add_case("reconstruct_axis_100km", "reconstruct", [synthetic_axis_path], "synthetic_axis_100km_alignment.ifc", [synthetic_axis_path])
+        add_case("stakeout_axis_100km", "stakeout", [synthetic_axis_path], "synthetic_axis_100km_stakeout.ifc", [synthetic_axis_path])
+        # Wejściem jest wynik rekonstrukcji - przypadek musi być po reconstruct_axis_100km
+        reconstructed_path = cases[-2]["output"]
+        add_case("annotate_axis_100km", "annotate", [reconstructed_path], "synthetic_axis_100km_annotated.ifc", [reconstructed_path])
+    return cases
+
+
+def get_peak_rss_mb():
+    """Zwraca szczytowy RSS [MB] bieżącego procesu i jego zakończonych procesów potomnych."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.path.exists("/proc/self/status"):
+        # W Linuksie ru_maxrss obejmuje pamięć procesu rodzica sprzed exec - VmHWM dotyczy tylko bieżącego procesu
+        with open("/proc/self/status") as status:
+            own = next(int(line.split()[1]) for line in status if line.startswith("VmHWM:"))
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss: kilobajty w Linuksie, bajty w macOS
+    return max(own, children) / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_case_in_process(case, metrics_path):
+    # Uruchamiane w procesie potomnym: import skryptu potoku, wywołanie jego main()
+    # i zapis szczytowego zużycia pamięci do metrics_path.
+    script_dir, module_name = PIPELINES[case["pipeline"]]
+    sys.path.insert(0, os.path.join(REPO_DIR, "00_Utilities"))
+    sys.path.insert(0, os.path.join(REPO_DIR, script_dir))
+    module = __import__(module_name)
+    module.main(*case["args"])
+    with open(metrics_path, "w") as metrics_file:
+        json.dump({"peak_rss_mb": get_peak_rss_mb()}, metrics_file)
+
+
+def measure_case(case, log_path):
+    """
+    Uruchamia przypadek w osobnym procesie i mierzy czas oraz szczytowe zużycie pamięci.
+
+    Wyjście skryptu trafia do log_path. Szczytowy RSS podaje proces potomny (dla potoków
+    z procesami roboczymi - największy z procesów).
+
+    Returns:
+        dict z kluczami "wall_time" [s], "peak_rss_mb" (None przy błędzie), "exit_code",
+        "input_entities", "output_entities" (None, jeśli nie powstał plik wynikowy).
+    """
+    metrics_path = os.path.splitext(log_path)[0] + ".metrics.json"
+    for path in (case["output"], metrics_path):
+        if os.path.exists(path):
+            os.remove(path)
+    with open(log_path, "w") as log:
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case), metrics_path], stdout=log, stderr=subprocess.STDOUT, cwd=REPO_DIR)
+        wall_time = time.perf_counter() - started
+    peak_rss_mb = None
+    if os.path.exists(metrics_path):
+        with open(metrics_path) as metrics_file:
+            peak_rss_mb = round(json.load(metrics_file)["peak_rss_mb"], 1)
+        os.remove(metrics_path)
+    return {
+        "wall_time": round(wall_time, 3),
+        "peak_rss_mb": peak_rss_mb,
+        "exit_code": completed.returncode,
+        "input_entities": sum(count_entities(path) for path in case["inputs"]),
+        "output_entities": count_entities(case["output"]) if os.path.exists(case["output"]) else None,
+    }
+
+
+def get_git_commit():
+    """Zwraca skrót bieżącego commita repozytorium lub None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(history_path):
+    """Wczytuje historię pomiarów (lista rekordów) lub zwraca pustą listę."""
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, "r", encoding="utf-8") as history_file:
+        return json.load(history_file)
+
+
+def find_regressions(history, record, tolerance=REGRESSION_TOLERANCE):
+    """
+    Porównuje rekord z ostatnim wcześniejszym pomiarem każdego przypadku.
+
+    Returns:
+        Lista komunikatów o przypadkach, w których czas lub pamięć wzrosły o więcej niż tolerance.
+    """
+    messages = []
+    for name, result in record["cases"].items():
+        previous = next((old["cases"][name] for old in reversed(history) if name in old["cases"] and old["cases"][name]["exit_code"] == 0), None)
+        if previous is None or result["exit_code"] != 0:
+            continue
+        for metric in ("wall_time", "peak_rss_mb"):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                messages.append(f"{name}: {metric} {previous[metric]} -> {result[metric]} (+{(result[metric] / previous[metric] - 1) * 100:.0f}%)")
+    return messages
+
+
+def main():
+    # --- Konfiguracja ---
+    work_dir = os.path.join(REPO_DIR, "Benchmarks", "02_Generated_IFCs")
+    history_path = os.path.join(REPO_DIR, "Benchmarks", "04_Docs", "benchmark_history.json")
+    # Przypadki syntetyczne (ELE x10, oś 100 km) trwają najdłużej
+    include_synthetic = True
+    # Fragment nazwy - uruchamiane są tylko pasujące przypadki (None - wszystkie)
+    case_filter = None
+
+    os.makedirs(work_dir, exist_ok=True)
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    print("Przygotowanie plików wejściowych...")
+    cases = [case for case in build_cases(work_dir, include_synthetic) if case_filter is None or case_filter in case["name"]]
+
+    record = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": get_git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "ifcopenshell": ifcopenshell.version,
+        "cpu_count": os.cpu_count(),
+        "cases": {},
+    }
+    for case in cases:
+        print(f"\n--- {case['name']} ---")
+        result = measure_case(case, os.path.join(work_dir, f"{case['name']}.log"))
+        record["cases"][case["name"]] = result
+        status = "OK" if result["exit_code"] == 0 else f"BŁĄD (kod {result['exit_code']}, log: {case['name']}.log)"
+        print(f"{status}: {result['wall_time']:.2f} s, {result['peak_rss_mb']} MB, encje {result['input_entities']} -> {result['output_entities']}")
+
+    history = load_history(history_path)
+    regressions = find_regressions(history, record)
+    history.append(record)
+    with open(history_path, "w", encoding="utf-8") as history_file:
+        json.dump(history, history_file, indent=2, ensure_ascii=False)
+    print(f"\nZapisano wyniki do historii: {history_path}")
+
+    if regressions:
+        print("\nREGRESJE względem poprzedniego pomiaru:")
+        for message in regressions:
+            print(f"  - {message}")
+    elif len(history) > 1:
+        print("Brak regresji względem poprzedniego pomiaru.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run-case":
+        run_case_in_process(json.loads(sys.argv[2]), sys.argv[3])
+    else:
+        main()
@@ -0,0 +1,229 @@
+import os
+import sys
+import numpy as np
+import ifcopenshell
+import ifcopenshell.guid
+import ifcopenshell.util.element
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from step_filter import STEP_REFERENCE_PATTERN
+
+# Początek układu osi syntetycznej (współrzędne LV95, jak w modelach OD Matten)
+AXIS_ORIGIN = (2632000.0, 1170000.0)
+
+# Krok całkowania kierunku osi syntetycznej [m]
+AXIS_INTEGRATION_STEP = 0.1
+
+
+def create_replicated_model(source_path, output_path, copies, offset=(2000.0, 0.0, 0.0)):
+    """
+    Tworzy model powielony copies razy - syntetyczny, większy wariant modelu źródłowego.
+
+    Sekcja DATA jest powielana z przesuniętymi id encji. Każda kopia dostaje nowe
+    GlobalId i jest przesunięta o k * offset (przez umiejscowienia najwyższego poziomu),
+    więc kopie nie nakładają się w przestrzeni.
+
+    Args:
+        source_path (str): Ścieżka do modelu źródłowego.
+        output_path (str): Ścieżka do zapisu wyniku.
+        copies (int): Liczba kopii (1 - sam model źródłowy).
+        offset (tuple): Przesunięcie kolejnych kopii [m].
+
+    Returns:
+        Otwarty, powielony plik IFC.
+    """
+    source = ifcopenshell.open(source_path)
+    text = source.to_string()
+    data_start = text.index("DATA;") + len("DATA;")
+    data_end = text.rindex("ENDSEC;")
+    lines = [line for line in text[data_start:data_end].splitlines() if line.startswith("#")]
+    id_span = max(entity.id() for entity in source)
+
+    replicated = []
+    for copy in range(copies):
+        shift = copy * id_span
+
+        def remap(match):
+            if match.group(1) is None:
+                return match.group(0)
+            return b"#%d" % (int(match.group(1)) + shift)
+
+        replicated.extend(STEP_REFERENCE_PATTERN.sub(remap, line.encode("utf-8")).decode("utf-8") for line in lines)
+    ifc_file = ifcopenshell.file.from_string(text[:data_start] + "\n" + "\n".join(replicated) + "\n" + text[data_end:])
+
+    for copy in range(1, copies):
+        first_id, last_id = copy * id_span, (copy + 1) * id_span
+        for entity in ifc_file.by_type("IfcRoot"):
+            if first_id < entity.id() <= last_id:
+                entity.GlobalId = ifcopenshell.guid.new()
+        for placement in ifc_file.by_type("IfcLocalPlacement"):
+            if first_id < placement.id() <= last_id and placement.PlacementRelTo is None:
+                relative = placement.RelativePlacement
+                location = [float(c) for c in relative.Location.Coordinates] + [0.0] * (3 - len(relative.Location.Coordinates))
+                placement.RelativePlacement = ifc_file.create_entity(
+                    "IfcAxis2Placement3D",
+                    Location=ifc_file.create_entity("IfcCartesianPoint", tuple(c + copy * o for c, o in zip(location, offset))),
+                    Axis=getattr(relative, "Axis", None),
+                    RefDirection=relative.RefDirection,
+                )
+    ifc_file.write(output_path)
+    return ifc_file
+
+
+def add_provi_tags(ifc_file, stationsbezug_values):
+    """
+    Dodaje elementom bez Psetu ProVI syntetyczną właściwość PVI_STATIONSBEZUG.
+
+    Modele branżowe (OD-MATTEN_*) nie mają Psetu ProVI, więc reguły scalania nie wybrałyby
+    z nich żadnego elementu. Elementy z geometrią dostają kolejno wartości z listy;
+    dla każdej wartości powstaje jeden Pset i jedna relacja.
+
+    Args:
+        ifc_file: Otwarty plik IFC (zmieniany w miejscu).
+        stationsbezug_values (list): Wartości PVI_STATIONSBEZUG (np. klucze reguł scalania).
+
+    Returns:
+        Liczba oznaczonych elementów.
+    """
+    owner_history = next(iter(ifc_file.by_type("IfcOwnerHistory")), None)
+    elements = [
+        element for element in ifc_file.by_type("IfcElement")
+        if element.Representation and ifcopenshell.util.element.get_pset(element, "ProVI") is None
+    ]
+    for i, value in enumerate(stationsbezug_values):
+        related_objects = elements[i::len(stationsbezug_values)]
+        if not related_objects:
+            continue
+        pset = ifc_file.create_entity(
+            "IfcPropertySet",
+            GlobalId=ifcopenshell.guid.new(),
+            OwnerHistory=owner_history,
+            Name="ProVI",
+            HasProperties=[ifc_file.create_entity("IfcPropertySingleValue", Name="PVI_STATIONSBEZUG", NominalValue=ifc_file.create_entity("IfcLabel", value))],
+        )
+        ifc_file.create_entity(
+            "IfcRelDefinesByProperties",
+            GlobalId=ifcopenshell.guid.new(),
+            OwnerHistory=owner_history,
+            RelatedObjects=related_objects,
+            RelatingPropertyDefinition=pset,
+        )
+    return len(elements)
+
+
+def get_synthetic_axis_curvature(length, seed=0):
+    """
+    Losuje przebieg krzywizny osi: proste, klotoidy, łuki, klotoidy - naprzemiennie w obie strony.
+
+    Returns:
+        (stations, curvatures, is_straight): pikiety punktów zmiany krzywizny,
+        krzywizny w tych punktach (liniowo interpolowane pomiędzy) i flaga odcinka prostego
+        dla każdego odcinka między kolejnymi pikietami.
+    """
+    rng = np.random.default_rng(seed)
+    stations = [0.0]
+    curvatures = [0.0]
+    is_straight = []
+    side = 1.0
+    while stations[-1] < length:
+        radius = rng.uniform(300.0, 1500.0)
+        transition = rng.uniform(40.0, 120.0)
+        # prosta, klotoida wejściowa, łuk, klotoida wyjściowa
+        for segment_length, end_curvature, straight in (
+            (rng.uniform(150.0, 600.0), 0.0, True),
+            (transition, side / radius, False),
+            (rng.uniform(80.0, 300.0), side / radius, False),
+            (transition, 0.0, False),
+        ):
+            stations.append(stations[-1] + segment_length)
+            curvatures.append(end_curvature)
+            is_straight.append(straight)
+        side = -side if rng.random() < 0.7 else side
+    return np.array(stations), np.array(curvatures), np.array(is_straight)
+
+
+def get_axis_vertices(stations, curvatures, is_straight, sample_spacing=1.0):
+    """
+    Zwraca wierzchołki polilinii osi o zadanym przebiegu krzywizny (jak get_synthetic_axis_curvature()).
+
+    Kierunek i położenie liczone są całkowaniem krzywizny na gęstej siatce. Proste zapisane są
+    jednym odcinkiem, łuki i klotoidy - punktami co sample_spacing (jak w eksporcie ProVI).
+
+    Returns:
+        (vertex_stations, x, y): pikiety i współrzędne wierzchołków.
+    """
+    grid = np.arange(0.0, stations[-1] + AXIS_INTEGRATION_STEP, AXIS_INTEGRATION_STEP)
+    grid_curvature = np.interp(grid, stations, curvatures)
+    directions = np.concatenate(([0.0], np.cumsum((grid_curvature[1:] + grid_curvature[:-1]) / 2 * np.diff(grid))))
+    x = AXIS_ORIGIN[0] + np.concatenate(([0.0], np.cumsum((np.cos(directions[1:]) + np.cos(directions[:-1])) / 2 * np.diff(grid))))
+    y = AXIS_ORIGIN[1] + np.concatenate(([0.0], np.cumsum((np.sin(directions[1:]) + np.sin(directions[:-1])) / 2 * np.diff(grid))))
+
+    vertex_stations = [stations[:1]]
+    for start, end, straight in zip(stations[:-1], stations[1:], is_straight):
+        if not straight:
+            vertex_stations.append(np.arange(start, end, sample_spacing)[1:])
+        vertex_stations.append([end])
+    vertex_stations = np.concatenate(vertex_stations)
+    return vertex_stations, np.interp(vertex_stations, grid, x), np.interp(vertex_stations, grid, y)
+
+
+def create_synthetic_axis(output_path, length=100000.0, sample_spacing=1.0, seed=0):
+    """
+    Tworzy syntetyczną oś w układzie eksportu ProVI: polilinie "2D-Linie" i "Raumkurve".
+
+    Tak jak w modelu Achse: IfcRoad z dwiema częściami IfcRoadPart o tych nazwach,
+    każda zawiera IfcBuildingElementProxy z polilinią (GeometricCurveSet).
+    Proste zapisane są jednym odcinkiem, łuki i klotoidy - punktami co sample_spacing.
+    Wysokości Raumkurve zmieniają się łagodnie (sinusoidalnie) wzdłuż osi.
+
+    Args:
+        output_path (str): Ścieżka do zapisu pliku.
+        length (float): Przybliżona długość osi [m].
+        sample_spacing (float): Odstęp punktów na łukach i klotoidach [m].
+        seed (int): Ziarno losowania przebiegu osi.
+
+    Returns:
+        Liczba wierzchołków polilinii.
+    """
+    stations, curvatures, is_straight = get_synthetic_axis_curvature(length, seed)
+    vertex_stations, vertices_x, vertices_y = get_axis_vertices(stations, curvatures, is_straight, sample_spacing)
+    vertices_z = 560.0 + 8.0 * np.sin(2 * np.pi * vertex_stations / 3000.0)
+
+    f = ifcopenshell.file(schema="IFC4X3")
+    owner_history = f.create_entity(
+        "IfcOwnerHistory",
+        OwningUser=f.create_entity("IfcPersonAndOrganization", ThePerson=f.create_entity("IfcPerson", FamilyName="Benchmark"), TheOrganization=f.create_entity("IfcOrganization", Name="Benchmark")),
+        OwningApplication=f.create_entity("IfcApplication", ApplicationDeveloper=f.create_entity("IfcOrganization", Name="Benchmark"), Version="1.0", ApplicationFullName="Synthetic axis", ApplicationIdentifier="SyntheticAxis"),
+        ChangeAction="ADDED",
+        CreationDate=0,
+    )
+    origin = f.create_entity("IfcAxis2Placement3D", Location=f.create_entity("IfcCartesianPoint", (0.0, 0.0, 0.0)))
+    context = f.create_entity("IfcGeometricRepresentationContext", ContextType="Model", CoordinateSpaceDimension=3, Precision=1.0e-5, WorldCoordinateSystem=origin)
+    units = f.create_entity("IfcUnitAssignment", Units=[f.create_entity("IfcSIUnit", UnitType="LENGTHUNIT", Name="METRE")])
+    project = f.create_entity("IfcProject", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, Name="Synthetic axis", RepresentationContexts=[context], UnitsInContext=units)
+
+    site_placement = f.create_entity("IfcLocalPlacement", RelativePlacement=origin)
+    site = f.create_entity("IfcSite", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, ObjectPlacement=site_placement)
+    road = f.create_entity("IfcRoad", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, ObjectPlacement=f.create_entity("IfcLocalPlacement", PlacementRelTo=site_placement, RelativePlacement=origin))
+    f.create_entity("IfcRelAggregates", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, RelatingObject=project, RelatedObjects=[site])
+    f.create_entity("IfcRelAggregates", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, RelatingObject=site, RelatedObjects=[road])
+
+    road_parts = []
+    for name, heights in (("2D-Linie", np.zeros(len(vertex_stations))), ("Raumkurve", vertices_z)):
+        points = [f.create_entity("IfcCartesianPoint", (float(px), float(py), float(pz))) for px, py, pz in zip(vertices_x, vertices_y, heights)]
+        representation = f.create_entity("IfcShapeRepresentation", ContextOfItems=context, RepresentationIdentifier="Axis", RepresentationType="GeometricCurveSet", Items=[f.create_entity("IfcPolyline", Points=points)])
+        road_part = f.create_entity("IfcRoadPart", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, Name=name, ObjectPlacement=road.ObjectPlacement)
+        proxy = f.create_entity(
+            "IfcBuildingElementProxy",
+            GlobalId=ifcopenshell.guid.new(),
+            OwnerHistory=owner_history,
+            Name="SYNTH",
+            ObjectPlacement=f.create_entity("IfcLocalPlacement", PlacementRelTo=road.ObjectPlacement, RelativePlacement=origin),
+            Representation=f.create_entity("IfcProductDefinitionShape", Representations=[representation]),
+        )
+        f.create_entity("IfcRelContainedInSpatialStructure", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, RelatedElements=[proxy], RelatingStructure=road_part)
+        road_parts.append(road_part)
+    f.create_entity("IfcRelAggregates", GlobalId=ifcopenshell.guid.new(), OwnerHistory=owner_history, RelatingObject=road, RelatedObjects=road_parts)
+
+    f.write(output_path)
+    return len(vertex_stations)
@@ -0,0 +1,188 @@
+# Walidacja rekonstrukcji osi (horizontal_geometry + reconstruct_alignment) na osiach syntetycznych
+# o znanym przebiegu krzywizny i na osi Achse projektu.
+#
+# Dla każdej osi zapisywany jest IfcAlignment, a jego segmenty odczytywane ponownie z pliku
+# (alignment_evaluator). Sprawdzane są: ciągłość osi (koniec segmentu i = początek segmentu i+1,
+# w położeniu i kierunku) oraz odległość wierzchołków polilinii źródłowej od osi.
+# Dla osi z plików IFC sprawdzane jest też tyczenie gęste (create_arc_stakeout_points ze STAKEOUT_INTERVAL):
+# punkty tyczenia muszą leżeć na polilinii źródłowej.
+# Kod wyjścia 1 oznacza, że któraś oś nie spełnia tolerancji.
+import os
+import sys
+import numpy as np
+import ifcopenshell
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.join(REPO_DIR, "00_Utilities"))
+sys.path.insert(0, os.path.join(REPO_DIR, "Stakeout_Points", "03_Scripts"))
+from synthetic_models import create_synthetic_axis, get_axis_vertices
+import create_arc_stakeout_points
+from axis_lookup import build_axis_index, find_axis_polyline
+from horizontal_geometry import analyze_horizontal_geometry
+from reconstruct_alignment import create_ifc_alignment_file
+from alignment_evaluator import evaluate_horizontal, get_horizontal_table
+from alignment_projection import build_projection_index, project_points
+
+# Największa odległość końca segmentu od początku następnego [m]
+MAX_JOINT_GAP = 0.005
+
+# Największa zmiana kierunku na styku segmentów [rad], po odjęciu załamania polilinii źródłowej
+# w wierzchołku styku (check_joints())
+MAX_JOINT_ANGLE = 0.001
+
+# Najkrótsza cięciwa polilinii źródłowej, z której liczony jest kierunek przy wyznaczaniu załamania [m]
+MIN_KINK_CHORD = 0.1
+
+# Największa odległość wierzchołka polilinii źródłowej od osi [m]
+MAX_VERTEX_OFFSET = 0.02
+
+# Odstęp punktów tyczenia gęstego przy walidacji [m]
+STAKEOUT_INTERVAL = 25.0
+
+# Krzywa S: prosta, klotoida, łuk w lewo, krótka klotoida zmieniająca znak krzywizny, łuk w prawo, klotoida, prosta
+S_CURVE_STATIONS = np.array([0.0, 200.0, 280.0, 400.0, 411.0, 531.0, 611.0, 811.0])
+S_CURVE_CURVATURES = np.array([0.0, 0.0, 1 / 150, 1 / 150, -1 / 150, -1 / 150, 0.0, 0.0])
+S_CURVE_IS_STRAIGHT = np.array([True, False, False, False, False, False, True])
+
+
+def check_joints(horizontal_table, points):
+    """
+    Zwraca (największa odległość, największa zmiana kierunku) na stykach kolejnych segmentów osi.
+
+    Koniec segmentu i liczony jest całkowaniem jego geometrii (evaluate_horizontal) tuż przed
+    pikietą początku segmentu i+1 i porównywany z zapisanym punktem i kierunkiem początkowym.
+    Od zmiany kierunku odejmowane jest załamanie polilinii źródłowej w wierzchołku styku
+    (kąt między cięciwami pomniejszony o skręt wynikający z krzywizny segmentów na połowach cięciw) -
+    oś wiernie odtwarzająca załamanie polilinii nie jest błędem rekonstrukcji.
+    """
+    if len(horizontal_table["lengths"]) < 2:
+        return 0.0, 0.0
+    _, end_points, end_directions = evaluate_horizontal(horizontal_table, horizontal_table["stations"][1:-1] - 1e-9)
+    gaps = np.linalg.norm(end_points - horizontal_table["starts"][1:], axis=1)
+    turns = (horizontal_table["directions"][1:] - end_directions + np.pi) % (2 * np.pi) - np.pi
+
+    vertices = np.array([np.argmin(np.linalg.norm(points - start, axis=1)) for start in horizontal_table["starts"][1:]])
+    inner = (vertices > 0) & (vertices < len(points) - 1)
+    vectors = np.diff(points, axis=0)
+    chord_lengths = np.linalg.norm(vectors, axis=1)
+    bearings = np.arctan2(vectors[:, 1], vectors[:, 0])
+    # Cięciwy krótsze niż MIN_KINK_CHORD nie wyznaczają kierunku - brana jest najbliższa dłuższa
+    long_chords = np.flatnonzero(chord_lengths >= MIN_KINK_CHORD)
+    before = long_chords[np.clip(np.searchsorted(long_chords, vertices[inner]) - 1, 0, None)]
+    after = long_chords[np.clip(np.searchsorted(long_chords, vertices[inner]), None, len(long_chords) - 1)]
+    kinks = np.zeros(len(vertices))
+    kinks[inner] = (
+        (bearings[after] - bearings[before] + np.pi) % (2 * np.pi) - np.pi
+        - horizontal_table["end_curvatures"][:-1][inner] * chord_lengths[before] / 2
+        - horizontal_table["start_curvatures"][1:][inner] * chord_lengths[after] / 2
+    )
+    return float(gaps.max()), float(np.abs(turns - kinks).max())
+
+
+def check_vertex_offsets(horizontal_table, points):
+    """Zwraca największą odległość wierzchołków polilinii od osi."""
+    _, offsets = project_points(build_projection_index(horizontal_table), points)
+    return float(np.abs(offsets).max())
+
+
+def get_polyline_table(points):
+    """Zwraca tablicę segmentów poziomych (jak get_horizontal_table()) z cięciw polilinii - do rzutowania na polilinię."""
+    vectors = np.diff(points, axis=0)
+    lengths = np.linalg.norm(vectors, axis=1)
+    keep = lengths > 0
+    return {
+        "stations": np.concatenate(([0.0], np.cumsum(lengths[keep]))),
+        "starts": points[:-1][keep],
+        "directions": np.arctan2(vectors[keep, 1], vectors[keep, 0]),
+        "start_curvatures": np.zeros(keep.sum()),
+        "end_curvatures": np.zeros(keep.sum()),
+        "lengths": lengths[keep],
+    }
+
+
+def validate_dense_stakeout(name, source_path, points, output_path):
+    """
+    Uruchamia tyczenie gęste (co STAKEOUT_INTERVAL) i sprawdza odległość punktów tyczenia od polilinii źródłowej.
+
+    Returns:
+        True, jeśli wszystkie punkty leżą w tolerancji MAX_VERTEX_OFFSET.
+    """
+    interval = create_arc_stakeout_points.STAKEOUT_INTERVAL
+    create_arc_stakeout_points.STAKEOUT_INTERVAL = STAKEOUT_INTERVAL
+    try:
+        create_arc_stakeout_points.main(source_path, output_path)
+    finally:
+        create_arc_stakeout_points.STAKEOUT_INTERVAL = interval
+
+    stakeout_file = ifcopenshell.open(output_path)
+    group = next(group for group in stakeout_file.by_type("IfcGroup") if group.Name == "Stakeout Points")
+    stakeout_points = np.array([
+        referent.ObjectPlacement.RelativePlacement.Location.Coordinates[:2]
+        for rel in group.IsGroupedBy for referent in rel.RelatedObjects
+    ])
+    _, offsets = project_points(build_projection_index(get_polyline_table(points)), stakeout_points)
+    offset = float(np.abs(offsets).max())
+    passed = offset <= MAX_VERTEX_OFFSET
+    print(f"  [{'OK' if passed else 'BŁĄD'}] Tyczenie gęste {name} ({len(stakeout_points)} punktów) - odległość od polilinii: {offset:.4f} m (tolerancja {MAX_VERTEX_OFFSET} m)")
+    return passed
+
+
+def validate_axis(name, points, output_path):
+    """
+    Rekonstruuje oś z polilinii, zapisuje IfcAlignment i sprawdza go po ponownym odczycie.
+
+    Returns:
+        True, jeśli oś spełnia wszystkie tolerancje.
+    """
+    print(f"\n=== {name} ({len(points)} wierzchołków) ===")
+    segments = analyze_horizontal_geometry(points)
+    create_ifc_alignment_file(output_path, segments)
+    alignment_file = ifcopenshell.open(output_path)
+    horizontal_table = get_horizontal_table(alignment_file.by_type("IfcAlignment")[0])
+
+    gap, angle = check_joints(horizontal_table, points)
+    offset = check_vertex_offsets(horizontal_table, points)
+    types = {segment_type: sum(1 for segment in segments if segment["type"] == segment_type) for segment_type in ("line", "arc", "clothoid")}
+    print(f"Segmenty: {types}")
+    results = [
+        ("Styk segmentów - odległość", gap, MAX_JOINT_GAP, "m"),
+        ("Styk segmentów - kierunek", angle, MAX_JOINT_ANGLE, "rad"),
+        ("Wierzchołki polilinii - odległość od osi", offset, MAX_VERTEX_OFFSET, "m"),
+    ]
+    for label, value, limit, unit in results:
+        print(f"  [{'OK' if value <= limit else 'BŁĄD'}] {label}: {value:.4f} {unit} (tolerancja {limit} {unit})")
+    return all(value <= limit for _, value, limit, _ in results)
+
+
+def main(work_dir=None):
+    """Waliduje oś syntetyczną 100 km (z tyczeniem gęstym), krzywą S i (jeśli istnieje) oś Achse. Zwraca True, jeśli wszystkie są poprawne."""
+    work_dir = work_dir or os.path.join(REPO_DIR, "Benchmarks", "02_Generated_IFCs")
+    os.makedirs(work_dir, exist_ok=True)
+    axes = []
+
+    synthetic_axis_path = os.path.join(work_dir, "synthetic_axis_100km.ifc")
+    if not os.path.exists(synthetic_axis_path):
+        create_synthetic_axis(synthetic_axis_path, length=100000.0)
+    axes.append(("synthetic_axis_100km", synthetic_axis_path))
+
+    achse_path = os.path.join(REPO_DIR, "Stakeout_Points", "02_Generated_IFCs", "Achse_with_Stakeout_Points.ifc")
+    if os.path.exists(achse_path):
+        axes.append(("Achse", achse_path))
+
+    all_passed = True
+    for name, ifc_path in axes:
+        ifc_file = ifcopenshell.open(ifc_path)
+        polyline = find_axis_polyline(build_axis_index(ifc_file), "2D-Linie")
+        points = np.array([p.Coordinates for p in polyline.Points])[:, :2]
+        all_passed &= validate_axis(name, points, os.path.join(work_dir, f"validate_{name}_alignment.ifc"))
+        all_passed &= validate_dense_stakeout(name, ifc_path, points, os.path.join(work_dir, f"validate_{name}_stakeout.ifc"))
+
+    _, x, y = get_axis_vertices(S_CURVE_STATIONS, S_CURVE_CURVATURES, S_CURVE_IS_STRAIGHT)
+    all_passed &= validate_axis("s_curve", np.column_stack((x, y)), os.path.join(work_dir, "validate_s_curve_alignment.ifc"))
+
+    print(f"\n--- Walidacja {'zakończona pomyślnie' if all_passed else 'NIEUDANA'} ---")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
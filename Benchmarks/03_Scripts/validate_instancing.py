@@ -0,0 +1,116 @@
+# Walidacja współdzielenia geometrii (representation_instancing) na modelach projektu.
+#
+# Dla każdego modelu kształty elementów kopiowane są przez copy_product_shape() do nowego pliku,
+# a geometria kopii (po triangulacji ifcopenshell.geom, we współrzędnych globalnych) porównywana
+# jest z geometrią źródła: element zapisany jako IfcMappedItem musi leżeć dokładnie tam, gdzie oryginał.
+# Dla OD-MATTEN_SEW sprawdzane jest też, że powtarzające się studzienki (Schacht) stały się instancjami.
+# Kod wyjścia 1 oznacza, że któryś model nie spełnia tolerancji.
+import os
+import sys
+import numpy as np
+import ifcopenshell
+import ifcopenshell.geom
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.join(REPO_DIR, "IFC_Upgrade_and_Merge", "03_Scripts"))
+from ifc_copy_engine import copy_entity, create_copy_memo
+from representation_instancing import copy_product_shape, create_instancing_table
+
+# Modele walidowane (katalog 01_Source_IFCs) i najmniejsza oczekiwana liczba elementów o podanej
+# nazwie zapisanych jako instancje (None - bez wymagania)
+MODELS = [
+    ("OD-MATTEN_SEW.ifc", ("Schacht", 11)),
+    ("OD-MATTEN_GAS.ifc", None),
+    ("OD-MATTEN_WAS.ifc", None),
+    ("OD-MATTEN_Brunnen.ifc", None),
+]
+
+# Największa odległość wierzchołków kopii od wierzchołków źródła [m]
+MAX_VERTEX_OFFSET = 0.001
+
+
+def copy_shapes(source_file, products):
+    """
+    Kopiuje umiejscowienia i kształty elementów do nowego pliku ze współdzieleniem geometrii.
+
+    Returns:
+        Krotka (plik docelowy, {id elementu źródłowego: kopia (IfcBuildingElementProxy)}, tablica współdzielenia).
+    """
+    target_file = ifcopenshell.file(schema=source_file.schema)
+    context = target_file.create_entity("IfcGeometricRepresentationContext", ContextIdentifier="Model", ContextType="Model", CoordinateSpaceDimension=3, Precision=1e-5,
+                                        WorldCoordinateSystem=target_file.create_entity("IfcAxis2Placement3D", Location=target_file.create_entity("IfcCartesianPoint", (0.0, 0.0, 0.0))))
+    memo = create_copy_memo(source_file, geometric_context=context)
+    instancing = create_instancing_table(products)
+    copies = {}
+    for product in products:
+        copies[product.id()] = target_file.create_entity(
+            "IfcBuildingElementProxy",
+            GlobalId=product.GlobalId,
+            Name=product.Name,
+            ObjectPlacement=copy_entity(product.ObjectPlacement, target_file, memo),
+            Representation=copy_product_shape(product.Representation, target_file, memo, instancing),
+        )
+    return target_file, copies, instancing
+
+
+def get_world_vertices(ifc_file, product):
+    """Zwraca wierzchołki triangulacji elementu we współrzędnych globalnych (lub None, jeśli nie ma geometrii)."""
+    settings = ifcopenshell.geom.settings()
+    settings.set("use-world-coords", True)
+    try:
+        shape = ifcopenshell.geom.create_shape(settings, product)
+    except RuntimeError:
+        return None
+    return np.array(shape.geometry.verts).reshape(-1, 3)
+
+
+def get_vertex_offset(vertices, other_vertices):
+    """Zwraca największą odległość wierzchołka jednego zbioru od najbliższego wierzchołka drugiego (w obie strony)."""
+    distances = np.linalg.norm(vertices[:, None, :] - other_vertices[None, :, :], axis=2)
+    return float(max(distances.min(axis=1).max(), distances.min(axis=0).max()))
+
+
+def validate_model(name, required):
+    """
+    Kopiuje kształty elementów modelu ze współdzieleniem geometrii i porównuje geometrię kopii ze źródłem.
+
+    Returns:
+        True, jeśli wszystkie elementy leżą w tolerancji MAX_VERTEX_OFFSET i spełnione jest wymaganie liczby instancji.
+    """
+    source_file = ifcopenshell.open(os.path.join(REPO_DIR, "01_Source_IFCs", name))
+    products = [product for product in source_file.by_type("IfcProduct") if product.Representation]
+    target_file, copies, instancing = copy_shapes(source_file, products)
+
+    mapped = [product for product in products if any(r.RepresentationType == "MappedRepresentation" for r in copies[product.id()].Representation.Representations)]
+    offset = 0.0
+    for product in mapped:
+        source_vertices = get_world_vertices(source_file, product)
+        copy_vertices = get_world_vertices(target_file, copies[product.id()])
+        if source_vertices is None or copy_vertices is None:
+            offset = float("inf")
+            continue
+        offset = max(offset, get_vertex_offset(source_vertices, copy_vertices))
+
+    print(f"\n=== {name} ({len(products)} elementów) ===")
+    print(f"Powtarzające się reprezentacje: {len(instancing['repeated'])}, elementy jako instancje: {len(mapped)}")
+    passed = offset <= MAX_VERTEX_OFFSET
+    print(f"  [{'OK' if passed else 'BŁĄD'}] Instancje - odległość od geometrii źródłowej: {offset:.4f} m (tolerancja {MAX_VERTEX_OFFSET} m)")
+    if required is not None:
+        product_name, minimum = required
+        count = sum(1 for product in mapped if product.Name == product_name)
+        passed &= count >= minimum
+        print(f"  [{'OK' if count >= minimum else 'BŁĄD'}] Elementy '{product_name}' jako instancje: {count} (wymagane co najmniej {minimum})")
+    return passed
+
+
+def main():
+    """Waliduje współdzielenie geometrii na modelach z MODELS. Zwraca True, jeśli wszystkie są poprawne."""
+    all_passed = True
+    for name, required in MODELS:
+        all_passed &= validate_model(name, required)
+    print(f"\n--- Walidacja {'zakończona pomyślnie' if all_passed else 'NIEUDANA'} ---")
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,244 @@
+import ifcopenshell
+import ifcopenshell.guid
+import ifcopenshell.ifcopenshell_wrapper
+
+# Pamięć podręczna układu atrybutów: (schemat źródłowy, schemat docelowy, klasa) -> nazwy lub None
+_ATTRIBUTE_LAYOUTS = {}
+
+# Pamięć podręczna: (schemat, klasa) -> czy klasa istnieje w schemacie
+_SCHEMA_CLASSES = {}
+
+
+def create_copy_memo(source_file, owner_history=None, geometric_context=None):
+    """
+    Tworzy tablicę memo dla copy_entity(), wspólną dla wszystkich klonowanych elementów.
+
+    Tablica mapuje id encji z pliku źródłowego na encje w pliku docelowym.
+    Encje, które nie powinny być kopiowane, są od razu podstawiane:
+    każda IfcOwnerHistory oraz każdy kontekst geometryczny (łącznie z subkontekstami)
+    pliku źródłowego wskazuje na odpowiednik z pliku docelowego.
+
+    Args:
+        source_file: Otwarty plik IFC (model źródłowy).
+        owner_history: IfcOwnerHistory w pliku docelowym, przypisywana kopiom.
+        geometric_context: IfcGeometricRepresentationContext w pliku docelowym.
+
+    Returns:
+        Słownik {id encji źródłowej: encja docelowa}. copy_interned() dopisuje do niego
+        także encje internowane - pod kluczami-krotkami opisującymi ich zawartość.
+    """
+    memo = {}
+    if owner_history is not None:
+        for source_owner_history in source_file.by_type("IfcOwnerHistory"):
+            memo[source_owner_history.id()] = owner_history
+    if geometric_context is not None:
+        for source_context in source_file.by_type("IfcGeometricRepresentationContext"):
+            memo[source_context.id()] = geometric_context
+    return memo
+
+
+def _attribute_layout(source_entity, target_file):
+    # Zwraca None, jeśli atrybuty w obu schematach są identyczne (można tworzyć pozycyjnie),
+    # w przeciwnym razie listę par (indeks źródłowy, nazwa) wspólnych dla obu schematów.
+    ifc_class = source_entity.is_a()
+    key = (source_entity.file.schema_identifier, target_file.schema_identifier, ifc_class)
+    if key not in _ATTRIBUTE_LAYOUTS:
+        source_schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(source_entity.file.schema_identifier)
+        target_schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(target_file.schema_identifier)
+        source_names = [a.name() for a in source_schema.declaration_by_name(ifc_class).all_attributes()]
+        target_names = [a.name() for a in target_schema.declaration_by_name(ifc_class).all_attributes()]
+        if source_names == target_names:
+            _ATTRIBUTE_LAYOUTS[key] = None
+        else:
+            _ATTRIBUTE_LAYOUTS[key] = [(i, name) for i, name in enumerate(source_names) if name in target_names]
+    return _ATTRIBUTE_LAYOUTS[key]
+
+
+def _schema_has_class(ifc_file, ifc_class):
+    key = (ifc_file.schema_identifier, ifc_class)
+    if key not in _SCHEMA_CLASSES:
+        try:
+            ifcopenshell.ifcopenshell_wrapper.schema_by_name(ifc_file.schema_identifier).declaration_by_name(ifc_class)
+            _SCHEMA_CLASSES[key] = True
+        except RuntimeError:
+            _SCHEMA_CLASSES[key] = False
+    return _SCHEMA_CLASSES[key]
+
+
+def referenced_entities(value):
+    """
+    Zwraca encje (z id) występujące w wartości atrybutu, także w listach zagnieżdżonych.
+
+    Args:
+        value: Wartość atrybutu encji (encja, lista, krotka lub wartość prosta).
+
+    Returns:
+        Lista encji w kolejności występowania (bez wartości typów prostych opakowanych w encje).
+    """
+    if isinstance(value, ifcopenshell.entity_instance):
+        return [value] if value.id() else []
+    if isinstance(value, (list, tuple)):
+        found = []
+        for item in value:
+            found.extend(referenced_entities(item))
+        return found
+    return []
+
+
+def _map_value(value, memo):
+    # Podmienia referencje do encji źródłowych na ich kopie z tablicy memo.
+    if isinstance(value, ifcopenshell.entity_instance):
+        return memo[value.id()] if value.id() else value
+    if isinstance(value, (list, tuple)):
+        return type(value)(_map_value(item, memo) for item in value)
+    return value
+
+
+def _create_copy(source_entity, target_file, memo, placeholder=None):
+    values = [_map_value(source_entity[i], memo) for i in range(len(source_entity))]
+    if source_entity.is_a("IfcRoot"):
+        # Encje IfcRoot muszą mieć unikalny GlobalId w pliku docelowym
+        values[0] = ifcopenshell.guid.new()
+
+    layout = _attribute_layout(source_entity, target_file)
+    if placeholder is not None:
+        # Encja utworzona wcześniej jako zaślepka (cykl referencji) - uzupełniamy atrybuty
+        for i, name in layout or enumerate(source_entity.get_attribute_names()):
+            if values[i] is not None:
+                setattr(placeholder, name, values[i])
+        return placeholder
+    if layout is None:
+        return target_file.create_entity(source_entity.is_a(), *values)
+    return target_file.create_entity(source_entity.is_a(), **{name: values[i] for i, name in layout if values[i] is not None})
+
+
+def copy_styled_items(source_item, target_file, memo):
+    """
+    Kopiuje style (IfcStyledItem) skopiowanego już elementu geometrii.
+
+    IfcStyledItem wskazuje na element geometrii, a nie odwrotnie, więc nie jest osiągany
+    przez atrybuty bezpośrednie. Style (np. IfcSurfaceStyle z kolorem) kopiowane są przez
+    copy_interned(), więc style o tej samej treści trafiają do pliku docelowego raz.
+    IfcPresentationStyleAssignment (IFC2X3/IFC4) jest rozwijana do listy stylów,
+    jeśli schemat docelowy (np. IFC4X3) jej nie zawiera.
+
+    Args:
+        source_item: IfcRepresentationItem z pliku źródłowego, już obecny w memo.
+        target_file: Otwarty plik IFC (model docelowy).
+        memo (dict): Tablica z create_copy_memo(), współdzielona między wywołaniami.
+    """
+    flatten = not _schema_has_class(target_file, "IfcPresentationStyleAssignment")
+    for styled_item in source_item.StyledByItem:
+        if styled_item.id() in memo:
+            continue
+        if not flatten or not any(style.is_a("IfcPresentationStyleAssignment") for style in styled_item.Styles):
+            for style in styled_item.Styles:
+                copy_interned(style, target_file, memo)
+            copy_entity(styled_item, target_file, memo)
+            continue
+        styles = []
+        for style in styled_item.Styles:
+            nested = style.Styles if style.is_a("IfcPresentationStyleAssignment") else [style]
+            for nested_style in nested:
+                # IfcNullStyle jest wartością typu wyliczeniowego, nie encją - w IFC4X3 nie ma odpowiednika
+                if isinstance(nested_style, ifcopenshell.entity_instance) and nested_style.id():
+                    copied = copy_interned(nested_style, target_file, memo)
+                    if copied not in styles:
+                        styles.append(copied)
+        if styles:
+            memo[styled_item.id()] = target_file.create_entity("IfcStyledItem", Item=memo[source_item.id()], Styles=styles, Name=styled_item.Name)
+
+
+def copy_entity(source_entity, target_file, memo):
+    """
+    Kopiuje encję wraz z całym grafem encji, do których się odwołuje (atrybuty bezpośrednie).
+
+    Kopiowanie jest iteracyjne (własny stos zamiast rekurencji), więc głębokie grafy
+    geometrii (np. IfcFacetedBrep -> IfcClosedShell -> IfcFace -> IfcPolyLoop -> punkty)
+    nie przekraczają limitu rekurencji. Każda encja źródłowa jest kopiowana tylko raz -
+    wspólne umiejscowienia, profile czy listy punktów trafiają do pliku
+    docelowego jednokrotnie, o ile ta sama tablica memo jest używana dla wszystkich elementów.
+    Skopiowane elementy geometrii dostają też swoje style (copy_styled_items()).
+
+    Args:
+        source_entity: Encja z pliku źródłowego (lub None).
+        target_file: Otwarty plik IFC (model docelowy).
+        memo (dict): Tablica z create_copy_memo(), współdzielona między wywołaniami.
+
+    Returns:
+        Kopia encji w pliku docelowym (lub None).
+    """
+    if source_entity is None:
+        return None
+    if source_entity.id() in memo:
+        return memo[source_entity.id()]
+
+    visiting = set()
+    placeholders = {}
+    styled = []
+    stack = [(source_entity, False)]
+    while stack:
+        entity, expanded = stack.pop()
+        key = entity.id()
+        if expanded:
+            visiting.discard(key)
+            memo[key] = _create_copy(entity, target_file, memo, placeholders.pop(key, None))
+            if entity.is_a("IfcRepresentationItem") and entity.StyledByItem:
+                styled.append(entity)
+            continue
+        if key in memo:
+            continue
+        visiting.add(key)
+        stack.append((entity, True))
+        for i in range(len(entity)):
+            for child in referenced_entities(entity[i]):
+                child_key = child.id()
+                if child_key in memo:
+                    continue
+                if child_key in visiting:
+                    # Cykl referencji: tworzymy pustą zaślepkę, atrybuty zostaną uzupełnione później
+                    placeholders[child_key] = memo[child_key] = target_file.create_entity(child.is_a())
+                    continue
+                stack.append((child, False))
+
+    for item in styled:
+        copy_styled_items(item, target_file, memo)
+    return memo[source_entity.id()]
+
+
+def _structural_key(value):
+    # Klucz zawartości wartości atrybutu: klasa i wartości encji (rekurencyjnie), bez id encji.
+    if isinstance(value, ifcopenshell.entity_instance):
+        if not value.id():
+            # Wartość typu prostego opakowana w encję (np. IfcLabel) - typ jest częścią klucza
+            return (value.is_a(), _structural_key(value.wrappedValue))
+        return (value.is_a(),) + tuple(_structural_key(value[i]) for i in range(len(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(_structural_key(item) for item in value)
+    return value
+
+
+def copy_interned(source_entity, target_file, memo):
+    """
+    Kopiuje encję jak copy_entity(), ale encje o identycznej zawartości tworzy tylko raz.
+
+    Dwie encje źródłowe o tej samej klasie i wartościach atrybutów (porównywanych
+    rekurencyjnie, z typami wartości, np. IfcLabel i IfcText są różne) dostają tę samą
+    kopię w pliku docelowym - także gdy pochodzą z różnych elementów czy Psetów.
+    Przeznaczone dla małych encji powtarzających się tysiące razy, np. właściwości.
+
+    Args:
+        source_entity: Encja z pliku źródłowego.
+        target_file: Otwarty plik IFC (model docelowy).
+        memo (dict): Tablica z create_copy_memo(), współdzielona między wywołaniami.
+
+    Returns:
+        Kopia encji w pliku docelowym.
+    """
+    if source_entity.id() in memo:
+        return memo[source_entity.id()]
+    key = ("interned", _structural_key(source_entity))
+    if key not in memo:
+        memo[key] = copy_entity(source_entity, target_file, memo)
+    memo[source_entity.id()] = memo[key]
+    return memo[key]
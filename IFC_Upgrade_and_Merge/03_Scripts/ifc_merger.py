@@ -4,9 +4,27 @@ import ifcopenshell.api
 import ifcopenshell.util.element
 import uuid
 import datetime
+import os
+import sys
+import tempfile
+import time
+import concurrent.futures
 import ifcopenshell.util.date
 
-def get_property_value(element, pset_name, prop_name):
+# Wspólne narzędzia z katalogu 00_Utilities
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from pset_index import build_pset_index, get_indexed_psets, get_indexed_value
+from step_filter import STEP_ENTITY_PATTERN, STEP_REFERENCE_PATTERN, STYLED_ITEM_TYPE, filter_step_file
+from ifc_writer import write_ifc
+from model_cache import get_cached_pset_index, open_model_cache
+from merge_manifest import compute_product_hash, get_manifest_path, load_manifest, remove_target_product, save_manifest
+from ifc_copy_engine import copy_entity, copy_interned, create_copy_memo
+from ifc_relationship_batch import assign_property_definition, assign_to_container, create_relationship_batch, find_property_definition, flush_relationship_batch
+from representation_instancing import copy_product_shape, create_instancing_table
+from spatial_assignment import assign_by_proximity
+from merge_profiler import add_stage, create_profiler, finish_profiler, profile_stage, record_clone, record_entity_counts
+
+def get_property_value(element, pset_name, prop_name, pset_index=None):
     """
     Pobiera wartość konkretnej właściwości z danego zestawu właściwości (PSet) elementu.
 
@@ -14,21 +32,140 @@ def get_property_value(element, pset_name, prop_name):
         element: Element IfcProduct.
         pset_name (str): Nazwa zestawu właściwości (np. "ProVI").
         prop_name (str): Nazwa właściwości (np. "PVI_STATIONSBEZUG").
+        pset_index (dict, optional): Indeks z build_pset_index(). Jeśli podany,
+                                     wartość jest pobierana ze słownika zamiast przez get_psets.
 
     Returns:
         Wartość właściwości lub None, jeśli nie zostanie znaleziona.
     """
+    if pset_index is not None:
+        return get_indexed_value(pset_index, element, pset_name, prop_name)
     psets = ifcopenshell.util.element.get_psets(element)
     if pset_name in psets:
         if prop_name in psets[pset_name]:
             return psets[pset_name][prop_name]
     return None
 
-def clone_element_to_target(source_element, target_file, target_container, owner_history, geometric_context):
+def open_source_model(source_ifc_path, property_filters=None):
+    """
+    Wczytuje model źródłowy - cały lub tylko elementy pasujące do reguł ProVI.
+
+    Args:
+        source_ifc_path (str): Ścieżka do pliku źródłowego.
+        property_filters (dict, optional): {nazwa właściwości ProVI: akceptowane wartości}.
+                                           Jeśli podane, plik jest filtrowany strumieniowo
+                                           (step_filter) i ładowany jest tylko wycinek modelu.
+                                           Id encji są takie same jak w pełnym pliku.
+
+    Returns:
+        Otwarty plik IFC.
+    """
+    if property_filters:
+        return filter_step_file(source_ifc_path, "ProVI", property_filters)
+    return ifcopenshell.open(source_ifc_path)
+
+def select_products(source_ifc, pset_index, target_containers, selection_rules):
+    """
+    Wybiera elementy pliku źródłowego do sklonowania i ich kontenery docelowe według reguł.
+
+    Args:
+        source_ifc: Otwarty plik źródłowy.
+        pset_index (dict): Indeks Psetów pliku źródłowego z build_pset_index().
+        target_containers (dict): {nazwa kontenera: encja w pliku docelowym}.
+        selection_rules (dict): Reguły z main(): "mapping_rules" ({PVI_STATIONSBEZUG: nazwa kontenera}),
+                                "terrain_rule" (właściwość, wartość, nazwa kontenera) oraz
+                                "spatial_max_distance" (None wyłącza przypisanie przestrzenne).
+
+    Returns:
+        Lista par (element źródłowy, nazwa kontenera docelowego).
+    """
+    mapping_rules = selection_rules["mapping_rules"]
+    terrain_rule_property, terrain_rule_value, terrain_target_container_name = selection_rules["terrain_rule"]
+    spatial_max_distance = selection_rules["spatial_max_distance"]
+
+    source_products = source_ifc.by_type("IfcProduct")
+    assignments = []
+    unassigned_products = []
+    for i, product in enumerate(source_products):
+        # Logowanie postępu co 1000 elementów
+        if i > 0 and i % 1000 == 0:
+            print(f"  ...przetworzono {i} z {len(source_products)} elementów...")
+
+        # Ignorujemy elementy, które nie mają geometrii lub są częścią agregacji
+        if not product.Representation:
+            continue
+
+        target_container_name = None
+
+        # Sprawdzenie reguły dla terenu
+        bauteiltyp = get_property_value(product, "ProVI", terrain_rule_property, pset_index)
+        if bauteiltyp == terrain_rule_value:
+            target_container_name = terrain_target_container_name
+        else:
+            # Sprawdzenie głównych reguł mapowania
+            stationsbezug = get_property_value(product, "ProVI", "PVI_STATIONSBEZUG", pset_index)
+            if stationsbezug in mapping_rules:
+                target_container_name = mapping_rules[stationsbezug]
+
+        # Jeśli znaleziono pasujący kontener, element zostanie sklonowany
+        if target_container_name and target_container_name in target_containers:
+            target_container = target_containers[target_container_name]
+            
+            # --- POPRAWKA SPS002 ---
+            # Sprawdzamy, czy klonowany element to IfcAlignment.
+            # Jeśli tak, upewniamy się, że kontenerem jest IfcRoadPart, a nie IfcRoad.
+            if product.is_a("IfcAlignment"):
+                # Zakładamy, że nazwa kontenera dla osi powinna wskazywać na IfcRoadPart.
+                # Jeśli mapowanie wskazuje na coś innego, logujemy błąd.
+                if not target_container.is_a("IfcRoadPart"):
+                    print(f"BŁĄD KRYTYCZNY: Element IfcAlignment ('{product.Name}') jest mapowany do kontenera '{target_container_name}', który nie jest typu IfcRoadPart. Pomijam ten element.")
+                    continue # Przechodzimy do następnego produktu
+
+            assignments.append((product, target_container_name))
+        elif spatial_max_distance is not None and product.is_a("IfcElement"):
+            # Bez reguły - kandydat do przypisania przestrzennego
+            unassigned_products.append(product)
+        else:
+            # To jest normalne dla elementów, których nie chcemy mapować, np. IfcSite, IfcProject
+            # print(f"Info: Nie znaleziono reguły mapowania dla elementu '{product.Name}' ({product.is_a()}). Element zostanie pominięty.")
+            pass
+
+    if spatial_max_distance is not None and unassigned_products:
+        print(f"Przypisanie przestrzenne: liczenie geometrii dla {len(assignments) + len(unassigned_products)} elementów...")
+        spatial_assignments = assign_by_proximity(source_ifc, assignments, unassigned_products, spatial_max_distance)
+        print(f"Przypisanie przestrzenne: przypisano {len(spatial_assignments)} z {len(unassigned_products)} elementów bez reguły.")
+        assignments.extend(spatial_assignments)
+    return assignments
+
+def _definition_properties(definition):
+    # Właściwości IfcPropertySet lub ilości IfcElementQuantity (pusta lista dla innych definicji).
+    if definition.is_a("IfcPropertySet"):
+        return list(definition.HasProperties or [])
+    if definition.is_a("IfcElementQuantity"):
+        return list(definition.Quantities or [])
+    return []
+
+
+def _source_properties(source_element, pset_name, pset_properties):
+    # Zwraca (definicja źródłowa, encje właściwości) Psetu z get_psets()/pset_index. Klucz "id" wskazuje
+    # definicję elementu; właściwości dziedziczone z Psetu typu o tej samej nazwie (scalane przez
+    # get_psets()) są dobierane z typu.
+    definition = source_element.file.by_id(pset_properties["id"])
+    properties = _definition_properties(definition)
+    missing = set(pset_properties) - {"id"} - {source_property.Name for source_property in properties}
+    element_type = ifcopenshell.util.element.get_type(source_element) if missing else None
+    if element_type is not None:
+        for type_definition in element_type.HasPropertySets or []:
+            if type_definition.Name == pset_name:
+                properties.extend(source_property for source_property in _definition_properties(type_definition) if source_property.Name in missing)
+    return definition, properties
+
+
+def clone_element_to_target(source_element, target_file, target_container, owner_history, geometric_context, pset_index=None, copy_memo=None, relationship_batch=None, instancing=None):
     """
     Klonuje element (geometrię i właściwości) z pliku źródłowego do docelowego.
     Tworzy nowy element typu IfcBuildingElementProxy w pliku docelowym,
-    kopiuje reprezentację geometryczną i wszystkie Psety.
+    kopiuje reprezentację geometryczną i wszystkie Psety (z oryginalnymi typami wartości).
 
     Args:
         source_element: Element do sklonowania z pliku źródłowego.
@@ -37,10 +174,23 @@ def clone_element_to_target(source_element, target_file, target_container, owner
                           (np. IfcRoadPart).
         owner_history: Obiekt IfcOwnerHistory do przypisania nowym elementom.
         geometric_context: Obiekt IfcGeometricRepresentationContext do przypisania nowym reprezentacjom.
+        pset_index (dict, optional): Indeks Psetów pliku źródłowego z build_pset_index().
+        copy_memo (dict, optional): Tablica memo z create_copy_memo(), wspólna dla wszystkich
+                                    klonowanych elementów. Jeśli brak, tworzona jest nowa.
+        relationship_batch (dict, optional): Bufor relacji z create_relationship_batch().
+                                             Jeśli brak, relacje są zapisywane od razu.
+        instancing (dict, optional): Tablica z create_instancing_table(). Jeśli podana, powtarzające się
+                                     reprezentacje zapisywane są raz jako IfcRepresentationMap.
 
     Returns:
         Nowo utworzony element w pliku docelowym.
     """
+    if copy_memo is None:
+        copy_memo = create_copy_memo(source_element.file, owner_history, geometric_context)
+    flush_now = relationship_batch is None
+    if flush_now:
+        relationship_batch = create_relationship_batch()
+
     # 1. Utworzenie nowego elementu w pliku docelowym
     new_element = target_file.create_entity(
         source_element.is_a(),
@@ -50,127 +200,350 @@ def clone_element_to_target(source_element, target_file, target_container, owner
         Description=source_element.Description
     )
 
-    # 2. Kopiowanie umiejscowienia (ObjectPlacement)
+    # 2. Kopiowanie umiejscowienia (ObjectPlacement) - wraz z łańcuchem PlacementRelTo
     if source_element.ObjectPlacement:
-        # Tworzymy nową encję IfcLocalPlacement
-        new_placement = target_file.create_entity(
-            "IfcLocalPlacement",
-            RelativePlacement=target_file.create_entity(
-                "IfcAxis2Placement3D",
-                target_file.create_entity("IfcCartesianPoint", source_element.ObjectPlacement.RelativePlacement.Location.Coordinates),
-                target_file.create_entity("IfcDirection", source_element.ObjectPlacement.RelativePlacement.Axis.DirectionRatios) if source_element.ObjectPlacement.RelativePlacement.Axis else None,
-                target_file.create_entity("IfcDirection", source_element.ObjectPlacement.RelativePlacement.RefDirection.DirectionRatios) if source_element.ObjectPlacement.RelativePlacement.RefDirection else None
-            )
-        )
-        new_element.ObjectPlacement = new_placement
+        new_element.ObjectPlacement = copy_entity(source_element.ObjectPlacement, target_file, copy_memo)
 
     # 3. Kopiowanie reprezentacji geometrycznej (Representation)
-    if source_element.Representation:
-        new_representations_list = []
-        for rep in source_element.Representation.Representations:
-            new_items_for_representation = []
-            for item in rep.Items:
-                # To jest uproszczone kopiowanie. W zależności od typu geometrii
-                # może być potrzebne bardziej złożone klonowanie poszczególnych elementów.
-                # Na razie kopiujemy tylko podstawowe atrybuty.
-                new_item = None
-                if item.is_a("IfcExtrudedAreaSolid"):
-                    new_item = target_file.create_entity(
-                        "IfcExtrudedAreaSolid",
-                        SweptArea=target_file.create_entity("IfcArbitraryClosedProfileDef", "AREA", item.SweptArea.OuterCurve),
-                        ExtrudedDirection=target_file.create_entity("IfcDirection", item.ExtrudedDirection.DirectionRatios),
-                        Depth=item.Depth
-                    )
-                elif item.is_a("IfcFaceBasedSurfaceModel"):
-                    new_item = target_file.create_entity(
-                        "IfcFaceBasedSurfaceModel",
-                        FbsmFaces=[target_file.create_entity("IfcConnectedFaceSet", [target_file.create_entity("IfcFace", [target_file.create_entity("IfcFaceBound", target_file.create_entity("IfcPolyLoop", [target_file.create_entity("IfcCartesianPoint", [0.0,0.0,0.0])]), True)])])]
-                    )
-                elif item.is_a("IfcFacetedBrep"):
-                    # Uproszczone kopiowanie dla IfcFacetedBrep
-                    # Wymagałoby głębszego klonowania wszystkich IfcFace, IfcEdge, IfcVertex itp.
-                    # Na potrzeby tego przykładu, tworzymy pusty IfcFacetedBrep
-                    new_item = target_file.create_entity("IfcFacetedBrep", Outer=target_file.create_entity("IfcClosedShell", CfsFaces=[]))
-                elif item.is_a("IfcTriangulatedFaceSet"):
-                    # Kopiowanie IfcTriangulatedFaceSet
-                    new_item = target_file.create_entity(
-                        "IfcTriangulatedFaceSet",
-                        Coordinates=target_file.create_entity("IfcCartesianPointList3D", item.Coordinates.CoordList),
-                        CoordIndex=item.CoordIndex
-                    )
-                else:
-                    print(f"Ostrzeżenie: Nieobsługiwany typ geometrii: {item.is_a()}. Pomijam kopiowanie.")
-                    continue
-                if new_item:
-                    new_items_for_representation.append(new_item)
-            
-            new_shape_representation = target_file.create_entity(
-                "IfcShapeRepresentation",
-                ContextOfItems=geometric_context,
-                RepresentationIdentifier=rep.RepresentationIdentifier,
-                RepresentationType=rep.RepresentationType,
-                Items=new_items_for_representation
-            )
-            new_representations_list.append(new_shape_representation)
-        new_representation = target_file.create_entity(
-            "IfcProductDefinitionShape",
-            Representations=new_representations_list
-        )
-        new_element.Representation = new_representation
+    # Pełna, głęboka kopia dowolnego typu geometrii. Kontekst reprezentacji jest podmieniany
+    # na geometric_context przez tablicę memo, a wspólne encje kopiowane są tylko raz.
+    if source_element.Representation and instancing is not None:
+        new_element.Representation = copy_product_shape(source_element.Representation, target_file, copy_memo, instancing)
+    elif source_element.Representation:
+        new_element.Representation = copy_entity(source_element.Representation, target_file, copy_memo)
 
     # 4. Kopiowanie zestawów właściwości (PSet)
-    for pset_name, pset_properties in ifcopenshell.util.element.get_psets(source_element).items():
-        properties_to_add = []
-        for prop_name, prop_value in pset_properties.items():
-            # ifcopenshell.util.element.get_psets returns raw values, so we need to wrap them
-            # in the appropriate IfcValue type. For simplicity, we'll assume IfcText for now.
-            # In a real-world scenario, you'd need more robust type handling.
-            if isinstance(prop_value, (int, float, str, bool)):
-                if isinstance(prop_value, int):
-                    nominal_value = target_file.create_entity("IfcInteger", prop_value)
-                elif isinstance(prop_value, float):
-                    nominal_value = target_file.create_entity("IfcReal", prop_value)
-                elif isinstance(prop_value, bool):
-                    nominal_value = target_file.create_entity("IfcBoolean", prop_value)
-                else:
-                    nominal_value = target_file.create_entity("IfcText", prop_value)
-
-                new_prop = target_file.create_entity(
-                    "IfcPropertySingleValue",
-                    Name=prop_name,
-                    NominalValue=nominal_value
-                )
-                properties_to_add.append(new_prop)
-        
-        new_pset = target_file.create_entity(
-            "IfcPropertySet",
-            GlobalId=ifcopenshell.guid.new(),
-            OwnerHistory=owner_history,
-            Name=pset_name,
-            HasProperties=properties_to_add
-        )
-        target_file.create_entity(
-            "IfcRelDefinesByProperties",
-            GlobalId=ifcopenshell.guid.new(),
-            OwnerHistory=owner_history,
-            RelatingPropertyDefinition=new_pset,
-            RelatedObjects=[new_element]
+    if pset_index is not None:
+        source_psets = get_indexed_psets(pset_index, source_element)
+    else:
+        source_psets = ifcopenshell.util.element.get_psets(source_element)
+    for pset_name, pset_properties in source_psets.items():
+        source_definition, source_properties = _source_properties(source_element, pset_name, pset_properties)
+        if not source_definition.is_a("IfcPropertySet") and not source_definition.is_a("IfcElementQuantity"):
+            # Predefiniowane definicje właściwości (np. IfcDoorLiningProperties) kopiujemy w całości
+            assign_property_definition(relationship_batch, new_element, copy_entity(source_definition, target_file, copy_memo))
+            continue
+        if not source_properties:
+            continue
+        # Właściwości i ilości kopiowane są z oryginalnym typem wartości (IfcLabel, IfcLengthMeasure...),
+        # jednostką, wyliczeniem czy listą wartości. Identyczne właściwości wszystkich elementów
+        # to w pliku docelowym jedna, współdzielona encja.
+        new_properties = [copy_interned(source_property, target_file, copy_memo) for source_property in source_properties]
+        # Identyczne Psety (ta sama klasa, nazwa i właściwości) są tworzone tylko raz i współdzielone.
+        pset_key = (
+            source_definition.is_a(), pset_name, source_definition.Description,
+            getattr(source_definition, "MethodOfMeasurement", None), tuple(new_property.id() for new_property in new_properties)
         )
+        new_pset = find_property_definition(relationship_batch, pset_key)
+        if new_pset is None:
+            if source_definition.is_a("IfcElementQuantity"):
+                new_pset = target_file.create_entity(
+                    "IfcElementQuantity",
+                    GlobalId=ifcopenshell.guid.new(),
+                    OwnerHistory=owner_history,
+                    Name=pset_name,
+                    Description=source_definition.Description,
+                    MethodOfMeasurement=source_definition.MethodOfMeasurement,
+                    Quantities=new_properties
+                )
+            else:
+                new_pset = target_file.create_entity(
+                    "IfcPropertySet",
+                    GlobalId=ifcopenshell.guid.new(),
+                    OwnerHistory=owner_history,
+                    Name=pset_name,
+                    Description=source_definition.Description,
+                    HasProperties=new_properties
+                )
+        assign_property_definition(relationship_batch, new_element, new_pset, pset_key)
+
+    # 5. Przypisanie nowego elementu do kontenera (np. IfcRoadPart) w strukturze przestrzennej.
+    # Relacje są tylko zbierane - zapisuje je flush_relationship_batch() (jedna relacja na grupę).
+    assign_to_container(relationship_batch, new_element, target_container)
 
-    # 5. Przypisanie nowego elementu do kontenera (np. IfcRoadPart) w strukturze przestrzennej
-    ifcopenshell.api.run("aggregate.assign_object", target_file, products=[new_element], relating_object=target_container)
+    if flush_now:
+        flush_relationship_batch(relationship_batch, target_file, owner_history)
 
     return new_element
 
 
-def main():
+def clone_shard(source_ifc_path, skeleton_path, shard, owner_history_id, geometric_context_id, property_filters=None, instance_geometry=False):
+    """
+    Klonuje jedną część (shard) elementów do częściowego modelu. Uruchamiane w osobnym procesie.
+
+    Proces otwiera plik źródłowy i przygotowany szkielet, klonuje przydzielone elementy
+    i zwraca tylko nowo utworzone encje jako linie STEP. Relacje agregacji nie są zapisywane,
+    lecz zwracane jako dane - zapisuje je stitch_shards() po połączeniu wszystkich części.
+
+    Args:
+        source_ifc_path (str): Ścieżka do pliku źródłowego.
+        skeleton_path (str): Ścieżka do przygotowanego szkieletu (z IfcOwnerHistory i kontekstem).
+        shard (list): Lista par (id elementu źródłowego, id kontenera w szkielecie).
+        owner_history_id (int): Id IfcOwnerHistory w szkielecie.
+        geometric_context_id (int): Id IfcGeometricRepresentationContext w szkielecie.
+        property_filters (dict, optional): Filtr strumieniowy dla open_source_model().
+        instance_geometry (bool): Współdzielenie powtarzających się reprezentacji (w obrębie części).
+
+    Returns:
+        Krotka (pierwsze nowe id, lista linii STEP, {id kontenera: [id nowych elementów]}).
+    """
+    source_ifc = open_source_model(source_ifc_path, property_filters)
+    target_ifc = ifcopenshell.open(skeleton_path)
+    return _clone_to_step_lines(source_ifc, target_ifc, shard, owner_history_id, geometric_context_id, build_pset_index(source_ifc), instance_geometry)
+
+
+def merge_source(source_ifc_path, skeleton_path, selection_rules, owner_history_id, geometric_context_id, property_filters=None, instance_geometry=False):
+    """
+    Scala cały model źródłowy ze szkieletem. Uruchamiane w osobnym procesie - jeden proces na plik źródłowy.
+
+    Proces sam wybiera elementy według reguł (select_products()) i klonuje je jak clone_shard(),
+    więc wynik można łączyć z wynikami innych plików przez stitch_shards().
+
+    Args:
+        source_ifc_path (str): Ścieżka do pliku źródłowego.
+        skeleton_path (str): Ścieżka do przygotowanego szkieletu (z IfcOwnerHistory i kontekstem).
+        selection_rules (dict): Reguły dla select_products().
+        owner_history_id (int): Id IfcOwnerHistory w szkielecie.
+        geometric_context_id (int): Id IfcGeometricRepresentationContext w szkielecie.
+        property_filters (dict, optional): Filtr strumieniowy dla open_source_model().
+        instance_geometry (bool): Współdzielenie powtarzających się reprezentacji (w obrębie pliku).
+
+    Returns:
+        Krotka jak z clone_shard().
+    """
+    source_ifc = open_source_model(source_ifc_path, property_filters)
+    target_ifc = ifcopenshell.open(skeleton_path)
+    target_containers = {part.Name: part for part in target_ifc.by_type("IfcRoadPart")}
+    pset_index = build_pset_index(source_ifc)
+    assignments = select_products(source_ifc, pset_index, target_containers, selection_rules)
+    print(f"{os.path.basename(source_ifc_path)}: wybrano {len(assignments)} z {len(source_ifc.by_type('IfcProduct'))} elementów.")
+    shard = [(product.id(), target_containers[target_container_name].id()) for product, target_container_name in assignments]
+    return _clone_to_step_lines(source_ifc, target_ifc, shard, owner_history_id, geometric_context_id, pset_index, instance_geometry)
+
+
+def _clone_to_step_lines(source_ifc, target_ifc, shard, owner_history_id, geometric_context_id, pset_index, instance_geometry):
+    # Wspólna część clone_shard() i merge_source(): klonuje elementy do szkieletu w pamięci
+    # i zwraca tylko nowe encje jako linie STEP oraz agregacje jako dane.
+    first_new_id = max(entity.id() for entity in target_ifc) + 1
+
+    owner_history = target_ifc.by_id(owner_history_id)
+    geometric_context = target_ifc.by_id(geometric_context_id)
+    copy_memo = create_copy_memo(source_ifc, owner_history, geometric_context)
+    relationship_batch = create_relationship_batch()
+    instancing = create_instancing_table([source_ifc.by_id(product_id) for product_id, _ in shard]) if instance_geometry else None
+
+    for product_id, container_id in shard:
+        clone_element_to_target(source_ifc.by_id(product_id), target_ifc, target_ifc.by_id(container_id), owner_history, geometric_context, pset_index, copy_memo, relationship_batch, instancing)
+
+    # Agregacje zwracamy jako dane, relacje właściwości zapisujemy w części (to nowe encje)
+    aggregates = {
+        container_id: [product.id() for product in products]
+        for container_id, (_, products) in relationship_batch["aggregates"].items()
+    }
+    relationship_batch["aggregates"] = {}
+    flush_relationship_batch(relationship_batch, target_ifc, owner_history)
+
+    lines = []
+    for line in target_ifc.to_string().splitlines():
+        if line.startswith("#") and int(line[1:line.index("=")]) >= first_new_id:
+            lines.append(line)
+    return first_new_id, lines, aggregates
+
+
+def _intern_styles(lines):
+    # Style (IfcSurfaceStyle z kolorem itd.) są internowane przez copy_interned() tylko w obrębie procesu -
+    # każda część ma własne kopie. Encje osiągalne ze Styles (nie z Item) IfcStyledItem o tej samej
+    # treści (typ i argumenty, z referencjami zamienionymi na już internowane style) zostawiamy raz.
+    # Zwraca linie bez duplikatów, z referencjami przepiętymi na pozostawione style.
+    statements = {}
+    styles = []
+    for index, line in enumerate(lines):
+        match = STEP_ENTITY_PATTERN.match(line.encode("utf-8"))
+        if match:
+            statements[int(match.group(1))] = (index, line[match.end():])
+            if match.group(2).upper() == STYLED_ITEM_TYPE:
+                # Pierwszy argument to Item - element geometrii, nie styl
+                styles.extend(int(ref) for ref in STEP_REFERENCE_PATTERN.findall(line[match.end():].split(",", 1)[1].encode("utf-8")) if ref)
+
+    keys = {}
+    canonical = {}
+
+    def resolve(match):
+        if match.group(1) is None or int(match.group(1)) not in canonical:
+            return match.group(0)
+        return b"#%d" % canonical[int(match.group(1))]
+
+    # Przejście w głąb: referencje stylu internowane są przed nim samym
+    stack = [(style_id, False) for style_id in styles]
+    while stack:
+        entity_id, expanded = stack.pop()
+        if entity_id in canonical or entity_id not in statements:
+            continue
+        index, arguments = statements[entity_id]
+        if not expanded:
+            stack.append((entity_id, True))
+            stack.extend((int(ref), False) for ref in STEP_REFERENCE_PATTERN.findall(arguments.encode("utf-8")) if ref)
+            continue
+        header = lines[index][len(str(entity_id)) + 1:]
+        key = STEP_REFERENCE_PATTERN.sub(resolve, header.encode("utf-8"))
+        canonical[entity_id] = keys.setdefault(key, entity_id)
+
+    duplicates = {entity_id: kept for entity_id, kept in canonical.items() if kept != entity_id}
+    if not duplicates:
+        return lines
+
+    def remap(match):
+        if match.group(1) is None or int(match.group(1)) not in duplicates:
+            return match.group(0)
+        return b"#%d" % duplicates[int(match.group(1))]
+
+    return [
+        STEP_REFERENCE_PATTERN.sub(remap, line.encode("utf-8")).decode("utf-8")
+        for line in lines
+        if int(line[1:line.index("=")]) not in duplicates
+    ]
+
+
+def stitch_shards(target_ifc, shard_results, owner_history):
+    """
+    Łączy części z clone_shard() w jeden model docelowy.
+
+    Id nowych encji każdej części są przesuwane tak, aby nie nachodziły na siebie
+    (referencje do encji szkieletu pozostają bez zmian). GlobalId nie wymagają zmian -
+    każdy proces generuje je losowo przez ifcopenshell.guid.new(). Style elementów geometrii
+    (IfcSurfaceStyle wraz z kolorami itd.) o tej samej treści z różnych części zapisywane są raz;
+    IfcStyledItem pozostają osobne, bo każdy wskazuje na własny element geometrii.
+
+    Args:
+        target_ifc: Przygotowany szkielet docelowy (ten sam, który otrzymały procesy).
+        shard_results (list): Wyniki clone_shard().
+        owner_history: IfcOwnerHistory w szkielecie.
+
+    Returns:
+        Nowy, połączony plik IFC.
+    """
+    skeleton_text = target_ifc.to_string()
+    next_id = max(entity.id() for entity in target_ifc) + 1
+    stitched_lines = []
+    aggregates = {}
+
+    for first_new_id, lines, shard_aggregates in shard_results:
+        offset = next_id - first_new_id
+
+        def remap(match):
+            if match.group(1) is None or int(match.group(1)) < first_new_id:
+                return match.group(0)
+            return b"#%d" % (int(match.group(1)) + offset)
+
+        last_id = first_new_id - 1
+        for line in lines:
+            stitched_lines.append(STEP_REFERENCE_PATTERN.sub(remap, line.encode("utf-8")).decode("utf-8"))
+            last_id = max(last_id, int(line[1:line.index("=")]))
+        next_id = last_id + offset + 1
+
+        for container_id, product_ids in shard_aggregates.items():
+            aggregates.setdefault(container_id, []).extend(product_id + offset for product_id in product_ids)
+
+    stitched_lines = _intern_styles(stitched_lines)
+    data_end = skeleton_text.rindex("ENDSEC;")
+    merged_ifc = ifcopenshell.file.from_string(skeleton_text[:data_end] + "\n".join(stitched_lines) + "\n" + skeleton_text[data_end:])
+
+    relationship_batch = create_relationship_batch()
+    for container_id, product_ids in aggregates.items():
+        container = merged_ifc.by_id(container_id)
+        for product_id in product_ids:
+            assign_to_container(relationship_batch, merged_ifc.by_id(product_id), container)
+    flush_relationship_batch(relationship_batch, merged_ifc, merged_ifc.by_id(owner_history.id()))
+    return merged_ifc
+
+
+def merge_sharded(source_ifc_path, target_ifc, selected_products, owner_history, geometric_context, worker_count, property_filters=None, instance_geometry=False):
+    """
+    Klonuje wybrane elementy równolegle w worker_count procesach i łączy wyniki.
+
+    Args:
+        source_ifc_path (str): Ścieżka do pliku źródłowego.
+        target_ifc: Szkielet docelowy (z już utworzonymi IfcOwnerHistory i kontekstem).
+        selected_products (list): Lista par (id elementu źródłowego, id kontenera docelowego).
+        owner_history: IfcOwnerHistory w szkielecie.
+        geometric_context: IfcGeometricRepresentationContext w szkielecie.
+        worker_count (int): Liczba procesów.
+        property_filters (dict, optional): Filtr strumieniowy dla open_source_model().
+        instance_geometry (bool): Przekazywane do clone_shard().
+
+    Returns:
+        Nowy, połączony plik IFC.
+    """
+    # Kolejne, ciągłe fragmenty listy - sąsiednie elementy często dzielą geometrię i style
+    shard_size = -(-len(selected_products) // worker_count)
+    shards = [selected_products[i:i + shard_size] for i in range(0, len(selected_products), shard_size)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Procesy muszą widzieć szkielet z tymi samymi id, co model w pamięci
+        skeleton_path = os.path.join(temp_dir, "skeleton.ifc")
+        target_ifc.write(skeleton_path)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [
+                executor.submit(clone_shard, source_ifc_path, skeleton_path, shard, owner_history.id(), geometric_context.id(), property_filters, instance_geometry)
+                for shard in shards
+            ]
+            shard_results = [future.result() for future in futures]
+
+    print(f"Sklonowano {len(selected_products)} elementów w {len(shards)} procesach. Łączenie części...")
+    return stitch_shards(target_ifc, shard_results, owner_history)
+
+
+def merge_sources(source_ifc_paths, target_ifc, owner_history, geometric_context, selection_rules, property_filters=None, instance_geometry=False):
+    """
+    Scala wiele modeli źródłowych (np. branżowych) ze szkieletem w jednym przebiegu.
+
+    Szkielet zapisywany jest raz, każdy plik źródłowy przetwarzany jest równolegle
+    w osobnym procesie (merge_source()), a wyniki łączone są przez stitch_shards() -
+    wszystkie pliki współdzielą IfcOwnerHistory, kontekst geometryczny i kontenery szkieletu, a style o tej samej treści zapisywane są raz.
+    Czas całości wyznacza więc najwolniejszy plik, a nie suma czasów.
+
+    Args:
+        source_ifc_paths (list): Ścieżki do plików źródłowych.
+        target_ifc: Szkielet docelowy (z już utworzonymi IfcOwnerHistory i kontekstem).
+        owner_history: IfcOwnerHistory w szkielecie.
+        geometric_context: IfcGeometricRepresentationContext w szkielecie.
+        selection_rules (dict): Reguły dla select_products().
+        property_filters (dict, optional): Filtr strumieniowy dla open_source_model().
+        instance_geometry (bool): Przekazywane do merge_source().
+
+    Returns:
+        Nowy, połączony plik IFC.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Procesy muszą widzieć szkielet z tymi samymi id, co model w pamięci
+        skeleton_path = os.path.join(temp_dir, "skeleton.ifc")
+        target_ifc.write(skeleton_path)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=len(source_ifc_paths)) as executor:
+            futures = [
+                executor.submit(merge_source, source_ifc_path, skeleton_path, selection_rules, owner_history.id(), geometric_context.id(), property_filters, instance_geometry)
+                for source_ifc_path in source_ifc_paths
+            ]
+            # Kolejność części jak kolejność plików - wynik nie zależy od tego, który proces skończy pierwszy
+            source_results = [future.result() for future in futures]
+
+    print(f"Przetworzono {len(source_ifc_paths)} plików źródłowych. Łączenie wyników...")
+    return stitch_shards(target_ifc, source_results, owner_history)
+
+
+def main(source_ifc_paths=None, target_skeleton_path=None, output_ifc_path=None):
     """
     Główna funkcja skryptu.
+
+    Ścieżki podane jako argumenty (np. przez benchmark) zastępują ścieżki z konfiguracji poniżej.
     """
     # --- Konfiguracja ---
-    source_ifc_path = "/Users/wojtek/Blender/IFC_Upgrade_and_Merge/01_Source_IFCs/BM_Strasse.IFC"
-    target_skeleton_path = "/Users/wojtek/Blender/01_Source_IFCs/OD_Matten_4x3.ifc"
-    output_ifc_path = "/Users/wojtek/Blender/IFC_Upgrade_and_Merge/01_Source_IFCs/BM_Strasse_4x3_upgraded.ifc"
+    # Pliki źródłowe. Więcej niż jeden plik (np. modele branżowe OD-MATTEN_*.ifc) włącza scalanie
+    # wielu źródeł w jednym przebiegu: każdy plik w osobnym procesie, wynik zapisywany raz.
+    source_ifc_paths = source_ifc_paths or [
+        "/Users/wojtek/Blender/IFC_Upgrade_and_Merge/01_Source_IFCs/BM_Strasse.IFC",
+    ]
+    target_skeleton_path = target_skeleton_path or "/Users/wojtek/Blender/01_Source_IFCs/OD_Matten_4x3.ifc"
+    output_ifc_path = output_ifc_path or "/Users/wojtek/Blender/IFC_Upgrade_and_Merge/01_Source_IFCs/BM_Strasse_4x3_upgraded.ifc"
 
     # --- Logika mapowania (zgodnie z plikiem .md) ---
     # Klucz: Wartość atrybutu PVI_STATIONSBEZUG
@@ -191,15 +564,91 @@ def main():
     terrain_rule_value = "Gelände"
     terrain_target_container_name = "Kantonstrasse | CARRIAGEWAY"
 
+    # Liczba procesów klonujących. Wartość > 1 włącza tryb równoległy (shardy + łączenie).
+    worker_count = 1
+
+    # Strumieniowe filtrowanie pliku źródłowego: ładowane są tylko elementy, których wartości ProVI
+    # pasują do reguł (wraz z zależnościami). Uwzględnia tylko Psety przypisane bezpośrednio
+    # do elementów, nie dziedziczone z typu - dlatego domyślnie wyłączone.
+    use_streaming_filter = False
+
+    # Pamięć podręczna modelu (model_cache): indeks Psetów pliku źródłowego odczytywany jest z kolumn
+    # zapisanych przy pierwszym uruchomieniu (katalog .ifc_cache obok pliku, klucz - skrót zawartości),
+    # zamiast budowania go od nowa. Nie dotyczy filtrowania strumieniowego. Domyślnie wyłączone, bo
+    # zapisuje katalog obok pliku źródłowego (.ifc_cache/ jest w .gitignore).
+    use_model_cache = False
+
+    # Tryb przyrostowy: jeśli istnieje plik wynikowy i jego manifest, aktualizujemy go zamiast
+    # budować od nowa - klonowane są tylko elementy nowe lub zmienione (wg skrótu treści),
+    # a elementy usunięte ze źródła są usuwane z wyniku. Działa w trybie jednoprocesowym.
+    incremental = False
+    manifest_path = get_manifest_path(output_ifc_path)
+
+    # Przypisanie przestrzenne: elementy bez pasującej reguły (np. bez PVI_STATIONSBEZUG) trafiają do
+    # kontenera, którego elementy przypisane regułami leżą najbliżej w rzucie - o ile nie dalej niż
+    # spatial_max_distance [m]. Wymaga triangulacji geometrii (ifcopenshell.geom, wiele wątków).
+    spatial_assignment = False
+    spatial_max_distance = 10.0
+
+    # Współdzielenie geometrii: reprezentacje powtarzające się w klonowanych elementach (ta sama geometria,
+    # inne położenie) zapisywane są raz jako IfcRepresentationMap, a elementy dostają IfcMappedItem.
+    # W trybie równoległym współdzielenie działa w obrębie każdej części. Tablica skrótów reprezentacji
+    # kosztuje czas także wtedy, gdy nic się nie powtarza - dlatego domyślnie wyłączone.
+    instance_geometry = False
+
+    # Zapis wyniku: zakresy encji serializowane równolegle w writer_worker_count procesach (None - liczba
+    # rdzeni). Rozszerzenie output_ifc_path wybiera format: .ifc, .ifcZIP lub .ifc.gz (kompresja w procesach).
+    # Tryb przyrostowy wczytuje poprzedni wynik przez ifcopenshell.open(), który nie obsługuje .gz.
+    writer_worker_count = None
+
+    # Profilowanie: czasy etapów (wczytywanie, indeks Psetów, reguły, klonowanie, zapis), czasy klonowania
+    # według typu geometrii i liczby utworzonych encji według klas. Wyniki zapisywane są do
+    # profile_output_path (None - wyłączone) jako JSON ("json") lub Chrome Trace Event ("chrome",
+    # do otwarcia w chrome://tracing lub Perfetto). profile_use_cprofile dodaje statystyki cProfile (.prof).
+    profile_output_path = None
+    profile_format = "json"
+    profile_use_cprofile = False
 
     # --- Implementacja ---
-    print(f"Wczytywanie pliku źródłowego: {source_ifc_path}")
-    source_ifc = ifcopenshell.open(source_ifc_path)
-
-    print(f"Wczytywanie szkieletu docelowego: {target_skeleton_path}")
-    target_ifc = ifcopenshell.open(target_skeleton_path)
+    profiler = create_profiler(profile_use_cprofile) if profile_output_path else None
+    selection_rules = {
+        "mapping_rules": mapping_rules,
+        "terrain_rule": (terrain_rule_property, terrain_rule_value, terrain_target_container_name),
+        "spatial_max_distance": spatial_max_distance if spatial_assignment else None,
+    }
+    property_filters = None
+    if use_streaming_filter:
+        property_filters = {
+            "PVI_STATIONSBEZUG": list(mapping_rules.keys()),
+            terrain_rule_property: [terrain_rule_value],
+        }
+    multiple_sources = len(source_ifc_paths) > 1
+    if multiple_sources and incremental:
+        print("Tryb przyrostowy obsługuje jeden plik źródłowy - wyłączam go przy scalaniu wielu plików.")
+        incremental = False
+    source_ifc_path = source_ifc_paths[0]
+    if not multiple_sources:
+        print(f"Wczytywanie pliku źródłowego: {source_ifc_path}")
+        with profile_stage(profiler, "load_source"):
+            source_ifc = open_source_model(source_ifc_path, property_filters)
+
+    manifest = load_manifest(manifest_path) if incremental else {"source": None, "products": {}}
+    if incremental and manifest["products"] and os.path.exists(output_ifc_path):
+        print(f"Tryb przyrostowy: wczytywanie poprzedniego wyniku: {output_ifc_path}")
+        with profile_stage(profiler, "load_target"):
+            target_ifc = ifcopenshell.open(output_ifc_path)
+    else:
+        manifest["products"] = {}
+        print(f"Wczytywanie szkieletu docelowego: {target_skeleton_path}")
+        with profile_stage(profiler, "load_target"):
+            target_ifc = ifcopenshell.open(target_skeleton_path)
+    record_entity_counts(profiler, "skeleton", target_ifc)
+    if incremental and worker_count > 1:
+        print("Tryb przyrostowy klonuje w jednym procesie - ignoruję worker_count.")
+        worker_count = 1
 
     # Sprawdzenie i utworzenie IfcOwnerHistory, jeśli nie istnieje
+    setup_started = time.time()
     owner_history = target_ifc.by_type("IfcOwnerHistory")
     if not owner_history:
         print("Brak IfcOwnerHistory w pliku docelowym. Tworzę domyślny.")
@@ -257,64 +706,108 @@ def main():
         part.Name: part for part in target_ifc.by_type("IfcRoadPart")
     }
     print(f"Znaleziono następujące kontenery w pliku docelowym: {list(target_containers.keys())}")
+    add_stage(profiler, "setup", setup_started)
+
+    if multiple_sources:
+        print(f"\n--- Scalanie {len(source_ifc_paths)} plików źródłowych ---")
+        with profile_stage(profiler, "merge_sources"):
+            target_ifc = merge_sources(source_ifc_paths, target_ifc, owner_history, geometric_context, selection_rules, property_filters, instance_geometry)
+        print(f"Zapisywanie połączonego pliku do: {output_ifc_path}")
+        with profile_stage(profiler, "write"):
+            write_ifc(target_ifc, output_ifc_path, writer_worker_count)
+        record_entity_counts(profiler, "output", target_ifc)
+        finish_profiler(profiler, profile_output_path, profile_format)
+        print("Gotowe!")
+        return
 
     # Pobranie wszystkich elementów geometrycznych z pliku źródłowego
     print("\n--- Rozpoczynam przetwarzanie pliku źródłowego ---")
     print("Krok 1: Pobieranie wszystkich elementów IfcProduct. To może zająć chwilę...")
     source_products = source_ifc.by_type("IfcProduct")
     print(f"Krok 1 zakończony. Znaleziono {len(source_products)} elementów w pliku źródłowym.")
+    # Jednorazowe zbudowanie indeksu Psetów - reguły są potem sprawdzane przez wyszukiwanie w słowniku
+    with profile_stage(profiler, "pset_index"):
+        if use_model_cache and not property_filters:
+            pset_index = get_cached_pset_index(open_model_cache(source_ifc_path))
+        else:
+            pset_index = build_pset_index(source_ifc)
+    print(f"Zbudowano indeks Psetów dla {len(pset_index['psets'])} elementów.")
+    # Jedna tablica memo dla całego przebiegu - wspólna geometria jest kopiowana tylko raz
+    copy_memo = create_copy_memo(source_ifc, owner_history, geometric_context)
+    # Relacje agregacji i właściwości są zbierane i zapisywane grupami po zakończeniu pętli
+    relationship_batch = create_relationship_batch()
     print("\n--- Rozpoczynam pętlę mapowania i klonowania ---")
     print("Krok 2: Iterowanie przez elementy, sprawdzanie reguł i klonowanie. To będzie główna część procesu.")
 
 
-    cloned_count = 0
-    for i, product in enumerate(source_products):
-        # Logowanie postępu co 1000 elementów
-        if i > 0 and i % 1000 == 0:
-            print(f"  ...przetworzono {i} z {len(source_products)} elementów...")
-
-        # Ignorujemy elementy, które nie mają geometrii lub są częścią agregacji
-        if not product.Representation:
-            continue
-
-        target_container_name = None
-
-        # Sprawdzenie reguły dla terenu
-        bauteiltyp = get_property_value(product, "ProVI", terrain_rule_property)
-        if bauteiltyp == terrain_rule_value:
-            target_container_name = terrain_target_container_name
-        else:
-            # Sprawdzenie głównych reguł mapowania
-            stationsbezug = get_property_value(product, "ProVI", "PVI_STATIONSBEZUG")
-            if stationsbezug in mapping_rules:
-                target_container_name = mapping_rules[stationsbezug]
-
-        # Jeśli znaleziono pasujący kontener, klonujemy element
-        if target_container_name and target_container_name in target_containers:
-            target_container = target_containers[target_container_name]
-            
-            # --- POPRAWKA SPS002 ---
-            # Sprawdzamy, czy klonowany element to IfcAlignment.
-            # Jeśli tak, upewniamy się, że kontenerem jest IfcRoadPart, a nie IfcRoad.
-            if product.is_a("IfcAlignment"):
-                # Zakładamy, że nazwa kontenera dla osi powinna wskazywać na IfcRoadPart.
-                # Jeśli mapowanie wskazuje na coś innego, logujemy błąd.
-                if not target_container.is_a("IfcRoadPart"):
-                    print(f"BŁĄD KRYTYCZNY: Element IfcAlignment ('{product.Name}') jest mapowany do kontenera '{target_container_name}', który nie jest typu IfcRoadPart. Pomijam ten element.")
-                    continue # Przechodzimy do następnego produktu
+    # Etap 1: wybór elementów i ich kontenerów docelowych według reguł
+    with profile_stage(profiler, "select"):
+        assignments = select_products(source_ifc, pset_index, target_containers, selection_rules)
 
-            print(f"Mapowanie elementu '{product.Name}' ({product.is_a()}) do '{target_container_name}'")
-            clone_element_to_target(product, target_ifc, target_container, owner_history, geometric_context)
-            cloned_count += 1
+    # Etap 2: klonowanie wybranych elementów
+    cloned_count = 0
+    unchanged_count = 0
+    selected_products = []
+    # Manifest bieżącego przebiegu i pamięć skrótów encji źródłowych (tryb przyrostowy)
+    merged_products = {}
+    hash_memo = {}
+    instancing = None
+    if instance_geometry and worker_count == 1:
+        with profile_stage(profiler, "instancing_table"):
+            instancing = create_instancing_table([product for product, _ in assignments])
+        print(f"Współdzielenie geometrii: {len(instancing['repeated'])} powtarzających się reprezentacji.")
+    clone_started = time.time()
+    for product, target_container_name in assignments:
+        target_container = target_containers[target_container_name]
+
+        if incremental:
+            product_hash = compute_product_hash(product, get_indexed_psets(pset_index, product), target_container_name, hash_memo)
+            previous = manifest["products"].get(product.GlobalId)
+            if previous and previous["hash"] == product_hash:
+                # Element bez zmian - zostaje w wyniku z poprzedniego przebiegu
+                merged_products[product.GlobalId] = previous
+                unchanged_count += 1
+                continue
+            if previous:
+                remove_target_product(target_ifc, previous["target"])
+
+        print(f"Mapowanie elementu '{product.Name}' ({product.is_a()}) do '{target_container_name}'")
+        if worker_count > 1:
+            # W trybie równoległym tylko zbieramy elementy - klonują je procesy
+            selected_products.append((product.id(), target_container.id()))
         else:
-            # To jest normalne dla elementów, których nie chcemy mapować, np. IfcSite, IfcProject
-            # print(f"Info: Nie znaleziono reguły mapowania dla elementu '{product.Name}' ({product.is_a()}). Element zostanie pominięty.")
-            pass
-
-
+            element_started = time.perf_counter()
+            new_element = clone_element_to_target(product, target_ifc, target_container, owner_history, geometric_context, pset_index, copy_memo, relationship_batch, instancing)
+            record_clone(profiler, product, time.perf_counter() - element_started)
+            if incremental:
+                merged_products[product.GlobalId] = {"hash": product_hash, "target": new_element.GlobalId}
+        cloned_count += 1
+    add_stage(profiler, "clone", clone_started)
+
+
+    if incremental:
+        # Elementy z poprzedniego przebiegu, których nie ma już w źródle (lub nie pasują do reguł)
+        removed_guids = set(manifest["products"]) - set(merged_products)
+        for source_guid in removed_guids:
+            remove_target_product(target_ifc, manifest["products"][source_guid]["target"])
+        print(f"Tryb przyrostowy: bez zmian {unchanged_count}, sklonowano {cloned_count}, usunięto {len(removed_guids)}.")
+
+    if selected_products:
+        with profile_stage(profiler, "merge_sharded"):
+            target_ifc = merge_sharded(source_ifc_path, target_ifc, selected_products, owner_history, geometric_context, worker_count, property_filters, instance_geometry)
+    else:
+        with profile_stage(profiler, "relationships"):
+            written_relationships = flush_relationship_batch(relationship_batch, target_ifc, owner_history)
+        print(f"Zapisano {written_relationships} zbiorczych relacji agregacji i właściwości.")
     print(f"Proces zakończony. Sklonowano {cloned_count} z {len(source_products)} elementów.")
     print(f"Zapisywanie zaktualizowanego pliku do: {output_ifc_path}")
-    target_ifc.write(output_ifc_path)
+    with profile_stage(profiler, "write"):
+        write_ifc(target_ifc, output_ifc_path, writer_worker_count)
+    if incremental:
+        save_manifest(manifest_path, {"source": source_ifc_path, "products": merged_products})
+        print(f"Zapisano manifest scalania: {manifest_path}")
+    record_entity_counts(profiler, "output", target_ifc)
+    finish_profiler(profiler, profile_output_path, profile_format)
     print("Gotowe!")
 
 
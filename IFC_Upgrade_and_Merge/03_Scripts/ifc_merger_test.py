@@ -3,9 +3,17 @@ import ifcopenshell.api
 import ifcopenshell.util.element
 import uuid
 import datetime
+import os
+import sys
 import ifcopenshell.util.date
 
-def get_property_value(element, pset_name, prop_name):
+# Wspólne narzędzia z katalogu 00_Utilities
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from pset_index import build_pset_index, get_indexed_value
+from ifc_copy_engine import copy_entity, create_copy_memo
+from ifc_relationship_batch import assign_property_definition, assign_to_container, create_relationship_batch, flush_relationship_batch
+
+def get_property_value(element, pset_name, prop_name, pset_index=None):
     """
     Pobiera wartość konkretnej właściwości z danego zestawu właściwości (PSet) elementu.
 
@@ -13,10 +21,14 @@ def get_property_value(element, pset_name, prop_name):
         element: Element IfcProduct.
         pset_name (str): Nazwa zestawu właściwości (np. "ProVI").
         prop_name (str): Nazwa właściwości (np. "PVI_STATIONSBEZUG").
+        pset_index (dict, optional): Indeks z build_pset_index(). Jeśli podany,
+                                     wartość jest pobierana ze słownika zamiast przez get_psets.
 
     Returns:
         Wartość właściwości lub None, jeśli nie zostanie znaleziona.
     """
+    if pset_index is not None:
+        return get_indexed_value(pset_index, element, pset_name, prop_name)
     psets = ifcopenshell.util.element.get_psets(element)
     if pset_name in psets:
         if prop_name in psets[pset_name]:
@@ -24,7 +36,7 @@ def get_property_value(element, pset_name, prop_name):
     return None
 
 
-def clone_element_to_target(source_element, target_file, target_container, owner_history, geometric_context, target_type=None):
+def clone_element_to_target(source_element, target_file, target_container, owner_history, geometric_context, target_type=None, copy_memo=None, relationship_batch=None):
     """
     Klonuje element (geometrię i właściwości) z pliku źródłowego do docelowego.
     Tworzy nowy element typu IfcBuildingElementProxy w pliku docelowym,
@@ -37,56 +49,19 @@ def clone_element_to_target(source_element, target_file, target_container, owner
                           (np. IfcRoadPart).
         owner_history: Obiekt IfcOwnerHistory do przypisania nowym elementom.
         geometric_context: Obiekt IfcGeometricRepresentationContext do przypisania nowym reprezentacjom.
+        copy_memo (dict, optional): Tablica memo z create_copy_memo(), wspólna dla wszystkich
+                                    klonowanych elementów. Jeśli brak, tworzona jest nowa.
+        relationship_batch (dict, optional): Bufor relacji z create_relationship_batch().
+                                             Jeśli brak, relacje są zapisywane od razu.
 
     Returns:
         Nowo utworzony element w pliku docelowym.
     """
-    # Helper function to recursively copy an IFC entity and its attributes
-    def copy_ifc_entity(source_entity, target_file, copied_entities):
-        if source_entity is None:
-            return None
-        if source_entity in copied_entities:
-            return copied_entities[source_entity]
-        if not (hasattr(source_entity, 'is_a') and callable(getattr(source_entity, 'is_a')) and source_entity.is_a()):
-            return source_entity
-
-        # Create a placeholder entity to handle circular references in the model
-        new_entity = target_file.create_entity(source_entity.is_a())
-        copied_entities[source_entity] = new_entity
-
-        # Iterate over attributes by index to ensure correct order and avoid inverse attributes
-        for i in range(len(source_entity)):
-            attribute = source_entity[i]
-            
-            # Skip attributes that are handled by the main function or should not be copied directly
-            attr_name = source_entity.attribute_name(i)
-            if attr_name in ('GlobalId', 'OwnerHistory'):
-                continue
-
-            # Recursively copy nested entities or lists of entities
-            if isinstance(attribute, ifcopenshell.entity_instance):
-                attribute = copy_ifc_entity(attribute, target_file, copied_entities)
-            elif isinstance(attribute, (list, tuple)):
-                new_list = []
-                for item in attribute:
-                    if isinstance(item, ifcopenshell.entity_instance):
-                        new_list.append(copy_ifc_entity(item, target_file, copied_entities))
-                    elif isinstance(item, (list, tuple)):
-                        # Handle nested lists of values, e.g. ((1,2,3), (4,5,6)) in IfcTriangulatedFaceSet
-                        new_list.append(type(item)(list(sub_item for sub_item in item)))
-                    else:
-                        new_list.append(item)
-                attribute = type(attribute)(new_list)
-            
-            try:
-                # Set the attribute on the new entity by index
-                new_entity[i] = attribute
-            except Exception:
-                # This may fail for derived or read-only attributes, which is expected.
-                # We can safely ignore these errors.
-                pass
-
-        return new_entity
+    if copy_memo is None:
+        copy_memo = create_copy_memo(source_element.file, owner_history, geometric_context)
+    flush_now = relationship_batch is None
+    if flush_now:
+        relationship_batch = create_relationship_batch()
 
     # 1. Utworzenie nowego elementu w pliku docelowym
     # Używamy typu docelowego, jeśli został podany, w przeciwnym razie używamy typu źródłowego.
@@ -100,17 +75,17 @@ def clone_element_to_target(source_element, target_file, target_container, owner
         ObjectType=source_element.ObjectType
     )
 
-    # Słownik do śledzenia już skopiowanych encji, aby uniknąć duplikatów i obsłużyć cykliczne zależności.
-    # Klucz: encja w pliku źródłowym, Wartość: encja w pliku docelowym.
-    copied_entities = {source_element: new_element}
+    # Tablica memo jest wspólna dla wszystkich elementów, więc rejestrujemy w niej także sam element.
+    # Klucz: id encji w pliku źródłowym, Wartość: encja w pliku docelowym.
+    copy_memo[source_element.id()] = new_element
 
     # 2. Kopiowanie umiejscowienia (ObjectPlacement)
     if source_element.ObjectPlacement:
-        new_element.ObjectPlacement = copy_ifc_entity(source_element.ObjectPlacement, target_file, copied_entities)
+        new_element.ObjectPlacement = copy_entity(source_element.ObjectPlacement, target_file, copy_memo)
 
     # 3. Kopiowanie reprezentacji geometrycznej (Representation)
     if source_element.Representation:
-        new_element.Representation = copy_ifc_entity(source_element.Representation, target_file, copied_entities)
+        new_element.Representation = copy_entity(source_element.Representation, target_file, copy_memo)
 
     # 4. Kopiowanie zestawów właściwości (PSet)
     # Iterujemy przez relacje właściwości zdefiniowane dla elementu źródłowego.
@@ -121,19 +96,18 @@ def clone_element_to_target(source_element, target_file, target_container, owner
             # Kopiujemy tylko relacje typu IfcRelDefinesByProperties
             if rel.is_a("IfcRelDefinesByProperties"):
                 # Głębokie kopiowanie definicji właściwości (np. IfcPropertySet)
-                new_property_definition = copy_ifc_entity(rel.RelatingPropertyDefinition, target_file, copied_entities)
-                
-                # Utworzenie nowej relacji w pliku docelowym, łączącej nową definicję właściwości z nowym elementem
-                target_file.create_entity(
-                    "IfcRelDefinesByProperties",
-                    GlobalId=ifcopenshell.guid.new(),
-                    OwnerHistory=owner_history,
-                    RelatingPropertyDefinition=new_property_definition,
-                    RelatedObjects=[new_element]
-                )
-
-    # 5. Przypisanie nowego elementu do kontenera (np. IfcRoadPart) w strukturze przestrzennej
-    ifcopenshell.api.run("aggregate.assign_object", target_file, products=[new_element], relating_object=target_container)
+                # Wspólna definicja ze źródła trafia do pliku docelowego raz (memo)
+                new_property_definition = copy_entity(rel.RelatingPropertyDefinition, target_file, copy_memo)
+
+                # Element dołącza do grupy tej definicji - jedna relacja na definicję
+                assign_property_definition(relationship_batch, new_element, new_property_definition)
+
+    # 5. Przypisanie nowego elementu do kontenera (np. IfcRoadPart) w strukturze przestrzennej.
+    # Relacje są tylko zbierane - zapisuje je flush_relationship_batch() (jedna relacja na grupę).
+    assign_to_container(relationship_batch, new_element, target_container)
+
+    if flush_now:
+        flush_relationship_batch(relationship_batch, target_file, owner_history)
 
     return new_element
 
@@ -218,6 +192,11 @@ def main():
     else:
         geometric_context = geometric_context[0]
 
+    # Jedna tablica memo dla całego przebiegu - wspólna geometria jest kopiowana tylko raz
+    copy_memo = create_copy_memo(source_ifc, owner_history, geometric_context)
+    # Relacje agregacji i właściwości są zbierane i zapisywane grupami na końcu
+    relationship_batch = create_relationship_batch()
+
     # --- Logika dla terenu ---
     print("\n--- Przetwarzanie terenu ---")
     cloned_terrain_elements = set()
@@ -237,7 +216,7 @@ def main():
                     for element in rel.RelatedElements:
                         if element.is_a("IfcProduct") and element.Representation:
                             print(f"Mapowanie elementu terenu '{element.Name}' ({element.is_a()}) do '{terrain_target_container_name}' jako IfcGeographicElement")
-                            clone_element_to_target(element, target_ifc, terrain_target_container, owner_history, geometric_context, target_type="IfcGeographicElement")
+                            clone_element_to_target(element, target_ifc, terrain_target_container, owner_history, geometric_context, target_type="IfcGeographicElement", copy_memo=copy_memo, relationship_batch=relationship_batch)
                             cloned_terrain_elements.add(element.id())
             else:
                 print("Ostrzeżenie: Kontener terenu nie zawiera żadnych elementów (atrybut ContainsElements jest pusty).")
@@ -250,6 +229,7 @@ def main():
     print("\n--- Rozpoczynam pętlę mapowania i klonowania pozostałych elementów ---")
     source_products = source_ifc.by_type("IfcProduct")
     print(f"Znaleziono {len(source_products)} elementów w pliku źródłowym. Rozpoczynam pętlę...")
+    pset_index = build_pset_index(source_ifc)
 
     cloned_count = 0
     cloned_counts_per_class = {}
@@ -270,16 +250,19 @@ def main():
         cloned_counts_per_class[product_type] += 1
 
         target_container_name_main = None
-        stationsbezug = get_property_value(product, "ProVI", "PVI_STATIONSBEZUG")
+        stationsbezug = get_property_value(product, "ProVI", "PVI_STATIONSBEZUG", pset_index)
         if stationsbezug in mapping_rules:
             target_container_name_main = mapping_rules[stationsbezug]
 
         if target_container_name_main and target_container_name_main in target_containers:
             target_container = target_containers[target_container_name_main]
             print(f"Mapowanie elementu '{product.Name}' ({product.is_a()}) do '{target_container_name_main}'")
-            clone_element_to_target(product, target_ifc, target_container, owner_history, geometric_context)
+            clone_element_to_target(product, target_ifc, target_container, owner_history, geometric_context, copy_memo=copy_memo, relationship_batch=relationship_batch)
             cloned_count += 1
 
+    written_relationships = flush_relationship_batch(relationship_batch, target_ifc, owner_history)
+    print(f"Zapisano {written_relationships} zbiorczych relacji agregacji i właściwości.")
+
     total_cloned_elements = len(cloned_terrain_elements) + sum(cloned_counts_per_class.values())
     print(f"\nProces zakończony. Sklonowano łącznie {total_cloned_elements} elementów.")
     print(f"Zapisywanie zaktualizowanego pliku do: {output_ifc_path}")
@@ -0,0 +1,106 @@
+import ifcopenshell
+import ifcopenshell.guid
+
+
+def create_relationship_batch():
+    """
+    Tworzy pusty bufor relacji dla scalania.
+
+    Zamiast tworzyć IfcRelAggregates (przez aggregate.assign_object) i IfcRelDefinesByProperties
+    dla każdego sklonowanego elementu osobno, elementy są zbierane w grupy:
+    po kontenerze docelowym oraz po identycznej definicji właściwości.
+    Relacje zapisywane są jednorazowo przez flush_relationship_batch().
+
+    Returns:
+        dict z kluczami:
+            "aggregates": {id kontenera: (kontener, [elementy])}
+            "properties": {klucz definicji: (definicja właściwości, [elementy])}
+    """
+    return {"aggregates": {}, "properties": {}}
+
+
+def assign_to_container(batch, product, container):
+    """
+    Dodaje element do grupy agregacji danego kontenera (np. IfcRoadPart).
+
+    Args:
+        batch (dict): Bufor z create_relationship_batch().
+        product: Nowy element w pliku docelowym.
+        container: Kontener w pliku docelowym.
+    """
+    batch["aggregates"].setdefault(container.id(), (container, []))[1].append(product)
+
+
+def find_property_definition(batch, key):
+    """
+    Zwraca już utworzoną definicję właściwości dla danego klucza lub None.
+
+    Args:
+        batch (dict): Bufor z create_relationship_batch().
+        key: Klucz identyfikujący zawartość definicji (np. nazwa i wartości psetu).
+    """
+    entry = batch["properties"].get(key)
+    return entry[0] if entry else None
+
+
+def assign_property_definition(batch, product, definition, key=None):
+    """
+    Dodaje element do grupy elementów opisanych daną definicją właściwości.
+
+    Args:
+        batch (dict): Bufor z create_relationship_batch().
+        product: Nowy element w pliku docelowym.
+        definition: IfcPropertySetDefinition w pliku docelowym.
+        key (optional): Klucz definicji; domyślnie id encji definicji.
+    """
+    key = definition.id() if key is None else key
+    batch["properties"].setdefault(key, (definition, []))[1].append(product)
+
+
+def flush_relationship_batch(batch, target_file, owner_history):
+    """
+    Zapisuje zebrane relacje do pliku docelowego: jedna relacja na grupę.
+
+    Jeśli kontener ma już relację IfcRelAggregates (IsDecomposedBy), elementy są do niej
+    dopisywane. Po zapisie listy elementów są czyszczone, ale utworzone definicje
+    właściwości pozostają w buforze i mogą być ponownie użyte.
+
+    Args:
+        batch (dict): Bufor z create_relationship_batch().
+        target_file: Otwarty plik IFC (model docelowy).
+        owner_history: Obiekt IfcOwnerHistory przypisywany nowym relacjom.
+
+    Returns:
+        Liczba utworzonych lub zaktualizowanych relacji.
+    """
+    written = 0
+    for container, products in batch["aggregates"].values():
+        if not products:
+            continue
+        if container.IsDecomposedBy:
+            rel = container.IsDecomposedBy[0]
+            rel.RelatedObjects = list(rel.RelatedObjects) + products
+        else:
+            target_file.create_entity(
+                "IfcRelAggregates",
+                GlobalId=ifcopenshell.guid.new(),
+                OwnerHistory=owner_history,
+                RelatingObject=container,
+                RelatedObjects=products
+            )
+        written += 1
+    for definition, products in batch["properties"].values():
+        if not products:
+            continue
+        target_file.create_entity(
+            "IfcRelDefinesByProperties",
+            GlobalId=ifcopenshell.guid.new(),
+            OwnerHistory=owner_history,
+            RelatingPropertyDefinition=definition,
+            RelatedObjects=products
+        )
+        written += 1
+
+    batch["aggregates"] = {key: (container, []) for key, (container, _) in batch["aggregates"].items()}
+    batch["properties"] = {key: (definition, []) for key, (definition, _) in batch["properties"].items()}
+    return written
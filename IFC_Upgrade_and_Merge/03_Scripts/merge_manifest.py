@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import ifcopenshell
+import ifcopenshell.api
+
+from ifc_copy_engine import referenced_entities
+
+# Atrybuty pomijane przy liczeniu skrótu - zmieniają się przy każdym eksporcie, choć treść jest ta sama
+IGNORED_HASH_ATTRIBUTES = ("GlobalId", "OwnerHistory")
+
+
+def get_manifest_path(output_ifc_path):
+    """Zwraca ścieżkę pliku manifestu zapisywanego obok pliku wynikowego."""
+    return output_ifc_path + ".manifest.json"
+
+
+def load_manifest(manifest_path):
+    """
+    Wczytuje manifest poprzedniego scalania.
+
+    Args:
+        manifest_path (str): Ścieżka do pliku manifestu.
+
+    Returns:
+        dict {"source": ścieżka źródła, "products": {GlobalId źródłowy: {"hash", "target"}}}
+        lub pusty manifest, jeśli plik nie istnieje.
+    """
+    if not os.path.exists(manifest_path):
+        return {"source": None, "products": {}}
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        return json.load(manifest_file)
+
+
+def save_manifest(manifest_path, manifest):
+    """Zapisuje manifest scalania (JSON)."""
+    with open(manifest_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, ensure_ascii=False)
+
+
+def _value_token(value, hash_memo):
+    # Zamienia wartość atrybutu na tekst, w którym referencje do encji zastąpiono ich skrótami.
+    if isinstance(value, ifcopenshell.entity_instance):
+        if value.id():
+            return hash_memo[value.id()]
+        return f"{value.is_a()}({_value_token(value.wrappedValue, hash_memo)})"
+    if isinstance(value, (list, tuple)):
+        return "(" + ",".join(_value_token(item, hash_memo) for item in value) + ")"
+    return repr(value)
+
+
+def entity_hash(source_entity, hash_memo):
+    """
+    Liczy skrót treści encji wraz z całym grafem encji, do których się odwołuje.
+
+    Skrót nie zależy od id encji ani od GlobalId/OwnerHistory, więc ten sam obiekt
+    w ponownie wyeksportowanym pliku ma ten sam skrót. Liczone iteracyjnie;
+    wspólne encje (np. style, profile) są liczone tylko raz dzięki hash_memo.
+    W cyklu referencji (jak w copy_entity()) odwołanie zwrotne do encji jeszcze
+    liczonej zastępowane jest nazwą jej klasy.
+
+    Args:
+        source_entity: Encja z pliku źródłowego (lub None).
+        hash_memo (dict): {id encji: skrót}, współdzielony między wywołaniami.
+
+    Returns:
+        Skrót (str, hex).
+    """
+    if source_entity is None:
+        return "$"
+    visiting = set()
+    stack = [(source_entity, False)]
+    while stack:
+        entity, expanded = stack.pop()
+        key = entity.id()
+        if expanded:
+            visiting.discard(key)
+            tokens = [entity.is_a()]
+            for i in range(len(entity)):
+                if entity.attribute_name(i) in IGNORED_HASH_ATTRIBUTES:
+                    continue
+                tokens.append(_value_token(entity[i], hash_memo))
+            # Nadpisuje też skrót zastępczy z cyklu referencji
+            hash_memo[key] = hashlib.sha1("|".join(tokens).encode("utf-8")).hexdigest()
+            continue
+        if key in hash_memo:
+            continue
+        visiting.add(key)
+        stack.append((entity, True))
+        for i in range(len(entity)):
+            for child in referenced_entities(entity[i]):
+                child_key = child.id()
+                if child_key in hash_memo:
+                    continue
+                if child_key in visiting:
+                    # Cykl referencji: skrót zastępczy, zastąpiony właściwym po policzeniu encji
+                    hash_memo[child_key] = child.is_a()
+                    continue
+                stack.append((child, False))
+    return hash_memo[source_entity.id()]
+
+
+def compute_product_hash(product, psets, container_name, hash_memo):
+    """
+    Liczy skrót treści elementu: atrybuty, umiejscowienie, geometria, Psety i kontener docelowy.
+
+    Args:
+        product: Element IfcProduct z pliku źródłowego.
+        psets (dict): Psety elementu (np. z get_indexed_psets()).
+        container_name (str): Nazwa kontenera docelowego - zmiana kontenera to też zmiana elementu.
+        hash_memo (dict): Tablica z entity_hash(), współdzielona dla całego pliku.
+
+    Returns:
+        Skrót (str, hex).
+    """
+    pset_tokens = sorted(
+        (pset_name, sorted((name, repr(value)) for name, value in props.items() if name != "id"))
+        for pset_name, props in psets.items()
+    )
+    tokens = [
+        product.is_a(),
+        repr(product.Name),
+        repr(product.Description),
+        repr(getattr(product, "ObjectType", None)),
+        entity_hash(product.ObjectPlacement, hash_memo),
+        entity_hash(product.Representation, hash_memo),
+        repr(pset_tokens),
+        repr(container_name),
+    ]
+    return hashlib.sha1("|".join(tokens).encode("utf-8")).hexdigest()
+
+
+def remove_target_product(target_file, target_guid):
+    """
+    Usuwa z pliku docelowego element sklonowany w poprzednim przebiegu.
+
+    Args:
+        target_file: Otwarty plik IFC (model docelowy).
+        target_guid (str): GlobalId elementu w pliku docelowym.
+
+    Returns:
+        True, jeśli element został usunięty; False, jeśli go nie znaleziono.
+    """
+    try:
+        product = target_file.by_guid(target_guid)
+    except RuntimeError:
+        return False
+    ifcopenshell.api.run("root.remove_product", target_file, product=product)
+    return True
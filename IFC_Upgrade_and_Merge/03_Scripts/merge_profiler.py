@@ -0,0 +1,168 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import time
+
+
+def create_profiler(use_cprofile=False):
+    """
+    Tworzy pusty profil przebiegu scalania.
+
+    Profil zbiera czasy etapów (profile_stage()), czasy klonowania według typu geometrii
+    (record_clone()) i liczby encji według klas (record_entity_counts()). Funkcje
+    przyjmujące profil akceptują też None - wtedy nic nie mierzą, więc wyłączone
+    profilowanie nie zmienia kodu wywołującego.
+
+    Args:
+        use_cprofile (bool): Dodatkowo uruchamia cProfile dla całego przebiegu
+                             (statystyki zapisuje finish_profiler()).
+
+    Returns:
+        dict z kluczami "started" (czas początku, time.time()), "stages" (lista etapów),
+        "clone_times" ({typ geometrii: [liczba elementów, łączny czas]}),
+        "entity_counts" ({nazwa: {klasa: liczba}}) i "cprofile" (cProfile.Profile lub None).
+    """
+    profiler = {
+        "started": time.time(),
+        "stages": [],
+        "clone_times": {},
+        "entity_counts": {},
+        "cprofile": cProfile.Profile() if use_cprofile else None,
+    }
+    if profiler["cprofile"] is not None:
+        profiler["cprofile"].enable()
+    return profiler
+
+
+def add_stage(profiler, name, started):
+    """Zapisuje etap trwający od started (time.time()) do teraz - dla kodu, którego nie obejmuje profile_stage()."""
+    if profiler is None:
+        return
+    profiler["stages"].append({"name": name, "start": started - profiler["started"], "duration": time.time() - started})
+
+
+@contextlib.contextmanager
+def profile_stage(profiler, name):
+    """Mierzy czas bloku kodu jako etap o podanej nazwie (etapy mogą być zagnieżdżone)."""
+    started = time.time()
+    try:
+        yield
+    finally:
+        add_stage(profiler, name, started)
+
+
+def get_geometry_type(product):
+    """
+    Zwraca typ geometrii elementu do grupowania czasów klonowania.
+
+    Typ to posortowane, połączone znakiem '+' wartości RepresentationType reprezentacji
+    elementu (np. "Axis+SweptSolid"), "none" dla elementu bez reprezentacji.
+    """
+    if not product.Representation:
+        return "none"
+    return "+".join(sorted({representation.RepresentationType or "unknown" for representation in product.Representation.Representations}))
+
+
+def record_clone(profiler, product, duration):
+    """Dodaje czas klonowania elementu do sumy dla jego typu geometrii."""
+    if profiler is None:
+        return
+    totals = profiler["clone_times"].setdefault(get_geometry_type(product), [0, 0.0])
+    totals[0] += 1
+    totals[1] += duration
+
+
+def record_entity_counts(profiler, name, ifc_file):
+    """Zapisuje liczby encji pliku według klas IFC pod podaną nazwą (np. "skeleton", "output")."""
+    if profiler is None:
+        return
+    counts = {}
+    for entity in ifc_file:
+        ifc_class = entity.is_a()
+        counts[ifc_class] = counts.get(ifc_class, 0) + 1
+    profiler["entity_counts"][name] = counts
+
+
+def get_profile_summary(profiler):
+    """
+    Zwraca wyniki profilu jako słownik gotowy do zapisu w JSON.
+
+    Liczby utworzonych encji to różnica między zapisami "output" i "skeleton"
+    z record_entity_counts() (w trybie przyrostowym mogą być ujemne - encje usunięte).
+    """
+    created = {}
+    counts = profiler["entity_counts"]
+    if "skeleton" in counts and "output" in counts:
+        for ifc_class in set(counts["skeleton"]) | set(counts["output"]):
+            difference = counts["output"].get(ifc_class, 0) - counts["skeleton"].get(ifc_class, 0)
+            if difference:
+                created[ifc_class] = difference
+    return {
+        "total_time": time.time() - profiler["started"],
+        "stages": profiler["stages"],
+        "clone_times": {
+            geometry_type: {"count": count, "time": total, "mean_time": total / count}
+            for geometry_type, (count, total) in sorted(profiler["clone_times"].items(), key=lambda item: -item[1][1])
+        },
+        "created_entities": dict(sorted(created.items(), key=lambda item: -item[1])),
+        "entity_counts": counts,
+    }
+
+
+def write_chrome_trace(profiler, trace_path):
+    """
+    Zapisuje etapy w formacie Chrome Trace Event (chrome://tracing, Perfetto).
+
+    Każdy etap to zdarzenie "X" (czas trwania); zagnieżdżone etapy wyświetlane są jeden pod drugim.
+    Czasy klonowania według typu geometrii dołączane są jako argumenty etapu "clone".
+    """
+    summary = get_profile_summary(profiler)
+    events = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "ifc_merger"}}]
+    for stage in profiler["stages"]:
+        event = {
+            "name": stage["name"], "ph": "X", "pid": os.getpid(), "tid": 0,
+            "ts": stage["start"] * 1e6, "dur": stage["duration"] * 1e6,
+        }
+        if stage["name"] == "clone":
+            event["args"] = summary["clone_times"]
+        events.append(event)
+    with open(trace_path, "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"created_entities": summary["created_entities"]}}, trace_file)
+
+
+def finish_profiler(profiler, output_path, output_format="json"):
+    """
+    Kończy profilowanie, zapisuje wyniki i wypisuje krótkie podsumowanie.
+
+    Args:
+        profiler (dict): Profil z create_profiler() (None - nic nie robi).
+        output_path (str): Plik wynikowy profilu. Statystyki cProfile (jeśli włączone) zapisywane
+                           są obok, z rozszerzeniem .prof (do odczytu przez pstats lub snakeviz).
+        output_format (str): "json" (pełne wyniki) lub "chrome" (Chrome Trace Event).
+    """
+    if profiler is None:
+        return
+    if profiler["cprofile"] is not None:
+        profiler["cprofile"].disable()
+        cprofile_path = os.path.splitext(output_path)[0] + ".prof"
+        profiler["cprofile"].dump_stats(cprofile_path)
+        print(f"Zapisano statystyki cProfile: {cprofile_path}")
+        pstats.Stats(cprofile_path).sort_stats("cumulative").print_stats(15)
+
+    if output_format == "chrome":
+        write_chrome_trace(profiler, output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8") as profile_file:
+            json.dump(get_profile_summary(profiler), profile_file, indent=2, ensure_ascii=False)
+    print(f"Zapisano profil scalania: {output_path}")
+
+    summary = get_profile_summary(profiler)
+    print(f"\nCzasy etapów (łącznie {summary['total_time']:.2f} s):")
+    for stage in sorted(profiler["stages"], key=lambda stage: stage["start"]):
+        print(f"  {stage['duration']:8.2f} s  {stage['name']}")
+    if summary["clone_times"]:
+        print("Klonowanie według typu geometrii:")
+        for geometry_type, times in summary["clone_times"].items():
+            print(f"  {times['time']:8.2f} s  {geometry_type} ({times['count']} elementów, {times['mean_time'] * 1000:.1f} ms/element)")
@@ -0,0 +1,200 @@
+import hashlib
+import ifcopenshell
+
+from ifc_copy_engine import copy_entity
+
+# Liczba miejsc po przecinku przy porównywaniu współrzędnych (0.1 mm przy metrach)
+GEOMETRY_DECIMALS = 4
+
+
+def _normalized_value(value, state):
+    # Zamienia wartość atrybutu na krotkę niezależną od id encji i od położenia kształtu:
+    # punkty zapisywane są względem pierwszego napotkanego punktu tego samego wymiaru (punktu odniesienia).
+    if isinstance(value, ifcopenshell.entity_instance):
+        if not value.id():
+            # Wartość typu prostego opakowana w encję, np. IfcLengthMeasure
+            return (value.is_a(), _normalized_value(value.wrappedValue, state))
+        return _normalized_entity(value, state)
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalized_value(item, state) for item in value)
+    if isinstance(value, float):
+        return round(value, GEOMETRY_DECIMALS)
+    return value
+
+
+def _relative_point(coordinates, state):
+    dimension = len(coordinates)
+    if dimension == 2 and not state["relative_2d"]:
+        return tuple(round(c, GEOMETRY_DECIMALS) for c in coordinates)
+    if state["references"][dimension] is None:
+        state["references"][dimension] = tuple(float(c) for c in coordinates)
+    return tuple(round(c - r, GEOMETRY_DECIMALS) for c, r in zip(coordinates, state["references"][dimension]))
+
+
+def _is_rotated(entity):
+    # Układ lokalny obrócony lub skalowany względem nadrzędnego - przesunięcie punktów 2D
+    # w takim układzie nie jest tym samym przesunięciem w układzie reprezentacji
+    if entity.is_a("IfcCartesianTransformationOperator"):
+        return any(entity[i] is not None for i in range(len(entity)) if entity.attribute_name(i) in ("Axis1", "Axis2", "Axis3")) or entity.Scale not in (None, 1.0)
+    if entity.is_a("IfcPlacement"):
+        identity = {"Axis": (0.0, 0.0, 1.0), "RefDirection": (1.0, 0.0, 0.0)[:entity.Location.Dim]}
+        return any(
+            entity[i] is not None and tuple(entity[i].DirectionRatios) != identity[entity.attribute_name(i)]
+            for i in range(len(entity)) if entity.attribute_name(i) in identity
+        )
+    return False
+
+
+def _normalized_entity(entity, state):
+    key = entity.id()
+    if key in state["cache"]:
+        return state["cache"][key]
+    state["rotated"] = state["rotated"] or _is_rotated(entity)
+    if entity.is_a("IfcRepresentationContext"):
+        # Kontekst i tak jest podmieniany na kontekst pliku docelowego
+        normalized = ("context",)
+    elif entity.is_a("IfcCartesianPoint"):
+        normalized = ("point", _relative_point(entity.Coordinates, state))
+    elif entity.is_a("IfcCartesianPointList"):
+        normalized = ("points", tuple(_relative_point(row, state) for row in entity.CoordList))
+    else:
+        normalized = (entity.is_a(), tuple(_normalized_value(entity[i], state) for i in range(len(entity))))
+        if entity.is_a("IfcRepresentationItem") and entity.StyledByItem:
+            # Style wskazują na element geometrii - ta sama geometria w innym kolorze to inna mapa
+            normalized += (("styles", tuple(_normalized_value(styled_item.Styles, state) for styled_item in entity.StyledByItem)),)
+    state["cache"][key] = normalized
+    return normalized
+
+
+def _normalize_representation(representation, relative_2d):
+    state = {"references": {2: None, 3: None}, "relative_2d": relative_2d, "rotated": False, "cache": {}}
+    return _normalized_entity(representation, state), state
+
+
+def compute_representation_key(representation):
+    """
+    Liczy skrót znormalizowanej geometrii reprezentacji.
+
+    Dwie reprezentacje mają ten sam skrót, jeśli ich grafy encji (łącznie ze stylami
+    elementów geometrii) mają tę samą strukturę i wartości, a różnią się co najwyżej przesunięciem: współrzędne
+    punktów 3D porównywane są względem pierwszego punktu 3D reprezentacji, a punktów 2D (np. profili
+    brył wyciąganych) względem pierwszego punktu 2D (z dokładnością do GEOMETRY_DECIMALS miejsc).
+    Modele źródłowe zapisują geometrię we współrzędnych globalnych - studzienka ma profil
+    w globalnych X, Y, a rzędną w położeniu bryły - więc takie same studzienki czy kształtki
+    różnią się właśnie tylko przesunięciem. Punkty 2D porównywane są bezwzględnie, jeśli reprezentacja
+    ma obrócony lub skalowany układ lokalny (przesunięcie profilu nie jest wtedy przesunięciem w X, Y).
+
+    Args:
+        representation: IfcShapeRepresentation z pliku źródłowego.
+
+    Returns:
+        Krotka (skrót, punkt odniesienia (x, y, z) lub None, jeśli reprezentacja nie ma punktów).
+        Punkt odniesienia to suma punktów odniesienia 3D i 2D (uzupełnionego z = 0).
+    """
+    normalized, state = _normalize_representation(representation, relative_2d=True)
+    if state["rotated"] and state["references"][2] is not None:
+        normalized, state = _normalize_representation(representation, relative_2d=False)
+    reference_3d, reference_2d = state["references"][3], state["references"][2]
+    reference = None
+    if reference_3d is not None or reference_2d is not None:
+        reference = tuple(a + b for a, b in zip(reference_3d or (0.0, 0.0, 0.0), (reference_2d or (0.0, 0.0)) + (0.0,)))
+    return hashlib.sha1(repr(normalized).encode("utf-8")).hexdigest(), reference
+
+
+def create_instancing_table(products):
+    """
+    Przygotowuje tablicę współdzielenia geometrii dla elementów, które będą klonowane.
+
+    Liczy skróty wszystkich reprezentacji kształtu elementów i zapamiętuje te,
+    które powtarzają się co najmniej dwa razy - tylko one zapisywane są jako
+    IfcRepresentationMap. Reprezentacje już mapowane (MappedRepresentation) są pomijane.
+
+    Args:
+        products (list): Elementy z pliku źródłowego.
+
+    Returns:
+        dict z kluczami "keys" ({id reprezentacji: (skrót, punkt odniesienia)}),
+        "repeated" (zbiór powtarzających się skrótów) i "maps" ({skrót: (IfcRepresentationMap,
+        punkt odniesienia mapy)}), uzupełnianym przez copy_product_shape().
+    """
+    keys = {}
+    counts = {}
+    for product in products:
+        if not product.Representation:
+            continue
+        for representation in product.Representation.Representations:
+            if not representation.is_a("IfcShapeRepresentation") or representation.RepresentationType == "MappedRepresentation":
+                continue
+            if representation.id() not in keys:
+                keys[representation.id()] = compute_representation_key(representation)
+            key, reference = keys[representation.id()]
+            if reference is not None:
+                counts[key] = counts.get(key, 0) + 1
+    return {
+        "keys": keys,
+        "repeated": {key for key, count in counts.items() if count > 1},
+        "maps": {},
+    }
+
+
+def _create_point(target_file, coordinates):
+    return target_file.create_entity("IfcCartesianPoint", tuple(float(c) for c in coordinates))
+
+
+def copy_product_shape(source_shape, target_file, copy_memo, instancing):
+    """
+    Kopiuje IfcProductDefinitionShape, zastępując powtarzające się reprezentacje instancjami.
+
+    Pierwsze wystąpienie danej geometrii kopiowane jest raz (bez zmian współrzędnych)
+    jako IfcRepresentationMap z MappingOrigin w początku układu. Każde wystąpienie
+    (także pierwsze) dostaje reprezentację typu MappedRepresentation z IfcMappedItem,
+    którego IfcCartesianTransformationOperator3D przesuwa mapę o różnicę punktów
+    odniesienia wystąpienia i mapy. Pozostałe reprezentacje kopiowane są bez zmian przez copy_entity().
+
+    Args:
+        source_shape: IfcProductDefinitionShape z pliku źródłowego.
+        target_file: Otwarty plik IFC (model docelowy).
+        copy_memo (dict): Tablica memo z create_copy_memo().
+        instancing (dict): Tablica z create_instancing_table().
+
+    Returns:
+        Nowy IfcProductDefinitionShape w pliku docelowym.
+    """
+    representations = []
+    for representation in source_shape.Representations:
+        key, reference = instancing["keys"].get(representation.id(), (None, None))
+        if key not in instancing["repeated"]:
+            representations.append(copy_entity(representation, target_file, copy_memo))
+            continue
+
+        if key not in instancing["maps"]:
+            representation_map = target_file.create_entity(
+                "IfcRepresentationMap",
+                MappingOrigin=target_file.create_entity("IfcAxis2Placement3D", Location=_create_point(target_file, (0.0, 0.0, 0.0))),
+                MappedRepresentation=copy_entity(representation, target_file, copy_memo),
+            )
+            instancing["maps"][key] = (representation_map, reference)
+        representation_map, map_reference = instancing["maps"][key]
+
+        mapped_item = target_file.create_entity(
+            "IfcMappedItem",
+            MappingSource=representation_map,
+            MappingTarget=target_file.create_entity(
+                "IfcCartesianTransformationOperator3D",
+                LocalOrigin=_create_point(target_file, [c - m for c, m in zip(reference, map_reference)]),
+            ),
+        )
+        representations.append(target_file.create_entity(
+            "IfcShapeRepresentation",
+            ContextOfItems=copy_entity(representation.ContextOfItems, target_file, copy_memo),
+            RepresentationIdentifier=representation.RepresentationIdentifier,
+            RepresentationType="MappedRepresentation",
+            Items=[mapped_item],
+        ))
+
+    return target_file.create_entity(
+        "IfcProductDefinitionShape",
+        Name=source_shape.Name,
+        Description=source_shape.Description,
+        Representations=representations,
+    )
@@ -0,0 +1,80 @@
+import multiprocessing
+import numpy as np
+import ifcopenshell
+import ifcopenshell.geom
+
+from bbox_tree import build_bbox_tree, find_nearest_boxes
+
+
+def compute_bounding_boxes(ifc_file, products, thread_count=None):
+    """
+    Liczy prostokąty otaczające elementów (w układzie globalnym) z ich triangulacji.
+
+    Geometria liczona jest przez ifcopenshell.geom.iterator w thread_count wątkach,
+    w jednym przebiegu dla wszystkich elementów.
+
+    Args:
+        ifc_file: Otwarty plik IFC.
+        products (list): Elementy, dla których liczymy prostokąty.
+        thread_count (int, optional): Liczba wątków; domyślnie liczba rdzeni.
+
+    Returns:
+        dict {id elementu: (min xyz, max xyz)}; elementy bez geometrii lub z błędem
+        triangulacji są pomijane.
+    """
+    boxes = {}
+    if not products:
+        return boxes
+    settings = ifcopenshell.geom.settings()
+    settings.set("use-world-coords", True)
+    iterator = ifcopenshell.geom.iterator(settings, ifc_file, thread_count or multiprocessing.cpu_count(), include=list(products))
+    if iterator.initialize():
+        while True:
+            shape = iterator.get()
+            vertices = np.asarray(shape.geometry.verts).reshape(-1, 3)
+            if len(vertices):
+                boxes[shape.id] = (vertices.min(axis=0), vertices.max(axis=0))
+            if not iterator.next():
+                break
+    return boxes
+
+
+def assign_by_proximity(ifc_file, assigned_products, unassigned_products, max_distance, thread_count=None):
+    """
+    Przypisuje elementy bez pasującej reguły do kontenera najbliższego elementu przypisanego regułami.
+
+    Elementy przypisane regułami (np. po PVI_STATIONSBEZUG) wyznaczają korytarz każdego
+    kontenera (IfcRoadPart). Prostokąty otaczające tych elementów indeksowane są w drzewie
+    (bbox_tree), a każdy element bez reguły trafia do kontenera elementu najbliższego
+    w rzucie - jeśli leży nie dalej niż max_distance.
+
+    Args:
+        ifc_file: Otwarty plik źródłowy.
+        assigned_products (list): Pary (element, nazwa kontenera) przypisane regułami.
+        unassigned_products (list): Elementy bez pasującej reguły.
+        max_distance (float): Największa odległość w rzucie [m] od korytarza kontenera.
+        thread_count (int, optional): Liczba wątków dla compute_bounding_boxes().
+
+    Returns:
+        Lista par (element, nazwa kontenera) dla elementów, które udało się przypisać.
+    """
+    boxes = compute_bounding_boxes(ifc_file, [product for product, _ in assigned_products] + list(unassigned_products), thread_count)
+    references = [(product, container_name) for product, container_name in assigned_products if product.id() in boxes]
+    queries = [product for product in unassigned_products if product.id() in boxes]
+    if not references or not queries:
+        return []
+
+    tree = build_bbox_tree(
+        np.array([boxes[product.id()][0][:2] for product, _ in references]),
+        np.array([boxes[product.id()][1][:2] for product, _ in references]),
+    )
+    nearest, distances = find_nearest_boxes(
+        tree,
+        np.array([boxes[product.id()][0][:2] for product in queries]),
+        np.array([boxes[product.id()][1][:2] for product in queries]),
+    )
+    return [
+        (product, references[reference][1])
+        for product, reference, distance in zip(queries, nearest, distances)
+        if distance <= max_distance
+    ]
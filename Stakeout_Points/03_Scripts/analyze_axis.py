@@ -2,6 +2,47 @@ import ifcopenshell
 import numpy as np
 import os
 
+from axis_lookup import build_axis_index, iter_axis_polylines
+
+def get_axis_analysis(ifc_file):
+    """
+    Extracts the geometry and ProVI properties of every road axis represented as IfcPolylines.
+
+    :param ifc_file: An open IFC file.
+    :return: A list with one dictionary per axis polyline, with the keys "structure" (name of the
+             containing structure), "is_3d", "start", "end", "length", "vertex_count" and "properties"
+             ({name: {"value", "unit"}} of the ProVI property sets, or None if the axis has none).
+    """
+    analysis = []
+    for parent_name, proxy, polyline in iter_axis_polylines(build_axis_index(ifc_file)):
+        points = np.array([p.Coordinates for p in polyline.Points])
+        segment_lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+
+        properties = None
+        if hasattr(proxy, 'IsDefinedBy') and proxy.IsDefinedBy:
+            for rel in proxy.IsDefinedBy:
+                if rel.is_a("IfcRelDefinesByProperties"):
+                    prop_set = rel.RelatingPropertyDefinition
+                    if prop_set.is_a("IfcPropertySet") and 'ProVI' in prop_set.Name:
+                        properties = properties or {}
+                        for prop in prop_set.HasProperties:
+                            if prop.is_a("IfcPropertySingleValue"):
+                                properties[prop.Name] = {
+                                    "value": prop.NominalValue.wrappedValue if prop.NominalValue else None,
+                                    "unit": prop.Unit.Name if hasattr(prop, 'Unit') and prop.Unit and hasattr(prop.Unit, 'Name') else None,
+                                }
+
+        analysis.append({
+            "structure": parent_name,
+            "is_3d": "Raumkurve" in parent_name,
+            "start": points[0].tolist(),
+            "end": points[-1].tolist(),
+            "length": float(np.sum(segment_lengths)),
+            "vertex_count": len(points),
+            "properties": properties,
+        })
+    return analysis
+
 def analyze_ifc_axis(ifc_path):
     """
     Analyzes an IFC file to extract information about a road axis
@@ -17,71 +58,32 @@ def analyze_ifc_axis(ifc_path):
 
     print(f"Analyzing axis from: {os.path.basename(ifc_path)}\n")
 
-    polylines = ifc_file.by_type("IfcPolyline")
-    if not polylines:
+    analysis = get_axis_analysis(ifc_file)
+    if not analysis:
         print("No IfcPolyline entities found in the file.")
         return
 
-    for polyline in polylines:
-        # Find the proxy this polyline belongs to
-        refs = ifc_file.get_inverse(polyline)
-        proxy = None
-        parent_name = "Unknown"
-
-        # A bit of a complex inverse search to find the parent proxy and its context
-        for ref in refs:
-            if ref.is_a("IfcShapeRepresentation"):
-                if hasattr(ref, 'OfProductRepresentation') and ref.OfProductRepresentation:
-                    prod_def_shape = ref.OfProductRepresentation[0]
-                    if hasattr(prod_def_shape, 'ShapeOfProduct') and prod_def_shape.ShapeOfProduct:
-                        product = prod_def_shape.ShapeOfProduct[0]
-                        if product.is_a("IfcBuildingElementProxy"):
-                            proxy = product
-                            if hasattr(proxy, 'ContainedInStructure') and proxy.ContainedInStructure:
-                                parent_name = proxy.ContainedInStructure[0].RelatingStructure.Name
-                            break
-        
-        if not proxy:
-            continue
-
-        is_3d = "Raumkurve" in parent_name
-        header = f"--- Analysis of {'3D Axis (Raumkurve)' if is_3d else '2D Axis (2D-Linie)'} ---"
+    for axis in analysis:
+        header = f"--- Analysis of {'3D Axis (Raumkurve)' if axis['is_3d'] else '2D Axis (2D-Linie)'} ---"
         print(header)
 
         # --- 1. Geometric Analysis ---
-        points = np.array([p.Coordinates for p in polyline.Points])
-        start_coord = points[0]
-        end_coord = points[-1]
-
         print("  Geometric Data:")
-        print(f"    Start Coords: ({', '.join(f'{c:.3f}' for c in start_coord)})")
-        print(f"    End Coords:   ({', '.join(f'{c:.3f}' for c in end_coord)})")
-
-        segment_vectors = np.diff(points, axis=0)
-        segment_lengths = np.linalg.norm(segment_vectors, axis=1)
-        total_length = np.sum(segment_lengths)
-        print(f"    Calculated Length: {total_length:.3f} m")
-        print(f"    Number of Vertices: {len(points)}")
+        print(f"    Start Coords: ({', '.join(f'{c:.3f}' for c in axis['start'])})")
+        print(f"    End Coords:   ({', '.join(f'{c:.3f}' for c in axis['end'])})")
+        print(f"    Calculated Length: {axis['length']:.3f} m")
+        print(f"    Number of Vertices: {axis['vertex_count']}")
 
         # --- 2. Properties Analysis ---
         print("\n  Properties (from Pset):")
-        properties_found = False
-        if hasattr(proxy, 'IsDefinedBy') and proxy.IsDefinedBy:
-            for rel in proxy.IsDefinedBy:
-                if rel.is_a("IfcRelDefinesByProperties"):
-                    prop_set = rel.RelatingPropertyDefinition
-                    if prop_set.is_a("IfcPropertySet") and 'ProVI' in prop_set.Name:
-                        properties_found = True
-                        for prop in prop_set.HasProperties:
-                            if prop.is_a("IfcPropertySingleValue"):
-                                prop_name = prop.Name
-                                prop_value = prop.NominalValue.wrappedValue if prop.NominalValue else 'N/A'
-                                unit = f" {prop.Unit.Name}" if hasattr(prop, 'Unit') and prop.Unit and hasattr(prop.Unit, 'Name') else ""
-                                print(f"    - {prop_name}: {prop_value}{unit}")
-        
-        if not properties_found:
+        if axis["properties"] is None:
             print("    No 'ProVI' property sets found for this axis.")
-        
+        else:
+            for prop_name, prop in axis["properties"].items():
+                prop_value = prop["value"] if prop["value"] is not None else 'N/A'
+                unit = f" {prop['unit']}" if prop["unit"] else ""
+                print(f"    - {prop_name}: {prop_value}{unit}")
+
         print("-" * len(header) + "\n")
 
 if __name__ == "__main__":
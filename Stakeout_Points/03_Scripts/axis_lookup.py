@@ -0,0 +1,36 @@
+def get_product_polylines(product):
+    """Returns all IfcPolyline items of the shape representations of a product."""
+    polylines = []
+    if product.Representation:
+        for rep in product.Representation.Representations:
+            if rep.is_a("IfcShapeRepresentation"):
+                polylines.extend(item for item in rep.Items if item.is_a("IfcPolyline"))
+    return polylines
+
+def build_axis_index(ifc_file, product_type="IfcBuildingElementProxy"):
+    """
+    Builds a structure name -> product -> polyline index in one pass over IfcRelContainedInSpatialStructure.
+    Returns a dictionary {structure name: [(product, polyline), ...]} in file order.
+    """
+    axis_index = {}
+    for rel in ifc_file.by_type("IfcRelContainedInSpatialStructure"):
+        structure_name = rel.RelatingStructure.Name or ""
+        for product in rel.RelatedElements:
+            if not product.is_a(product_type):
+                continue
+            for polyline in get_product_polylines(product):
+                axis_index.setdefault(structure_name, []).append((product, polyline))
+    return axis_index
+
+def find_axis_polyline(axis_index, name_fragment):
+    """Returns the first polyline of a product contained in a structure whose name contains name_fragment, or None."""
+    for structure_name, entries in axis_index.items():
+        if name_fragment in structure_name:
+            return entries[0][1]
+    return None
+
+def iter_axis_polylines(axis_index):
+    """Yields (structure name, product, polyline) for every entry of the index."""
+    for structure_name, entries in axis_index.items():
+        for product, polyline in entries:
+            yield structure_name, product, polyline
@@ -3,100 +3,20 @@ import ifcopenshell.api
 import ifcopenshell.guid
 import numpy as np
 import os
+import sys
+
+from axis_lookup import build_axis_index, find_axis_polyline
+from horizontal_geometry import analyze_horizontal_geometry, get_segment_table, get_stakeout_stations
+from height_index import build_height_index, get_heights
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from alignment_evaluator import evaluate_horizontal
+from annotation_factory import create_annotation_factory, create_text_annotation, get_planar_extent, get_text_style
 
 # --- Configuration ---
-ANGLE_TOLERANCE = 0.005
-MIN_POINTS_FOR_SEGMENT = 3
-
-def get_polyline_from_proxy(proxy):
-    if proxy.Representation:
-        for rep in proxy.Representation.Representations:
-            if rep.RepresentationIdentifier == 'GeometricCurveSet':
-                for item in rep.Items:
-                    if item.is_a("IfcPolyline"):
-                        return item
-    return None
-
-def calculate_bearing(p1, p2):
-    return np.arctan2(p2[0] - p1[0], p2[1] - p1[1])
-
-def get_circle_from_three_points(p1, p2, p3):
-    p1, p2, p3 = np.array(p1), np.array(p2), np.array(p3)
-    v1 = p2 - p1
-    v2 = p3 - p1
-    if np.linalg.norm(np.cross(v1, v2)) < 1e-9:
-        return float('inf'), None
-    p1_sq = np.dot(p1, p1)
-    p2_sq = np.dot(p2, p2)
-    p3_sq = np.dot(p3, p3)
-    A = np.array([[p1[0], p1[1], 1], [p2[0], p2[1], 1], [p3[0], p3[1], 1]])
-    Bx = -np.array([p1_sq, p2_sq, p3_sq])
-    a = np.linalg.det(A)
-    if abs(a) < 1e-9: return float('inf'), None
-    Dx = np.linalg.det(np.column_stack((Bx, A[:,1], A[:,2])))
-    Dy = np.linalg.det(np.column_stack((A[:,0], Bx, A[:,2])))
-    c = -np.linalg.det(np.column_stack((A[:,0], A[:,1], Bx)))
-    center_x, center_y = -Dx / (2 * a), -Dy / (2 * a)
-    radius = np.sqrt(center_x**2 + center_y**2 - c/a)
-    return radius, np.array([center_x, center_y])
-
-def analyze_horizontal_geometry(points):
-    if len(points) < MIN_POINTS_FOR_SEGMENT: return []
-    segments = []
-    current_segment_points = [points[0]]
-    is_line = True
-    for i in range(1, len(points) - 1):
-        p_prev, p_curr, p_next = points[i-1], points[i], points[i+1]
-        angle_diff = abs(calculate_bearing(p_prev, p_curr) - calculate_bearing(p_curr, p_next))
-        if is_line:
-            if angle_diff < ANGLE_TOLERANCE:
-                current_segment_points.append(p_curr)
-            else:
-                if len(current_segment_points) >= 2: segments.append({'type': 'line', 'points': current_segment_points})
-                current_segment_points = [p_curr]
-                is_line = False
-        else:
-            if angle_diff >= ANGLE_TOLERANCE:
-                current_segment_points.append(p_curr)
-            else:
-                if len(current_segment_points) >= 3: segments.append({'type': 'arc', 'points': current_segment_points})
-                current_segment_points = [p_curr]
-                is_line = True
-    current_segment_points.append(points[-1])
-    if len(current_segment_points) >= 2:
-        segment_type = 'line' if is_line else 'arc'
-        if segment_type == 'arc' and len(current_segment_points) < 3: segment_type = 'line'
-        segments.append({'type': segment_type, 'points': current_segment_points})
-    
-    processed_segments = []
-    for seg in segments:
-        start_point, end_point = seg['points'][0], seg['points'][-1]
-        if seg['type'] == 'line':
-            length = np.linalg.norm(end_point - start_point)
-            processed_segments.append({'type': 'line', 'start': start_point, 'end': end_point, 'length': length})
-        elif seg['type'] == 'arc':
-            mid_point = seg['points'][len(seg['points']) // 2]
-            radius, _ = get_circle_from_three_points(start_point, mid_point, end_point)
-            if radius == float('inf'):
-                length = np.linalg.norm(end_point - start_point)
-                processed_segments.append({'type': 'line', 'start': start_point, 'end': end_point, 'length': length})
-                continue
-            v1, v2 = end_point - start_point, mid_point - start_point
-            is_left = (v1[0] * v2[1] - v1[1] * v2[0]) > 0
-            chord_length = np.linalg.norm(end_point - start_point)
-            arc_length = 2 * radius * np.arcsin(chord_length / (2 * radius)) if (2*radius) > chord_length else chord_length
-            processed_segments.append({
-                'type': 'arc', 'points': seg['points'], 'start': start_point, 'end': end_point, 
-                'mid': mid_point, 'radius': radius, 'is_left': is_left, 'length': arc_length
-            })
-    return processed_segments
-
-def get_z_from_3d_polyline(xy_point, polyline_3d_points):
-    point_2d = np.array([xy_point[0], xy_point[1]])
-    points_3d_2d = polyline_3d_points[:, :2]
-    distances = np.linalg.norm(points_3d_2d - point_2d, axis=1)
-    closest_idx = np.argmin(distances)
-    return polyline_3d_points[closest_idx][2]
+# Distance between stakeout points along the whole alignment, in metres (tangent points are always added).
+# None keeps the original mode: start, mid and end point of every arc.
+STAKEOUT_INTERVAL = None
 
 def create_stakeout_point(ifc_file, site, owner_history, name, coords, properties):
     point_geom = ifc_file.create_entity("IfcCartesianPoint", Coordinates=coords)
@@ -107,93 +27,41 @@ def create_stakeout_point(ifc_file, site, owner_history, name, coords, propertie
     ifc_file.create_entity("IfcRelDefinesByProperties", ifcopenshell.guid.new(), owner_history, Name=None, Description=None, RelatingPropertyDefinition=prop_set, RelatedObjects=[stakeout_point])
     return stakeout_point
 
-def create_coordinate_annotation(ifc_file, owner_history, context, name, coords, text_height=150.0):
-    """Creates a visible text annotation in the IFC file."""
-    
+def create_stakeout_points(ifc_file, owner_history, names, coords, properties):
+    """Creates many stakeout points at once; property values shared by several points are created only once."""
+    property_values = {}
+    stakeout_points = []
+    for name, point_coords, point_properties in zip(names, coords, properties):
+        placement = ifc_file.createIfcLocalPlacement(None, ifc_file.createIfcAxis2Placement3D(ifc_file.createIfcCartesianPoint(point_coords), None, None))
+        stakeout_point = ifc_file.create_entity("IfcReferent", ifcopenshell.guid.new(), owner_history, Name=name, ObjectPlacement=placement, PredefinedType='POSITION')
+        prop_values = []
+        for k, v in point_properties.items():
+            key = (k, str(v))
+            if key not in property_values:
+                property_values[key] = ifc_file.createIfcPropertySingleValue(k, None, ifc_file.createIfcLabel(str(v)), None)
+            prop_values.append(property_values[key])
+        prop_set = ifc_file.createIfcPropertySet(ifcopenshell.guid.new(), owner_history, "Pset_StakeoutPoint", None, prop_values)
+        ifc_file.createIfcRelDefinesByProperties(ifcopenshell.guid.new(), owner_history, None, None, [stakeout_point], prop_set)
+        stakeout_points.append(stakeout_point)
+    return stakeout_points
+
+def create_coordinate_annotation(annotation_factory, name, coords, text_height=150.0):
+    """Creates a visible text annotation in the IFC file; style and text box are shared by all labels."""
     text_to_display = f"X: {coords[0]:.3f}\nY: {coords[1]:.3f}\nZ: {coords[2]:.3f}"
+    style = get_text_style(annotation_factory, text_height)
+    extent = get_planar_extent(annotation_factory, text_height * 12, text_height * 4)
+    return create_text_annotation(annotation_factory, coords, text_to_display, style, extent, name=name, object_type="COORDINATE_LABEL", box_alignment='top-left', path='RIGHT')
 
-    annotation_placement_3d = ifc_file.create_entity(
-        "IfcAxis2Placement3D",
-        Location=ifc_file.create_entity("IfcCartesianPoint", Coordinates=tuple(coords))
-    )
-
-    annotation = ifc_file.create_entity(
-        "IfcAnnotation",
-        ifcopenshell.guid.new(),
-        owner_history,
-        Name=name,
-        ObjectType="COORDINATE_LABEL",
-        ObjectPlacement=ifc_file.create_entity("IfcLocalPlacement", RelativePlacement=annotation_placement_3d)
-    )
-
-    text_literal = ifc_file.create_entity(
-        "IfcTextLiteralWithExtent",
-        Literal=text_to_display,
-        Placement=ifc_file.create_entity(
-            "IfcAxis2Placement2D",
-            Location=ifc_file.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0))
-        ),
-        Path='RIGHT',
-        Extent=ifc_file.create_entity(
-            "IfcPlanarExtent", 
-            SizeInX=text_height * 12,
-            SizeInY=text_height * 4
-        ),
-        BoxAlignment='top-left'
-    )
-
-    text_style_font = ifc_file.create_entity(
-        "IfcTextStyleFontModel",
-        FontSize=ifc_file.create_entity("IfcPositiveLengthMeasure", text_height)
-    )
-    text_style = ifc_file.create_entity(
-        "IfcTextStyle", 
-        TextCharacterAppearance=text_style_font
-    )
-    
-    styled_item = ifc_file.create_entity(
-        "IfcStyledItem", 
-        Item=text_literal, 
-        Styles=[text_style]
-    )
-
-    annotation_representation = ifc_file.create_entity(
-        "IfcShapeRepresentation",
-        ContextOfItems=context,
-        RepresentationIdentifier='Annotation',
-        RepresentationType='Annotation2D',
-        Items=[styled_item]
-    )
-
-    product_shape = ifc_file.create_entity(
-        "IfcProductDefinitionShape",
-        Representations=[annotation_representation]
-    )
-    annotation.Representation = product_shape
-
-    return annotation
-
-def main():
+def main(source_ifc_path=None, output_ifc_path=None):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    source_ifc_path = os.path.join(script_dir, "..", "01_Source_IFCs", "Achse.IFC")
-    output_ifc_path = os.path.join(script_dir, "..", "02_Generated_IFCs", "Achse_with_Stakeout_Points.ifc")
+    source_ifc_path = source_ifc_path or os.path.join(script_dir, "..", "01_Source_IFCs", "Achse.IFC")
+    output_ifc_path = output_ifc_path or os.path.join(script_dir, "..", "02_Generated_IFCs", "Achse_with_Stakeout_Points.ifc")
 
     ifc_file = ifcopenshell.open(source_ifc_path)
     
-    polyline_2d, polyline_3d = None, None
-    for polyline in ifc_file.by_type("IfcPolyline"):
-        refs = ifc_file.get_inverse(polyline)
-        for ref in refs:
-            if ref.is_a("IfcShapeRepresentation"):
-                if hasattr(ref, 'OfProductRepresentation') and ref.OfProductRepresentation:
-                    prod_def_shape = ref.OfProductRepresentation[0]
-                    if hasattr(prod_def_shape, 'ShapeOfProduct') and prod_def_shape.ShapeOfProduct:
-                        product = prod_def_shape.ShapeOfProduct[0]
-                        if product.is_a("IfcBuildingElementProxy"):
-                            if hasattr(product, 'ContainedInStructure') and product.ContainedInStructure:
-                                parent_name = product.ContainedInStructure[0].RelatingStructure.Name
-                                if "2D-Linie" in parent_name: polyline_2d = polyline
-                                elif "Raumkurve" in parent_name: polyline_3d = polyline
+    axis_index = build_axis_index(ifc_file)
+    polyline_2d = find_axis_polyline(axis_index, "2D-Linie")
+    polyline_3d = find_axis_polyline(axis_index, "Raumkurve")
     
     if not polyline_2d or not polyline_3d:
         print("Could not find both 2D and 3D polylines. Aborting.")
@@ -208,37 +76,64 @@ def main():
     site = ifc_file.by_type("IfcSite")[0]
     owner_history = ifc_file.by_type("IfcOwnerHistory")[0]
     context = ifc_file.by_type("IfcGeometricRepresentationContext")[0]
+    annotation_factory = create_annotation_factory(ifc_file, context, owner_history)
     stakeout_points = []
     coordinate_annotations = []
     chainage = 0.0
     
-    print("\n--- Creating Stakeout Points and Annotations for Arcs ---")
-    for i, seg in enumerate(horizontal_segments):
-        if seg['type'] == 'arc':
-            print(f"Processing Arc #{i+1} (Radius: {seg['radius']:.2f}m)")
+    height_index = build_height_index(points_3d)
+
+    if STAKEOUT_INTERVAL:
+        print(f"\n--- Creating Stakeout Points every {STAKEOUT_INTERVAL} m and at Tangent Points ---")
+        segment_table = get_segment_table(horizontal_segments)
+        stations, is_tangent_point = get_stakeout_stations(segment_table, STAKEOUT_INTERVAL)
+        segment_indices, points_xy, directions = evaluate_horizontal(segment_table, stations)
+        coords = np.column_stack((points_xy, get_heights(height_index, points_xy))).tolist()
+        # Azimuth in degrees, clockwise from north
+        azimuths = np.degrees(np.pi / 2 - directions) % 360.0
+
+        names = [f"{'TP' if tangent_point else 'Station'} {station:.3f}" for station, tangent_point in zip(stations, is_tangent_point)]
+        properties = [{
+            'PointType': 'Tangent Point' if tangent_point else 'Station',
+            'Segment': index + 1,
+            'SegmentType': horizontal_segments[index]['type'],
+            'Chainage': f"{station:.3f}",
+            'Azimuth': f"{azimuth:.4f}"
+        } for station, tangent_point, index, azimuth in zip(stations, is_tangent_point, segment_indices, azimuths)]
+        stakeout_points = create_stakeout_points(ifc_file, owner_history, names, coords, properties)
+        coordinate_annotations = [create_coordinate_annotation(annotation_factory, f"Coords {name}", point_coords) for name, point_coords in zip(names, coords)]
+        print(f"Evaluated {len(stations)} stations along {segment_table['stations'][-1]:.3f} m of alignment.")
+    else:
+        # Heights of all arc start, mid and end points in one query against the Raumkurve
+        arcs = [seg for seg in horizontal_segments if seg['type'] == 'arc']
+        arc_heights = get_heights(height_index, [seg[key] for seg in arcs for key in ('start', 'mid', 'end')]).reshape(-1, 3)
+        heights = {id(seg): z for seg, z in zip(arcs, arc_heights)}
+
+        print("\n--- Creating Stakeout Points and Annotations for Arcs ---")
+        for i, seg in enumerate(horizontal_segments):
+            if seg['type'] == 'arc':
+                print(f"Processing Arc #{i+1} (Radius: {seg['radius']:.2f}m)")
+                z_start, z_mid, z_end = heights[id(seg)]
+
+                # Start of Arc
+                coords_start = [float(seg['start'][0]), float(seg['start'][1]), float(z_start)]
+                stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - Start", coords_start, {'PointType': 'Arc Start', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage:.3f}"}))
+                coordinate_annotations.append(create_coordinate_annotation(annotation_factory, f"Coords Arc {i+1} - Start", coords_start))
+
+                # Mid of Arc
+                coords_mid = [float(seg['mid'][0]), float(seg['mid'][1]), float(z_mid)]
+                stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - Mid", coords_mid, {'PointType': 'Arc Mid', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage + seg['length']/2:.3f}"}))
+                coordinate_annotations.append(create_coordinate_annotation(annotation_factory, f"Coords Arc {i+1} - Mid", coords_mid))
+
+                # End of Arc
+                coords_end = [float(seg['end'][0]), float(seg['end'][1]), float(z_end)]
+                stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - End", coords_end, {'PointType': 'Arc End', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage + seg['length']:.3f}"}))
+                coordinate_annotations.append(create_coordinate_annotation(annotation_factory, f"Coords Arc {i+1} - End", coords_end))
             
-            # Start of Arc
-            z_start = get_z_from_3d_polyline(seg['start'], points_3d)
-            coords_start = [float(seg['start'][0]), float(seg['start'][1]), float(z_start)]
-            stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - Start", coords_start, {'PointType': 'Arc Start', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage:.3f}"}))
-            coordinate_annotations.append(create_coordinate_annotation(ifc_file, owner_history, context, f"Coords Arc {i+1} - Start", coords_start))
-
-            # Mid of Arc
-            z_mid = get_z_from_3d_polyline(seg['mid'], points_3d)
-            coords_mid = [float(seg['mid'][0]), float(seg['mid'][1]), float(z_mid)]
-            stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - Mid", coords_mid, {'PointType': 'Arc Mid', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage + seg['length']/2:.3f}"}))
-            coordinate_annotations.append(create_coordinate_annotation(ifc_file, owner_history, context, f"Coords Arc {i+1} - Mid", coords_mid))
-
-            # End of Arc
-            z_end = get_z_from_3d_polyline(seg['end'], points_3d)
-            coords_end = [float(seg['end'][0]), float(seg['end'][1]), float(z_end)]
-            stakeout_points.append(create_stakeout_point(ifc_file, site, owner_history, f"Arc {i+1} - End", coords_end, {'PointType': 'Arc End', 'Segment': i+1, 'Radius': f"{seg['radius']:.2f}", 'Chainage': f"{chainage + seg['length']:.3f}"}))
-            coordinate_annotations.append(create_coordinate_annotation(ifc_file, owner_history, context, f"Coords Arc {i+1} - End", coords_end))
-        
-        chainage += seg['length']
+            chainage += seg['length']
 
     if stakeout_points:
-        stakeout_group = ifc_file.create_entity("IfcGroup", ifcopenshell.guid.new(), owner_history, Name="Stakeout Points (Arcs)", ObjectType="Survey points")
+        stakeout_group = ifc_file.create_entity("IfcGroup", ifcopenshell.guid.new(), owner_history, Name="Stakeout Points" if STAKEOUT_INTERVAL else "Stakeout Points (Arcs)", ObjectType="Survey points")
         ifc_file.create_entity("IfcRelAssignsToGroup", ifcopenshell.guid.new(), owner_history, RelatedObjects=stakeout_points, RelatingGroup=stakeout_group)
         print(f"\nAdded {len(stakeout_points)} stakeout points to a new group.")
 
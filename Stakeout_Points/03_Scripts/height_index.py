@@ -0,0 +1,112 @@
+import numpy as np
+
+# --- Configuration ---
+# Grid cell size of the index, as a multiple of the median segment length of the 3D polyline
+CELL_SIZE_FACTOR = 4.0
+
+# Cell keys combine the column and row of a grid cell into one integer
+CELL_KEY_SHIFT = 2 ** 32
+
+# Offsets of the 3x3 block of grid cells searched around a query point
+NEIGHBOUR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+
+def get_cell_keys(cells):
+    """Combines grid cell columns and rows (array of shape (n, 2)) into integer keys."""
+    cells = cells.astype(np.int64)
+    return cells[:, 0] * CELL_KEY_SHIFT + cells[:, 1]
+
+def build_height_index(polyline_3d_points, cell_size=None):
+    """
+    Builds a grid index over the segments of a 3D polyline (e.g. the Raumkurve) for height queries.
+    Every segment is registered in all grid cells it passes through.
+    Returns a dictionary used by get_heights().
+    """
+    points = np.asarray(polyline_3d_points, dtype=float)
+    starts = points[:-1]
+    vectors = np.diff(points, axis=0)
+    lengths = np.linalg.norm(vectors[:, :2], axis=1)
+    if cell_size is None:
+        cell_size = max(float(np.median(lengths)) * CELL_SIZE_FACTOR, 1e-3)
+    origin = points[:, :2].min(axis=0)
+
+    # Sample every segment at a quarter of the cell size and register it in the cells of its samples
+    counts = np.ceil(lengths / (cell_size / 4)).astype(int) + 1
+    segment_ids = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.cumsum(counts) - counts
+    t = (np.arange(counts.sum()) - offsets[segment_ids]) / (counts[segment_ids] - 1)
+    samples = starts[segment_ids, :2] + t[:, None] * vectors[segment_ids, :2]
+    keys = get_cell_keys(np.floor((samples - origin) / cell_size))
+
+    # Sorted (cell key, segment) pairs without duplicates - a compact cell -> segments table
+    order = np.lexsort((segment_ids, keys))
+    keys, segment_ids = keys[order], segment_ids[order]
+    unique = np.ones(len(keys), dtype=bool)
+    unique[1:] = (keys[1:] != keys[:-1]) | (segment_ids[1:] != segment_ids[:-1])
+    return {
+        'starts': starts,
+        'vectors': vectors,
+        'origin': origin,
+        'cell_size': cell_size,
+        'keys': keys[unique],
+        'segments': segment_ids[unique],
+    }
+
+def project_on_segments(height_index, xy_points, segment_ids):
+    """
+    Projects points onto the given segments (one segment per point).
+    Returns (distances, heights): horizontal distance to the segment and the height interpolated at the projection.
+    """
+    starts = height_index['starts'][segment_ids]
+    vectors = height_index['vectors'][segment_ids]
+    offsets = xy_points - starts[:, :2]
+    squared_lengths = np.einsum('ij,ij->i', vectors[:, :2], vectors[:, :2])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.clip(np.einsum('ij,ij->i', offsets, vectors[:, :2]) / squared_lengths, 0.0, 1.0)
+    t = np.nan_to_num(t)
+    distances = np.linalg.norm(offsets - t[:, None] * vectors[:, :2], axis=1)
+    return distances, starts[:, 2] + t * vectors[:, 2]
+
+def get_heights(height_index, xy_points):
+    """
+    Returns the Z of the 3D polyline at the given XY points (array of shape (n, 2) or (n, 3)).
+    Z is interpolated along the nearest segment. Candidate segments come from the 3x3 grid cells
+    around each point; points further from the polyline than the grid reaches are searched brute force.
+    """
+    if len(xy_points) == 0:
+        return np.zeros(0)
+    xy_points = np.atleast_2d(np.asarray(xy_points, dtype=float))[:, :2]
+    cell_size = height_index['cell_size']
+    cells = np.floor((xy_points - height_index['origin']) / cell_size)
+
+    # Candidate (point, segment) pairs from the neighbouring cells
+    neighbour_keys = get_cell_keys((cells[:, None, :] + NEIGHBOUR_OFFSETS).reshape(-1, 2))
+    first = np.searchsorted(height_index['keys'], neighbour_keys, side='left')
+    counts = np.searchsorted(height_index['keys'], neighbour_keys, side='right') - first
+    pair_ids = np.repeat(np.arange(len(neighbour_keys)), counts)
+    offsets = np.cumsum(counts) - counts
+    candidates = height_index['segments'][first[pair_ids] + np.arange(counts.sum()) - offsets[pair_ids]]
+    point_ids = pair_ids // len(NEIGHBOUR_OFFSETS)
+
+    distances, heights = project_on_segments(height_index, xy_points[point_ids], candidates)
+
+    # Nearest candidate per point - the pairs are already grouped by point
+    point_counts = np.bincount(point_ids, minlength=len(xy_points))
+    found = point_counts > 0
+    group_starts = (np.cumsum(point_counts) - point_counts)[found]
+    result_heights = np.full(len(xy_points), np.nan)
+    result_distances = np.full(len(xy_points), np.inf)
+    if len(distances):
+        nearest_distances = np.repeat(np.minimum.reduceat(distances, group_starts), point_counts[found])
+        is_nearest = np.flatnonzero(distances == nearest_distances)
+        _, first_nearest = np.unique(point_ids[is_nearest], return_index=True)
+        nearest = is_nearest[first_nearest]
+        result_heights[point_ids[nearest]] = heights[nearest]
+        result_distances[point_ids[nearest]] = distances[nearest]
+
+    # The 3x3 block only guarantees the nearest segment within 3/4 of a cell
+    for i in np.flatnonzero(result_distances > 0.75 * cell_size):
+        all_segments = np.arange(len(height_index['starts']))
+        distances, heights = project_on_segments(height_index, np.repeat(xy_points[i:i + 1], len(all_segments), axis=0), all_segments)
+        result_heights[i] = heights[np.argmin(distances)]
+
+    return result_heights
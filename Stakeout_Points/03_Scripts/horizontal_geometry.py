@@ -0,0 +1,546 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "00_Utilities"))
+from alignment_evaluator import evaluate_horizontal
+
+# --- Configuration ---
+# Tolerance for detecting a straight line. Angle in radians.
+# A smaller value makes the detection stricter.
+ANGLE_TOLERANCE = 0.005  # Approx 0.3 degrees
+
+# Minimum number of points to define a curve or a line
+MIN_POINTS_FOR_SEGMENT = 3
+
+# Noise floor of the curvature diagram, in 1/m. The tolerance of a curved run never drops below it.
+CURVATURE_TOLERANCE = 0.00001
+
+# Tolerance of the curvature diagram relative to the largest curvature of the curved run.
+# Parts whose curvature changes by less than this are arcs, linear curvature ramps above it are clothoids,
+# and parts with curvature below it at both ends are lines - so flat clothoids of large radii are kept.
+RELATIVE_CURVATURE_TOLERANCE = 0.02
+
+# Tolerance of the curvature diagram in multiples of its noise, estimated from the second differences
+# of the curvature samples (zero on lines, arcs and clothoids) - rounded coordinates make the diagram noisy
+CURVATURE_NOISE_FACTOR = 5.0
+
+# Largest number of chords on each side of a vertex used for its curvature in a noisy run
+MAX_CURVATURE_WIDTH = 20
+
+# Chords longer than this many times their neighbour mark a junction between differently sampled geometry
+MAX_CHORD_RATIO = 2.0
+
+# Number of passes moving the breaks next to clothoids (extend_clothoids_to_neighbours) and refitting
+BREAK_ITERATIONS = 2
+
+# Largest kink (rad) between two lines merged into one; larger kinks of the source polyline are kept
+MAX_LINE_KINK = 0.0005
+
+# Segments shorter than this (m) are merged into a neighbour before the alignment is emitted
+MIN_SEGMENT_LENGTH = 1.0
+
+def calculate_bearing(p1, p2):
+    """Calculates the bearing (azimuth) between two points. Works on single points and on arrays of points."""
+    p1, p2 = np.asarray(p1), np.asarray(p2)
+    return np.arctan2(p2[..., 0] - p1[..., 0], p2[..., 1] - p1[..., 1])
+
+def get_deflection_angles(points):
+    """
+    Returns the deflection angle at every interior vertex of a polyline (array of length n-2).
+    Angles are wrapped to [-pi, pi), so a bearing change across the +-pi boundary stays small.
+    """
+    bearings = calculate_bearing(points[:-1], points[1:])
+    deflections = np.diff(bearings)
+    return (deflections + np.pi) % (2 * np.pi) - np.pi
+
+def get_curvature_profile(points):
+    """
+    Returns (chainage, curvature): chainage of every vertex along the polyline and the signed
+    curvature at every vertex (positive = turning left, 0 at the first and last vertex).
+    """
+    chord_lengths = np.linalg.norm(np.diff(points[:, :2], axis=0), axis=1)
+    chainage = np.concatenate(([0.0], np.cumsum(chord_lengths)))
+    curvature = np.zeros(len(points))
+    # Bearings grow clockwise, so a left turn has a negative deflection
+    curvature[1:-1] = -get_deflection_angles(points) / ((chord_lengths[:-1] + chord_lengths[1:]) / 2)
+    return chainage, curvature
+
+def split_curvature_profile(chainage, curvature, samples, tolerance=CURVATURE_TOLERANCE):
+    """
+    Splits the curvature diagram of a curved run into parts with linear curvature.
+    Works like Douglas-Peucker on the (chainage, curvature) points of the sample vertices.
+    Returns (breaks, rejected): sorted sample vertices where the run is split
+    and sample vertices that should not be used for fitting.
+    """
+    breaks = []
+    stack = [(0, len(samples) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        s = chainage[samples[first:last + 1]]
+        k = curvature[samples[first:last + 1]]
+        chord = k[0] + (k[-1] - k[0]) * (s - s[0]) / (s[-1] - s[0])
+        deviation = np.abs(k - chord)
+        split = int(np.argmax(deviation))
+        if deviation[split] <= tolerance:
+            continue
+        breaks.append(first + split)
+        stack.append((first, first + split))
+        stack.append((first + split, last))
+
+    # A part needs at least MIN_POINTS_FOR_SEGMENT chords. A shorter part is a jump in curvature
+    # (e.g. between the arcs of a compound curve): its neighbours meet in its middle and its samples are rejected.
+    bounds = [0] + sorted(breaks) + [len(samples) - 1]
+    cuts = [0]
+    rejected = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        if high - low >= MIN_POINTS_FOR_SEGMENT or len(bounds) == 2:
+            cuts.append(high)
+            continue
+        rejected.extend(samples[low:high + 1])
+        if low == 0:
+            continue
+        if high == len(samples) - 1:
+            if len(cuts) > 1:
+                cuts.pop()
+            continue
+        cuts[-1] = (low + high) // 2
+    if cuts[-1] != len(samples) - 1:
+        cuts.append(len(samples) - 1)
+    return [samples[cut] for cut in cuts[1:-1]], rejected
+
+def fit_curvature_ramps(chainage, curvature, valid, starts, ends):
+    """
+    Fits a straight line to the curvature diagram of every part (least squares, vectorized).
+    Only vertices marked in valid are used as samples.
+    Returns (start_curvatures, end_curvatures) of the fitted lines; NaN for parts without samples.
+    """
+    segment_ids, indices = gather_segment_points(chainage, starts, ends)
+    used = valid[indices]
+    segment_ids, indices = segment_ids[used], indices[used]
+    counts = np.bincount(segment_ids, minlength=len(starts))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def segment_mean(values):
+            return np.bincount(segment_ids, weights=values, minlength=len(starts)) / counts
+
+        s = chainage[indices] - chainage[starts][segment_ids]
+        k = curvature[indices]
+        mean_s, mean_k = segment_mean(s), segment_mean(k)
+        ds = s - mean_s[segment_ids]
+        variance = segment_mean(ds * ds)
+        slopes = np.where(variance > 0, segment_mean(ds * (k - mean_k[segment_ids])) / variance, 0.0)
+    lengths = chainage[ends] - chainage[starts]
+    return mean_k - slopes * mean_s, mean_k + slopes * (lengths - mean_s)
+
+def extend_clothoids_to_neighbours(chainage, starts, ends, is_clothoid, is_line, start_curvatures, end_curvatures):
+    """
+    Moves the break between a clothoid and an adjacent line or arc to where the fitted curvature of the clothoid
+    reaches the curvature of the neighbour (0 for a line). Vertices near such a break are junctions or lie
+    close to the neighbour's curvature, so the split of the curvature diagram leaves the break a vertex or more off.
+    The break snaps to the nearer vertex of the chord containing the crossing and never leaves the two segments,
+    so a long tangent chord stays in the line. Modifies starts and ends in place.
+    """
+    def nearest_vertex(crossing):
+        vertex = int(np.clip(np.searchsorted(chainage, crossing), 1, len(chainage) - 1))
+        return vertex - 1 if crossing - chainage[vertex - 1] < chainage[vertex] - crossing else vertex
+
+    targets = np.where(is_line, 0.0, (np.nan_to_num(start_curvatures) + np.nan_to_num(end_curvatures)) / 2)
+    for i in np.flatnonzero(is_clothoid):
+        slope = (end_curvatures[i] - start_curvatures[i]) / (chainage[ends[i]] - chainage[starts[i]])
+        if not slope:
+            continue
+        if i > 0 and not is_clothoid[i - 1]:
+            vertex = nearest_vertex(chainage[starts[i]] + (targets[i - 1] - start_curvatures[i]) / slope)
+            if starts[i - 1] < vertex < ends[i]:
+                ends[i - 1] = starts[i] = vertex
+        if i + 1 < len(starts) and not is_clothoid[i + 1]:
+            vertex = nearest_vertex(chainage[ends[i]] + (targets[i + 1] - end_curvatures[i]) / slope)
+            if starts[i] < vertex < ends[i + 1]:
+                ends[i] = starts[i + 1] = vertex
+
+def gather_segment_points(points, starts, ends):
+    """
+    Collects the vertices of all segments into one flat array.
+    Returns (segment_ids, point_indices): for every gathered vertex, its segment number and index in points.
+    """
+    counts = ends - starts + 1
+    segment_ids = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.cumsum(counts) - counts
+    point_indices = starts[segment_ids] + np.arange(counts.sum()) - offsets[segment_ids]
+    return segment_ids, point_indices
+
+def fit_circles(points, starts, ends, max_iterations=20):
+    """
+    Fits a least-squares circle to the vertices of every segment in one vectorized call (Taubin fit).
+    Each segment runs from points[start] to points[end], both inclusive.
+    Returns (radii, centers, residuals); residuals are RMS radial deviations of the vertices.
+    Degenerate (colinear) segments get an infinite radius and a NaN center.
+    """
+    segment_ids, point_indices = gather_segment_points(points, starts, ends)
+    counts = np.bincount(segment_ids, minlength=len(starts))
+
+    def segment_mean(values):
+        return np.bincount(segment_ids, weights=values, minlength=len(starts)) / counts
+
+    # Coordinates are centered per segment - survey coordinates are too large for squaring
+    xy = points[point_indices, :2]
+    mean_x, mean_y = segment_mean(xy[:, 0]), segment_mean(xy[:, 1])
+    x = xy[:, 0] - mean_x[segment_ids]
+    y = xy[:, 1] - mean_y[segment_ids]
+    z = x * x + y * y
+
+    mxx, myy, mxy = segment_mean(x * x), segment_mean(y * y), segment_mean(x * y)
+    mxz, myz, mzz = segment_mean(x * z), segment_mean(y * z), segment_mean(z * z)
+
+    # Characteristic polynomial of the Taubin fit, solved by Newton's method from 0
+    mz = mxx + myy
+    cov_xy = mxx * myy - mxy * mxy
+    var_z = mzz - mz * mz
+    a3 = 4 * mz
+    a2 = -3 * mz * mz - mzz
+    a1 = var_z * mz + 4 * cov_xy * mz - mxz * mxz - myz * myz
+    a0 = mxz * (mxz * myy - myz * mxy) + myz * (myz * mxx - mxz * mxy) - var_z * cov_xy
+
+    root = np.zeros(len(starts))
+    value = a0.copy()
+    active = np.ones(len(starts), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for _ in range(max_iterations):
+            new_root = root - value / (a1 + root * (2 * a2 + 3 * a3 * root))
+            new_value = a0 + new_root * (a1 + new_root * (a2 + new_root * a3))
+            active &= np.isfinite(new_root) & (np.abs(new_value) < np.abs(value))
+            if not active.any():
+                break
+            root = np.where(active, new_root, root)
+            value = np.where(active, new_value, value)
+
+        det = root * root - root * mz + cov_xy
+        center_x = (mxz * (myy - root) - myz * mxy) / det / 2
+        center_y = (myz * (mxx - root) - mxz * mxy) / det / 2
+        radii = np.sqrt(center_x ** 2 + center_y ** 2 + mz)
+
+        distances = np.hypot(x - center_x[segment_ids], y - center_y[segment_ids])
+        residuals = np.sqrt(segment_mean((distances - radii[segment_ids]) ** 2))
+
+    degenerate = ~np.isfinite(radii)
+    radii[degenerate] = float('inf')
+    centers = np.column_stack((center_x + mean_x, center_y + mean_y))
+    centers[degenerate] = np.nan
+    return radii, centers, residuals
+
+def find_segment_breaks(points, angle_tolerance=ANGLE_TOLERANCE, straight=None):
+    """
+    Splits a polyline into runs of straight and curved vertices using array masks.
+    The straight mask of the interior vertices can be passed in; by default it compares deflection angles.
+    Returns (start_indices, end_indices, is_line) arrays; consecutive segments share their break vertex.
+    """
+    if straight is None:
+        straight = np.abs(get_deflection_angles(points)) < angle_tolerance
+
+    # state[i] tells whether the polyline is a line after vertex i; the walk always starts as a line.
+    state = np.concatenate(([True], straight))
+    breaks = np.flatnonzero(state[1:] != state[:-1]) + 1
+
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(points) - 1]))
+    is_line = state[ends - 1]
+
+    # An arc needs at least 3 points: short arcs between two breaks are dropped,
+    # a short arc at the end of the polyline is kept as a line.
+    too_short = ~is_line & (ends - starts < 2)
+    too_short[-1] = False
+    is_line[-1] |= ends[-1] - starts[-1] < 2
+    return starts[~too_short], ends[~too_short], is_line[~too_short]
+
+def find_tangent_chords(chord_lengths):
+    """
+    Marks chords longer than MAX_CHORD_RATIO times both neighbours.
+    Exports write a tangent as a single chord between densely sampled curves, so such a chord is a line on its own.
+    """
+    neighbours = np.zeros(len(chord_lengths))
+    neighbours[1:] = chord_lengths[:-1]
+    neighbours[:-1] = np.maximum(neighbours[:-1], chord_lengths[1:])
+    return chord_lengths > MAX_CHORD_RATIO * neighbours
+
+def get_curvature_noise(samples):
+    """
+    Estimates the standard deviation of the noise of curvature samples from the median of their second differences,
+    which is zero wherever the curvature changes linearly.
+    """
+    if len(samples) < 3:
+        return 0.0
+    return float(1.4826 * np.median(np.abs(np.diff(samples, 2))) / np.sqrt(6))
+
+def get_wide_curvature(points, chainage, vertices, width):
+    """
+    Returns the curvature at the given vertices from the chords to the vertices width places before and after.
+    On an arc this is exact like the single-chord estimate, while the noise of rounded coordinates drops with width squared.
+    """
+    back = calculate_bearing(points[vertices - width], points[vertices])
+    forward = calculate_bearing(points[vertices], points[vertices + width])
+    # Bearings grow clockwise, so a left turn has a negative deflection
+    deflections = (forward - back + np.pi) % (2 * np.pi) - np.pi
+    return -deflections / ((chainage[vertices + width] - chainage[vertices - width]) / 2)
+
+def split_curved_runs(points, chainage, curvature):
+    """
+    Splits a polyline into tangent chords and runs of curve chords, and every run into parts with linear curvature.
+    The curvature tolerance of a run is relative to its largest curvature (RELATIVE_CURVATURE_TOLERANCE),
+    but not below CURVATURE_TOLERANCE nor below CURVATURE_NOISE_FACTOR times the noise of its curvature samples.
+    If the noise is above the relative tolerance, the samples of the run are taken over wider chords (get_wide_curvature()).
+    A run without usable samples is a line. Modifies curvature in place.
+    Returns (starts, ends, is_tangent, tolerances, valid): vertex indices of the parts, the tangent chord flag,
+    the tolerance of every part and the vertices usable as curvature samples.
+    """
+    chord_lengths = np.diff(chainage)
+    tangent = find_tangent_chords(chord_lengths)
+
+    # Vertices between chords of very different length join two kinds of geometry
+    # (e.g. a long tangent chord and a densely sampled arc); their curvature is not a usable sample
+    junction = np.zeros(len(chainage), dtype=bool)
+    junction[1:-1] = np.maximum(chord_lengths[:-1], chord_lengths[1:]) > MAX_CHORD_RATIO * np.minimum(chord_lengths[:-1], chord_lengths[1:])
+    junctions_before = np.cumsum(junction)
+
+    valid = np.zeros(len(chainage), dtype=bool)
+    parts = []
+    run_start = 0
+    for vertex in list(np.flatnonzero(tangent)) + [len(chord_lengths)]:
+        if vertex > run_start:
+            samples = np.arange(run_start + 1, vertex)
+            samples = samples[~junction[samples]]
+            noise = get_curvature_noise(curvature[samples])
+            relative = max(CURVATURE_TOLERANCE, RELATIVE_CURVATURE_TOLERANCE * np.abs(curvature[samples]).max(initial=0.0))
+            width = min(int(np.ceil(np.sqrt(CURVATURE_NOISE_FACTOR * noise / relative))), MAX_CURVATURE_WIDTH, (vertex - run_start) // 4)
+            if width > 1:
+                # The wide chords of a sample must not cross a junction
+                samples = samples[(samples - width >= run_start) & (samples + width <= vertex)]
+                samples = samples[junctions_before[samples + width - 1] == junctions_before[samples - width]]
+                curvature[samples] = get_wide_curvature(points, chainage, samples, width)
+                noise /= width * width
+            if len(samples) == 0:
+                parts.append((run_start, vertex, True, CURVATURE_TOLERANCE))
+            else:
+                tolerance = max(CURVATURE_TOLERANCE, RELATIVE_CURVATURE_TOLERANCE * np.abs(curvature[samples]).max(), CURVATURE_NOISE_FACTOR * noise)
+                valid[samples] = True
+                breaks, rejected = split_curvature_profile(chainage, curvature, samples, tolerance)
+                valid[rejected] = False
+                breaks = [run_start] + breaks + [vertex]
+                parts.extend((part_start, part_end, False, tolerance) for part_start, part_end in zip(breaks[:-1], breaks[1:]))
+        if vertex < len(chord_lengths):
+            parts.append((vertex, vertex + 1, True, CURVATURE_TOLERANCE))
+        run_start = vertex + 1
+
+    starts, ends, is_tangent, tolerances = (np.array(column) for column in zip(*parts))
+    return starts, ends, is_tangent.astype(bool), tolerances.astype(float), valid
+
+def classify_parts(is_tangent, tolerances, start_curvatures, end_curvatures):
+    """
+    Returns (is_line, is_clothoid): a part is a line if it is a tangent chord or its curvature stays
+    within the tolerance of zero, a clothoid if its curvature changes by more than the tolerance, an arc otherwise.
+    """
+    k0, k1 = np.nan_to_num(start_curvatures), np.nan_to_num(end_curvatures)
+    is_line = is_tangent | ((np.abs(k0) <= tolerances) & (np.abs(k1) <= tolerances))
+    return is_line, ~is_line & (np.abs(k1 - k0) > tolerances)
+
+def merge_parts(chainage, curvature, starts, ends, is_line, is_clothoid, tolerances, start_curvatures, end_curvatures):
+    """
+    Merges neighbouring lines meeting at less than MAX_LINE_KINK, neighbouring arcs of the same curvature
+    and short parts: parts shorter than MIN_SEGMENT_LENGTH and curves of fewer than MIN_POINTS_FOR_SEGMENT chords.
+    A short part joins the neighbour whose curvature at the shared vertex is closer to its own mean curvature.
+    Returns the new (starts, ends, is_line, is_clothoid, tolerances).
+    """
+    k0, k1 = np.nan_to_num(start_curvatures), np.nan_to_num(end_curvatures)
+    chord_lengths = np.diff(chainage)
+    kinks = np.zeros(len(chainage))
+    kinks[1:-1] = np.abs(curvature[1:-1]) * (chord_lengths[:-1] + chord_lengths[1:]) / 2
+    parts = [[start, end, line, clothoid, tolerance, first, last] for start, end, line, clothoid, tolerance, first, last in zip(starts, ends, is_line, is_clothoid, tolerances, k0, k1)]
+
+    merged = [parts[0]]
+    for part in parts[1:]:
+        previous = merged[-1]
+        same_line = part[2] and previous[2] and kinks[part[0]] < MAX_LINE_KINK
+        same_arc = not (part[2] or part[3] or previous[2] or previous[3]) and abs((part[5] + part[6]) - (previous[5] + previous[6])) / 2 <= max(part[4], previous[4])
+        if same_line or same_arc:
+            previous[1], previous[6] = part[1], part[6]
+        else:
+            merged.append(part)
+
+    while len(merged) > 1:
+        lengths = [chainage[part[1]] - chainage[part[0]] for part in merged]
+        short = [length < MIN_SEGMENT_LENGTH or (not part[2] and part[1] - part[0] < MIN_POINTS_FOR_SEGMENT) for part, length in zip(merged, lengths)]
+        if not any(short):
+            break
+        i = min(np.flatnonzero(short), key=lambda j: lengths[j])
+        short = merged.pop(i)
+        mean = (short[5] + short[6]) / 2
+        if i == 0 or (i < len(merged) and abs(merged[i][5] - mean) < abs(merged[i - 1][6] - mean)):
+            merged[i][0] = short[0]
+        else:
+            merged[i - 1][1] = short[1]
+
+    starts, ends, is_line, is_clothoid, tolerances = (np.array(column) for column in list(zip(*merged))[:5])
+    return starts, ends, is_line.astype(bool), is_clothoid.astype(bool), tolerances.astype(float)
+
+def analyze_horizontal_geometry(points, verbose=False, detect_clothoids=True):
+    """
+    Analyzes a 2D polyline and segments it into lines, circular arcs and (optionally) clothoids.
+    Returns a list of segment dictionaries.
+    """
+    points = np.asarray(points, dtype=float)
+    if len(points) < MIN_POINTS_FOR_SEGMENT:
+        return []
+
+    chainage, curvature = get_curvature_profile(points)
+    if not detect_clothoids:
+        starts, ends, is_line = find_segment_breaks(points)
+        is_clothoid = np.zeros(len(starts), dtype=bool)
+    else:
+        starts, ends, is_line, tolerances, valid = split_curved_runs(points, chainage, curvature)
+        start_curvatures, end_curvatures = fit_curvature_ramps(chainage, curvature, valid, starts, ends)
+        is_line, is_clothoid = classify_parts(is_line, tolerances, start_curvatures, end_curvatures)
+        starts, ends, is_line, is_clothoid, tolerances = merge_parts(chainage, curvature, starts, ends, is_line, is_clothoid, tolerances, start_curvatures, end_curvatures)
+        start_curvatures, end_curvatures = fit_curvature_ramps(chainage, curvature, valid, starts, ends)
+        for _ in range(BREAK_ITERATIONS):
+            extend_clothoids_to_neighbours(chainage, starts, ends, is_clothoid, is_line, start_curvatures, end_curvatures)
+            start_curvatures, end_curvatures = fit_curvature_ramps(chainage, curvature, valid, starts, ends)
+            # Moved breaks can leave a fragment of a few chords between two segments
+            starts, ends, is_line, is_clothoid, tolerances = merge_parts(chainage, curvature, starts, ends, is_line, is_clothoid, tolerances, start_curvatures, end_curvatures)
+            start_curvatures, end_curvatures = fit_curvature_ramps(chainage, curvature, valid, starts, ends)
+
+    chord_lengths = np.linalg.norm(points[ends] - points[starts], axis=1)
+    radii = np.full(len(starts), float('inf'))
+    residuals = np.zeros(len(starts))
+    arcs = ~is_line & ~is_clothoid
+    if arcs.any():
+        radii[arcs], _, residuals[arcs] = fit_circles(points, starts[arcs], ends[arcs])
+    if is_clothoid.any():
+        # A clothoid continues the curvature of its neighbours: 0 next to a line, the fitted circle next to an arc
+        neighbour_curvatures = np.where(arcs, np.sign(start_curvatures + end_curvatures) / radii, 0.0)
+        for i in np.flatnonzero(is_clothoid):
+            if i > 0 and not is_clothoid[i - 1]:
+                start_curvatures[i] = neighbour_curvatures[i - 1]
+            if i + 1 < len(starts) and not is_clothoid[i + 1]:
+                end_curvatures[i] = neighbour_curvatures[i + 1]
+
+    # --- Post-process segments to calculate parameters ---
+    processed_segments = []
+    for i, (start, end, line, length, radius, residual) in enumerate(zip(starts, ends, is_line, chord_lengths, radii, residuals)):
+        start_point, end_point = points[start], points[end]
+
+        if is_clothoid[i]:
+            # Signed curvatures (positive = turning left); close to zero means the clothoid starts/ends on a tangent.
+            # Both ends keep their own sign, so a clothoid between a left and a right arc changes sign.
+            curvature_start = float(start_curvatures[i]) if abs(start_curvatures[i]) > CURVATURE_TOLERANCE else 0.0
+            curvature_end = float(end_curvatures[i]) if abs(end_curvatures[i]) > CURVATURE_TOLERANCE else 0.0
+            clothoid_length = chainage[end] - chainage[start]
+            processed_segments.append({
+                'type': 'clothoid',
+                'points': points[start:end + 1],
+                'start': start_point,
+                'end': end_point,
+                'curvature_start': curvature_start,
+                'curvature_end': curvature_end,
+                'start_radius': 1 / abs(curvature_start) if curvature_start else float('inf'),
+                'end_radius': 1 / abs(curvature_end) if curvature_end else float('inf'),
+                'length': clothoid_length
+            })
+            if verbose:
+                print(f"Detected Clothoid: Curvature {curvature_start:.6f} -> {curvature_end:.6f} 1/m, Length={clothoid_length:.3f}m")
+            continue
+
+        if line or radius == float('inf'): # Colinear points detected
+            processed_segments.append({
+                'type': 'line',
+                'start': start_point,
+                'end': end_point,
+                'length': length
+            })
+            if verbose:
+                print(f"Detected Line{'' if line else ' (from degenerated arc)'}: Length={length:.3f}m")
+            continue
+
+        # Determine if the arc is left or right turning
+        mid_point = points[(start + end + 1) // 2]
+        # Formula for 2D cross product: (x1*y2 - y1*x2), positive when the turn at mid is counter-clockwise
+        v1 = mid_point - start_point
+        v2 = end_point - mid_point
+        is_left = (v1[0] * v2[1] - v1[1] * v2[0]) > 0
+
+        arc_length = 2 * radius * np.arcsin(length / (2 * radius)) if (2 * radius) > length else length
+
+        processed_segments.append({
+            'type': 'arc',
+            'points': points[start:end + 1],
+            'start': start_point,
+            'end': end_point,
+            'mid': mid_point,
+            'radius': radius,
+            'residual': residual,
+            'is_left': is_left,
+            'length': arc_length
+        })
+        if verbose:
+            print(f"Detected Arc: Radius={radius:.3f}m (RMS {residual:.4f}m), Length={arc_length:.3f}m, Turn={'Left' if is_left else 'Right'}")
+
+    return processed_segments
+
+def get_signed_curvatures(seg):
+    """Returns the curvature at the start and end of a segment, positive for left turns."""
+    if seg['type'] == 'arc':
+        sign = 1.0 if seg['is_left'] else -1.0
+        return sign / seg['radius'], sign / seg['radius']
+    if seg['type'] == 'clothoid':
+        return seg['curvature_start'], seg['curvature_end']
+    return 0.0, 0.0
+
+def get_start_direction(seg):
+    """
+    Calculates the tangent direction at the start of a segment (radians, counter-clockwise from the X axis).
+    The chord direction is corrected by the chord direction of the same curve started at direction 0,
+    evaluated with alignment_evaluator.evaluate_horizontal().
+    """
+    k0, k1 = get_signed_curvatures(seg)
+    length = float(seg['length'])
+    local_table = {
+        'stations': np.array([0.0, length]),
+        'starts': np.zeros((1, 2)),
+        'directions': np.zeros(1),
+        'start_curvatures': np.array([k0]),
+        'end_curvatures': np.array([k1]),
+        'lengths': np.array([length]),
+    }
+    _, local_end, _ = evaluate_horizontal(local_table, [length])
+    chord_angle = np.arctan2(seg['end'][1] - seg['start'][1], seg['end'][0] - seg['start'][0])
+    return float(chord_angle - np.arctan2(local_end[0, 1], local_end[0, 0]))
+
+def get_segment_table(horizontal_segments):
+    """
+    Collects the parameters of all segments into arrays for vectorized evaluation.
+    Every segment is described by its start point, start direction and linearly changing curvature,
+    which covers lines, arcs and clothoids alike. The table has the keys of
+    alignment_evaluator.get_horizontal_table(), so it is evaluated with alignment_evaluator.evaluate_horizontal().
+    """
+    lengths = np.array([float(seg['length']) for seg in horizontal_segments])
+    curvatures = np.array([get_signed_curvatures(seg) for seg in horizontal_segments]).reshape(-1, 2)
+    return {
+        'stations': np.concatenate(([0.0], np.cumsum(lengths))),
+        'starts': np.array([seg['start'][:2] for seg in horizontal_segments], dtype=float).reshape(-1, 2),
+        'directions': np.array([get_start_direction(seg) for seg in horizontal_segments]),
+        'start_curvatures': curvatures[:, 0],
+        'end_curvatures': curvatures[:, 1],
+        'lengths': lengths,
+    }
+
+def get_stakeout_stations(segment_table, interval):
+    """
+    Returns (stations, is_tangent_point): stations every interval metres along the alignment,
+    merged with the start and end of every segment (tangent points).
+    """
+    total = segment_table['stations'][-1]
+    regular = np.arange(0.0, total, interval)
+    stations = np.unique(np.concatenate((regular, segment_table['stations'])))
+    is_tangent_point = np.isin(stations, segment_table['stations'])
+    return stations, is_tangent_point